@@ -3,128 +3,227 @@ Batch processing script for handling multiple textbook chapters with token track
 """
 
 import sys
+import time
 from pathlib import Path
+from typing import Dict, Optional
 
 project_root = Path(__file__).parent
 sys.path.append(str(project_root))
 
 from src.llama4_extractor import LocalLlama4Extractor
-from config.settings import INPUT_DIR, OUTPUT_DIR
-import time
+from src.rate_limiter import AdaptiveRateLimiter
+from src.documents import PageRef
+from src.journal import (ProgressJournal, STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED,
+                         source_fingerprint, text_hash)
+from src.page_filter import SKIP_DESCRIPTIONS
+from config.settings import (INPUT_DIR, OUTPUT_DIR, JOURNAL_DIR, METRICS_DIR, REQUESTS_PER_MINUTE,
+                             TOKENS_PER_MINUTE, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS,
+                             configure_logging, ensure_directories, settings_warnings)
 import logging
 
-# Set up logging for batch processing
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
-def batch_process_with_delay():
-    """Process images with a delay to respect API rate limits and track tokens."""
+def batch_process_with_delay(input_dir: Path = INPUT_DIR, output_dir: Path = OUTPUT_DIR,
+                             extractor: Optional[LocalLlama4Extractor] = None,
+                             journal_path: Optional[Path] = None) -> Dict:
+    """
+    Process images paced by the adaptive rate limiter and track tokens.
+    
+    Args:
+        input_dir: Folder with the images to process
+        output_dir: Folder to write the text files and token report to
+        extractor: Extractor to use (defaults to one paced by the configured
+                   quota); its rate limiter, if any, paces the batch
+        journal_path: Job journal (defaults to the one process_folder uses
+                      for the same input folder)
+        
+    Returns:
+        Summary of the job from the results store: page counts (pages,
+        done, failed), token totals and characters extracted
+    """
     
     print("Batch Processing Script with Token Tracking")
     print("=" * 60)
     
-    # Initialize extractor
-    extractor = LocalLlama4Extractor()
+    if extractor is None:
+        # Pace requests by the configured quota instead of a fixed delay
+        rate_limiter = AdaptiveRateLimiter(
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            tokens_per_minute=TOKENS_PER_MINUTE,
+            backoff_base=BACKOFF_BASE_SECONDS,
+            backoff_max=BACKOFF_MAX_SECONDS
+        )
+        
+        # Initialize extractor
+        extractor = LocalLlama4Extractor(rate_limiter=rate_limiter)
+        extractor.serve_metrics()
+    rate_limiter = extractor.rate_limiter
     
     # Get all images
-    images = list(INPUT_DIR.glob("*.jpg")) + list(INPUT_DIR.glob("*.png"))
+    images = list(input_dir.glob("*.jpg")) + list(input_dir.glob("*.png"))
     
     print(f"Found {len(images)} images to process")
-    print("Processing with 5-second delay between images...")
+    if rate_limiter:
+        print(f"Rate limits: {REQUESTS_PER_MINUTE} requests/min, {TOKENS_PER_MINUTE:,} tokens/min")
+        if len(extractor.router) > 1:
+            print(f"  (in each of {len(extractor.router)} regions)")
     
-    # Track token usage per file
-    token_summary = []
+    # The journal records every finished page, so an interrupted run resumes
+    # where it stopped. It is shared with process_folder for the same folder.
+    journal = ProgressJournal(journal_path or JOURNAL_DIR / f"{input_dir.name}.jsonl")
+    # Every outcome is also appended to the results store, which the report
+    # below is built from; nothing per page is kept in memory
+    job = journal.path.stem
+    store = extractor.results_store
+    budget = extractor.budget
+    budget.start_job(job)
     
     for i, image in enumerate(images, 1):
+        # Pages not sent stay open in the journal for a later run
+        if budget.stopped:
+            print(f"\n{budget.stop_reason}; not sending the remaining {len(images) - i + 1} images")
+            break
+        
         print(f"\n[{i}/{len(images)}] Processing {image.name}...")
+        page = PageRef(image)
+        fingerprint = source_fingerprint(image)
         
+        if journal.is_complete(image.name, fingerprint):
+            if not store.latest(job, image.name):
+                entry = journal.get(image.name)
+                store.append(job, page, STATUS_DONE, output_path=entry["output_path"],
+                             token_usage=entry["token_usage"])
+            print("✓ Already completed in an earlier run, skipping")
+            continue
+        
+        page_start = time.perf_counter()
         try:
-            text, token_usage = extractor.extract_text_from_image(image)
-            output_file = OUTPUT_DIR / f"{image.stem}_extracted.txt"
+            # HTTP 429 and 5xx answers are retried by the extractor
+            prepared = extractor.prepare(image)
+            text, token_usage = extractor.extract_text_from_image(image, prepared=prepared)
+            
+            # Blank pages, separator sheets and full-page images were not sent;
+            # they are journaled as skipped, like process_folder does
+            if prepared.skip_reason:
+                journal.record(image.name, STATUS_SKIPPED, reason=prepared.skip_reason,
+                               content_stats=prepared.content_stats, **fingerprint)
+                store.append(job, page, STATUS_SKIPPED, characters=0,
+                             timings={"page_total": time.perf_counter() - page_start},
+                             error=SKIP_DESCRIPTIONS[prepared.skip_reason])
+                print(f"- Skipped: {SKIP_DESCRIPTIONS[prepared.skip_reason]}")
+                continue
+            
+            output_file = output_dir / f"{image.stem}_extracted.txt"
             output_file.write_text(text, encoding='utf-8')
+            journal.record(image.name, STATUS_DONE, output_path=output_file,
+                           token_usage=token_usage,
+                           content_hash=text_hash(text), **fingerprint)
+            store.append(job, page, STATUS_DONE, output_path=output_file,
+                         token_usage=token_usage, characters=len(text),
+                         timings={"page_total": time.perf_counter() - page_start})
             
             print(f"✓ Saved to {output_file.name}")
             print(f"  Token usage - Input: {token_usage['input_tokens']}, Output: {token_usage['output_tokens']}, Total: {token_usage['total_tokens']}")
-            
-            # Store token info
-            token_summary.append({
-                "file": image.name,
-                "input": token_usage['input_tokens'],
-                "output": token_usage['output_tokens'],
-                "total": token_usage['total_tokens']
-            })
-            
-            # Delay between requests (except for last image)
-            if i < len(images):
-                print("Waiting 5 seconds before next image...")
-                time.sleep(5)
+            print(f"  Spent so far: ${budget.run_cost:.4f} this run, ${budget.job_spent():.4f} on the job")
                 
         except Exception as e:
+            journal.record(image.name, STATUS_FAILED, error=str(e), **fingerprint)
+            store.append(job, page, STATUS_FAILED, error=str(e))
             print(f"✗ Error: {e}")
             logger.error(f"Failed to process {image.name}: {e}")
     
+    journal.close()
+    
     # Display final summary
     print("\n" + "="*60)
     print("BATCH PROCESSING COMPLETE!")
     print("="*60)
     
     # Calculate totals
-    total_input = sum(item['input'] for item in token_summary)
-    total_output = sum(item['output'] for item in token_summary)
-    total_tokens = sum(item['total'] for item in token_summary)
+    summary = store.summary(job=job)
+    total_input = summary['input_tokens']
+    total_output = summary['output_tokens']
+    total_tokens = summary['total_tokens']
+    pages_done = summary['done']
+    
+    if rate_limiter:
+        # Every region has its own limiter
+        limiters = [region.rate_limiter for region in extractor.router.regions
+                    if region.rate_limiter]
+        print(f"\nRate limiter waited {sum(l.total_wait_seconds for l in limiters):.1f}s in total "
+              f"({sum(l.throttled_responses for l in limiters)} throttled responses)")
+    
+    transport_stats = extractor.transport.stats()
+    print(f"HTTP connections opened: {transport_stats['connections_opened']} "
+          f"for {transport_stats['requests_sent']} requests "
+          f"({transport_stats['connection_reuse_ratio']:.0%} reused)")
     
     print(f"\nToken Usage Summary:")
+    print(f"- Pages done: {pages_done} of {summary['pages']} "
+          f"({summary['failed']} failed, {summary['skipped']} skipped)")
     print(f"- Total input tokens: {total_input:,}")
     print(f"- Total output tokens: {total_output:,}")
     print(f"- Total tokens used: {total_tokens:,}")
     
-    if len(token_summary) > 0:
+    if pages_done > 0:
         print(f"\nAverages per image:")
-        print(f"- Average input tokens: {total_input / len(token_summary):,.2f}")
-        print(f"- Average output tokens: {total_output / len(token_summary):,.2f}")
-        print(f"- Average total tokens: {total_tokens / len(token_summary):,.2f}")
+        print(f"- Average input tokens: {total_input / pages_done:,.2f}")
+        print(f"- Average output tokens: {total_output / pages_done:,.2f}")
+        print(f"- Average total tokens: {total_tokens / pages_done:,.2f}")
     
-    # Cost estimation
-    estimated_cost = total_tokens / 1_000_000 * 0.075
+    # Cost estimation with separate input and output prices
+    estimated_cost = budget.pricing.cost(total_input, total_output)
     print(f"\nEstimated total cost: ${estimated_cost:.4f}")
-    print(f"Average cost per page: ${estimated_cost / len(token_summary):.4f}" if len(token_summary) > 0 else "")
+    print(f"Average cost per page: ${estimated_cost / pages_done:.4f}" if pages_done > 0 else "")
+    print(f"Spent this run: ${budget.run_cost:.4f} (today, all jobs: ${budget.spent_today():.4f})")
     
-    # Save detailed token report
-    token_report_file = OUTPUT_DIR / "batch_token_report.txt"
+    # Save detailed token report, streamed from the results store
+    token_report_file = output_dir / "batch_token_report.txt"
     with open(token_report_file, 'w', encoding='utf-8') as f:
         f.write("Batch Processing Token Report\n")
         f.write("=" * 60 + "\n\n")
         f.write("Per-File Token Usage:\n")
         f.write("-" * 40 + "\n")
         
-        for item in token_summary:
-            f.write(f"{item['file']}:\n")
-            f.write(f"  Input tokens: {item['input']:,}\n")
-            f.write(f"  Output tokens: {item['output']:,}\n")
-            f.write(f"  Total tokens: {item['total']:,}\n\n")
+        for record in store.iter_pages(job=job):
+            if record['status'] != STATUS_DONE:
+                continue
+            f.write(f"{record['page_key']}:\n")
+            f.write(f"  Input tokens: {record['input_tokens']:,}\n")
+            f.write(f"  Output tokens: {record['output_tokens']:,}\n")
+            f.write(f"  Total tokens: {record['total_tokens']:,}\n\n")
         
         f.write("\nSummary Statistics:\n")
         f.write("-" * 40 + "\n")
-        f.write(f"Total files processed: {len(token_summary)}\n")
+        f.write(f"Total files processed: {pages_done}\n")
+        f.write(f"Files failed: {summary['failed']}\n")
+        f.write(f"Files skipped: {summary['skipped']}\n")
         f.write(f"Total input tokens: {total_input:,}\n")
         f.write(f"Total output tokens: {total_output:,}\n")
         f.write(f"Total tokens used: {total_tokens:,}\n")
         
-        if len(token_summary) > 0:
-            f.write(f"\nAverage input tokens per file: {total_input / len(token_summary):,.2f}\n")
-            f.write(f"Average output tokens per file: {total_output / len(token_summary):,.2f}\n")
-            f.write(f"Average total tokens per file: {total_tokens / len(token_summary):,.2f}\n")
+        if pages_done > 0:
+            f.write(f"\nAverage input tokens per file: {total_input / pages_done:,.2f}\n")
+            f.write(f"Average output tokens per file: {total_output / pages_done:,.2f}\n")
+            f.write(f"Average total tokens per file: {total_tokens / pages_done:,.2f}\n")
         
         f.write(f"\nEstimated total cost: ${estimated_cost:.4f}\n")
-        if len(token_summary) > 0:
-            f.write(f"Average cost per page: ${estimated_cost / len(token_summary):.4f}\n")
+        if pages_done > 0:
+            f.write(f"Average cost per page: ${estimated_cost / pages_done:.4f}\n")
     
     print(f"\nDetailed token report saved to: {token_report_file}")
+    
+    # Export the stage timings like process_folder does
+    extractor.metrics.write_prometheus(METRICS_DIR / f"{input_dir.name}_batch.prom")
+    extractor.metrics.write_json(METRICS_DIR / f"{input_dir.name}_batch_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    return summary
 
 
 if __name__ == "__main__":
+    ensure_directories()
+    # Batch processing logs to the console only
+    configure_logging(log_file=None)
+    for warning in settings_warnings():
+        logger.warning(warning)
     batch_process_with_delay()
\ No newline at end of file
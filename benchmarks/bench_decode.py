@@ -0,0 +1,140 @@
+"""
+Benchmark for the reduced-resolution decode path in prepare_page.
+Compares decode time, peak memory and output equivalence of the full decode
+and the fast (draft/reduce) decode on the same images.
+
+Usage:
+    python benchmarks/bench_decode.py                 # synthetic 4000x3000 scan
+    python benchmarks/bench_decode.py data/input/*.jpg
+"""
+
+import sys
+import io
+import time
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from src.image_prep import prepare_page
+
+MAX_IMAGE_SIZE = (1024, 1024)
+IMAGE_QUALITY = 85
+
+
+def make_synthetic_scan(path: Path, size=(4000, 3000)):
+    """Write a phone-camera-sized JPEG with lines of dark text-like strokes."""
+    img = Image.new('RGB', size, (245, 242, 235))
+    draw = ImageDraw.Draw(img)
+    for y in range(150, size[1] - 150, 60):
+        draw.text((200, y), "The quick brown fox jumps over the lazy dog. " * 8,
+                  fill=(20, 20, 20))
+    img.save(path, format='JPEG', quality=92)
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _run_mode(image_paths, fast_decode, repeats, queue):
+    """Child process body: time prepare_page and report peak memory."""
+    baseline_rss = _peak_rss_mb()
+    timings = []
+    outputs = []
+    for path in image_paths:
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            prepared = prepare_page(path, MAX_IMAGE_SIZE, IMAGE_QUALITY,
+                                    fast_decode=fast_decode)
+            best = min(best, time.perf_counter() - start)
+        timings.append(best)
+        outputs.append(prepared.jpeg)
+    queue.put({
+        "timings": timings,
+        "outputs": outputs,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": _peak_rss_mb()
+    })
+
+
+def run_in_fresh_process(image_paths, fast_decode, repeats):
+    """Run one mode in its own process so peak RSS is not shared between modes."""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_mode,
+                          args=(image_paths, fast_decode, repeats, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare_outputs(data_a: bytes, data_b: bytes):
+    """Return (max abs pixel difference, PSNR in dB) of two encoded JPEGs."""
+    a = np.asarray(Image.open(io.BytesIO(data_a)).convert('L'), dtype=np.float64)
+    b = np.asarray(Image.open(io.BytesIO(data_b)).convert('L'), dtype=np.float64)
+    if a.shape != b.shape:
+        return None, None
+    diff = np.abs(a - b)
+    mse = float(np.mean(diff ** 2))
+    psnr = float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+    return float(diff.max()), psnr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("images", nargs="*", type=Path,
+                        help="Images to benchmark (default: a synthetic scan)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Timed runs per image; the fastest is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_paths = args.images
+        if not image_paths:
+            synthetic = Path(tmp) / "synthetic_scan.jpg"
+            make_synthetic_scan(synthetic)
+            image_paths = [synthetic]
+
+        print("Decode Benchmark: full decode vs. reduced-resolution decode")
+        print("=" * 60)
+
+        full = run_in_fresh_process(image_paths, False, args.repeats)
+        fast = run_in_fresh_process(image_paths, True, args.repeats)
+
+        for i, path in enumerate(image_paths):
+            max_diff, psnr = compare_outputs(full["outputs"][i], fast["outputs"][i])
+            speedup = full["timings"][i] / fast["timings"][i]
+            print(f"\n{path.name}:")
+            print(f"  Full decode: {full['timings'][i] * 1000:8.1f} ms")
+            print(f"  Fast decode: {fast['timings'][i] * 1000:8.1f} ms  ({speedup:.1f}x)")
+            if psnr is None:
+                print("  Output sizes differ!")
+            else:
+                print(f"  Output PSNR: {psnr:.1f} dB (max pixel difference {max_diff:.0f})")
+
+        print("\nPeak memory (RSS):")
+        for name, result in (("Full decode", full), ("Fast decode", fast)):
+            if result["peak_rss_mb"] is None:
+                print(f"  {name}: not available on this platform")
+            else:
+                print(f"  {name}: {result['peak_rss_mb']:.1f} MB "
+                      f"(after imports: {result['baseline_rss_mb']:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark for near-duplicate lookups in the perceptual-hash index.
+Fills an index with random page hashes and times lookups of near-duplicates
+(which must be found) and of unrelated pages (which must not be).
+
+Usage:
+    python benchmarks/bench_dedup.py
+    python benchmarks/bench_dedup.py --pages 500000 --lookups 5000
+"""
+
+import sys
+import time
+import zlib
+import random
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+
+from src.dedup import SCHEMA, DuplicateIndex, _to_signed
+
+
+def fill_index(path: Path, hashes, text: str):
+    """Write the pages straight to the database in one transaction."""
+    detail = bytes(32)
+    blob = zlib.compress(text.encode('utf-8'))
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.executemany(
+            "INSERT INTO page_hashes (phash, detail_hash, page_key, source_path, text,"
+            " recorded_at) VALUES (?, ?, ?, ?, ?, 0)",
+            ((_to_signed(phash), detail, f"page_{i:07d}.jpg", "synthetic", blob)
+             for i, phash in enumerate(hashes)))
+    conn.close()
+
+
+def time_lookups(index: DuplicateIndex, queries):
+    """Per-lookup times in ms and the number of matches found."""
+    timings = []
+    found = 0
+    for phash in queries:
+        start = time.perf_counter()
+        found += index.find(phash, bytes(32)) is not None
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, default=300_000, help="Pages in the index")
+    parser.add_argument("--lookups", type=int, default=2000, help="Lookups of each kind")
+    parser.add_argument("--flips", type=int, default=4,
+                        help="Bits flipped to make a near-duplicate")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(args.pages)]
+
+    def near_duplicate(phash):
+        for bit in rng.sample(range(64), args.flips):
+            phash ^= 1 << bit
+        return phash
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "duplicates.sqlite"
+        print("Duplicate Index Benchmark: Hamming-distance lookups")
+        print("=" * 60)
+
+        start = time.perf_counter()
+        fill_index(path, hashes, "The quick brown fox jumps over the lazy dog. " * 40)
+        print(f"Wrote {args.pages:,} pages in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = DuplicateIndex(path)
+        print(f"Opened the index in {time.perf_counter() - start:.2f}s")
+
+        near = [near_duplicate(rng.choice(hashes)) for _ in range(args.lookups)]
+        unrelated = [rng.getrandbits(64) for _ in range(args.lookups)]
+
+        for name, queries in ((f"Near-duplicates ({args.flips} bits apart)", near),
+                              ("Unrelated pages", unrelated)):
+            timings, found = time_lookups(index, queries)
+            print(f"\n{name}")
+            print(f"  Found: {found}/{len(queries)}")
+            print(f"  Lookup: mean {timings.mean():.3f} ms, "
+                  f"p50 {np.percentile(timings, 50):.3f} ms, "
+                  f"p99 {np.percentile(timings, 99):.3f} ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
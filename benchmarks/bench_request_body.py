@@ -0,0 +1,100 @@
+"""
+Benchmark for the memory held by one request body while it is sent.
+Compares the old path (base64 string, request dict, json.dumps, encode)
+with ImageRequestBody, which base64-encodes the JPEG chunk by chunk as the
+body is read. Reports the peak Python allocations on top of the JPEG itself,
+as a multiple of the payload size, and the encoding time.
+
+Usage:
+    python benchmarks/bench_request_body.py
+    python benchmarks/bench_request_body.py --size-kb 2048
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.request_body import IMAGE_PLACEHOLDER, ImageRequestBody
+
+# Block size http.client/urllib3 read request bodies with
+SEND_BLOCK_SIZE = 16384
+
+
+def make_template(data: str):
+    """A generateContent body shaped like the extractor's."""
+    return {
+        "contents": [{"role": "user", "parts": [
+            {"text": "Extract ALL text from this scanned textbook page."},
+            {"inlineData": {"mimeType": "image/jpeg", "data": data}}
+        ]}],
+        "generationConfig": {"maxOutputTokens": 4096, "temperature": 0.1,
+                             "topP": 0.95, "topK": 40}
+    }
+
+
+def old_path(jpeg: bytes) -> int:
+    """Encode the way prepare_image and PooledTransport used to."""
+    encoded = base64.b64encode(jpeg).decode('utf-8')
+    body = make_template(encoded)
+    data = json.dumps(body).encode('utf-8')
+    sent = 0
+    for start in range(0, len(data), SEND_BLOCK_SIZE):
+        sent += len(data[start:start + SEND_BLOCK_SIZE])
+    return sent
+
+
+def new_path(jpeg: bytes) -> int:
+    """Stream the body the way PooledTransport now sends it."""
+    reader = ImageRequestBody(make_template(IMAGE_PLACEHOLDER), jpeg).reader()
+    sent = 0
+    while True:
+        block = reader.read(SEND_BLOCK_SIZE)
+        if not block:
+            return sent
+        sent += len(block)
+
+
+def measure(function, jpeg: bytes):
+    """Peak traced allocations (bytes) and seconds for one body."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    sent = function(jpeg)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sent, peak, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size-kb", type=int, default=600, help="JPEG size in KB")
+    args = parser.parse_args()
+
+    jpeg = os.urandom(args.size_kb * 1024)
+    payload = len(json.dumps(make_template(base64.b64encode(jpeg).decode('ascii'))))
+
+    print("Request Body Benchmark: memory held while sending one page")
+    print("=" * 60)
+    print(f"JPEG: {len(jpeg) / 1024:.0f} KB, request body: {payload / 1024:.0f} KB")
+    sizes = set()
+    for name, function in (("dict + json.dumps", old_path),
+                           ("ImageRequestBody", new_path)):
+        sent, peak, seconds = measure(function, jpeg)
+        sizes.add(sent)
+        print(f"\n{name}")
+        print(f"  Peak allocations: {peak / 1024:.0f} KB ({peak / payload:.2f}x the body)")
+        print(f"  Time: {seconds * 1000:.1f} ms")
+    assert len(sizes) == 1, "both paths must send the same number of bytes"
+
+
+if __name__ == "__main__":
+    main()
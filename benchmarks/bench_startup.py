@@ -0,0 +1,79 @@
+"""
+Benchmark for the cold-start time of the extraction client.
+Runs fresh Python interpreters that import src.llama4_extractor and then
+construct a LocalLlama4Extractor against a local endpoint (with a static
+token, so no credentials are loaded), and reports the median time of each
+step. With --max-seconds it exits non-zero when the import plus construction
+is slower than that, so it can guard against regressions such as an
+import-time dependency on the Vertex AI SDK.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --max-seconds 1.5
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+# Run in a fresh interpreter; prints the timings and the heavy modules loaded
+STARTUP_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from src.llama4_extractor import LocalLlama4Extractor
+imported = time.perf_counter()
+from benchmarks.mock_vertex import StaticTokenProvider
+LocalLlama4Extractor(endpoint="http://127.0.0.1:9/generateContent",
+                     token_provider=StaticTokenProvider())
+constructed = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "construct": constructed - imported,
+    "heavy_modules": sorted(name for name in ("google.cloud.aiplatform", "google.auth",
+                                              "vertexai", "grpc") if name in sys.modules)
+}}))
+"""
+
+
+def measure_once() -> dict:
+    """Time one cold start in a new interpreter."""
+    script = STARTUP_SCRIPT.format(root=str(project_root))
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True,
+                            text=True, cwd=str(project_root), check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to time")
+    parser.add_argument("--max-seconds", type=float,
+                        help="Fail if the median import plus construction is slower")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(max(1, args.runs))]
+    import_seconds = statistics.median(run["import"] for run in runs)
+    construct_seconds = statistics.median(run["construct"] for run in runs)
+    total = import_seconds + construct_seconds
+    heavy = sorted({name for run in runs for name in run["heavy_modules"]})
+
+    print("Startup Benchmark: fresh interpreter, import and construct the client")
+    print("=" * 60)
+    print(f"Runs: {len(runs)}")
+    print(f"Import src.llama4_extractor: {import_seconds * 1000:.0f} ms (median)")
+    print(f"Construct LocalLlama4Extractor: {construct_seconds * 1000:.0f} ms (median)")
+    print(f"Total: {total * 1000:.0f} ms")
+    print(f"Heavy modules loaded: {', '.join(heavy) if heavy else 'none'}")
+
+    if args.max_seconds is not None and total > args.max_seconds:
+        print(f"\nFAIL: startup took {total:.2f}s, more than {args.max_seconds:.2f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+End-to-end throughput benchmark against the local mock Vertex endpoint.
+Runs process_folder (at several concurrency levels) and batch_process.py on a
+synthetic page set and reports pages/sec, p50/p95/p99 request latency, error
+counts and peak memory. Needs no credentials or network access.
+
+Usage:
+    python benchmarks/bench_throughput.py
+    python benchmarks/bench_throughput.py --pages 100 --workers 1,4,8,16 \\
+        --latency-ms 800 --error-429 0.05 --json report.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+
+from benchmarks.bench_decode import make_synthetic_scan
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+
+
+def _peak_rss_mb(who) -> float:
+    """Peak resident set size in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _run_scenario(scenario, input_folder, work_dir, endpoint, queue):
+    """Child process body: run one scenario against the mock endpoint."""
+    import logging
+    import resource
+    from src import llama4_extractor
+    from src.budget import BudgetGovernor, Pricing
+    from src.llama4_extractor import LocalLlama4Extractor
+    from src.rate_limiter import AdaptiveRateLimiter
+    from src.transport import PooledTransport
+
+    # Keep the benchmark output readable and the real journals and spend
+    # ledger untouched; errors are counted from the responses instead
+    logging.disable(logging.CRITICAL)
+    llama4_extractor.JOURNAL_DIR = work_dir / "journal"
+    llama4_extractor.JOURNAL_DIR.mkdir()
+    from src.results_store import ResultsStore
+
+    latencies = []
+
+    class TimingTransport(PooledTransport):
+        """Records the latency of every request that gets an answer."""
+
+        def post_json(self, url, body, headers, timeout=None, stream=False):
+            start = time.perf_counter()
+            response = super().post_json(url, body, headers, timeout, stream)
+            latencies.append((time.perf_counter() - start, response.status_code))
+            return response
+
+    output_folder = work_dir / "output"
+    output_folder.mkdir()
+    # No real quota: the limiter only supplies the backoff after a 429
+    rate_limiter = AdaptiveRateLimiter(requests_per_minute=0, backoff_base=0.2,
+                                       backoff_max=2.0)
+    extractor = LocalLlama4Extractor(
+        rate_limiter=rate_limiter,
+        use_cache=False,
+        use_dedup=False,
+        transport=TimingTransport(pool_size=max(4, scenario["workers"])),
+        endpoint=endpoint,
+        token_provider=StaticTokenProvider(),
+        results_store=ResultsStore(work_dir / "results.sqlite"),
+        budget=BudgetGovernor(work_dir / "budget.sqlite",
+                              Pricing(llama4_extractor.PRICE_INPUT_PER_MILLION,
+                                      llama4_extractor.PRICE_OUTPUT_PER_MILLION))
+    )
+
+    baseline_rss = _peak_rss_mb(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if scenario["mode"] == "process_folder":
+            results = extractor.process_folder(input_folder, output_folder,
+                                               max_workers=scenario["workers"],
+                                               job_name="bench", resume=False)
+            failed = sum(1 for text in results.values() if text.startswith("ERROR"))
+        else:
+            import batch_process
+            summary = batch_process.batch_process_with_delay(
+                input_folder, output_folder, extractor=extractor,
+                journal_path=work_dir / "journal" / "bench.jsonl"
+            )
+            failed = summary["failed"]
+    wall = time.perf_counter() - start
+
+    queue.put({
+        "wall_seconds": wall,
+        "failed_pages": failed,
+        "latencies": [latency for latency, status in latencies if status == 200],
+        "status_counts": {str(status): sum(1 for _, s in latencies if s == status)
+                          for status in {s for _, s in latencies}},
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_child_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    })
+
+
+def run_scenario(scenario, input_folder, endpoint):
+    """Run a scenario in a fresh process so peak memory is its own."""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    with tempfile.TemporaryDirectory() as work_dir:
+        process = ctx.Process(target=_run_scenario,
+                              args=(scenario, input_folder, Path(work_dir), endpoint, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+    return result
+
+
+def summarize(scenario, result, pages):
+    """Turn raw scenario results into the reported metrics."""
+    latencies = np.array(result["latencies"]) * 1000
+    percentiles = np.percentile(latencies, [50, 95, 99]) if latencies.size else [None] * 3
+    return {
+        "scenario": scenario["name"],
+        "pages": pages,
+        "wall_seconds": round(result["wall_seconds"], 3),
+        "pages_per_second": round((pages - result["failed_pages"]) / result["wall_seconds"], 3),
+        "p50_ms": percentiles[0], "p95_ms": percentiles[1], "p99_ms": percentiles[2],
+        "failed_pages": result["failed_pages"],
+        "status_counts": result["status_counts"],
+        "peak_rss_mb": result["peak_rss_mb"],
+        "peak_child_rss_mb": result["peak_child_rss_mb"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", type=int, default=24, help="Synthetic pages to process")
+    parser.add_argument("--page-size", default="1700x2200",
+                        help="Synthetic page size in pixels (WxH)")
+    parser.add_argument("--workers", default="1,4,8",
+                        help="Comma-separated process_folder concurrency levels")
+    parser.add_argument("--skip-batch", action="store_true",
+                        help="Do not benchmark batch_process.py")
+    parser.add_argument("--latency-ms", type=float, default=300.0,
+                        help="Median mock response latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.4,
+                        help="Log-normal spread of the latency (0 = constant)")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Fraction of 429 answers")
+    parser.add_argument("--error-500", type=float, default=0.0, help="Fraction of 500 answers")
+    parser.add_argument("--bytes-per-second", type=float, default=0.0,
+                        help="Mock response bandwidth (0 = unlimited)")
+    parser.add_argument("--json", type=Path, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    config = MockConfig(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                        error_429_rate=args.error_429, error_500_rate=args.error_500,
+                        bytes_per_second=args.bytes_per_second)
+    scenarios = [{"name": f"process_folder x{w}", "mode": "process_folder", "workers": int(w)}
+                 for w in args.workers.split(",")]
+    if not args.skip_batch:
+        scenarios.append({"name": "batch_process.py", "mode": "batch_process", "workers": 1})
+
+    width, height = (int(v) for v in args.page_size.split("x"))
+    report = []
+
+    with tempfile.TemporaryDirectory() as tmp, MockVertexServer(config) as server:
+        input_folder = Path(tmp) / "pages"
+        input_folder.mkdir()
+        for i in range(args.pages):
+            make_synthetic_scan(input_folder / f"page_{i:04d}.jpg", (width, height))
+
+        print("Throughput Benchmark: extractor against the local mock endpoint")
+        print("=" * 60)
+        print(f"{args.pages} pages of {width}x{height}, mock latency {args.latency_ms:.0f} ms "
+              f"(sigma {args.latency_sigma}), 429 rate {args.error_429:.0%}, "
+              f"500 rate {args.error_500:.0%}\n")
+
+        for scenario in scenarios:
+            result = summarize(scenario, run_scenario(scenario, input_folder, server.url),
+                               args.pages)
+            report.append(result)
+
+            print(f"{result['scenario']}:")
+            print(f"  Throughput: {result['pages_per_second']:.2f} pages/sec "
+                  f"({result['wall_seconds']:.1f}s, {result['failed_pages']} failed)")
+            if result["p50_ms"] is not None:
+                print(f"  Latency:    p50 {result['p50_ms']:.0f} ms, p95 {result['p95_ms']:.0f} ms, "
+                      f"p99 {result['p99_ms']:.0f} ms")
+            print(f"  Responses:  {result['status_counts']}")
+            if result["peak_rss_mb"] is not None:
+                print(f"  Peak RSS:   {result['peak_rss_mb']:.1f} MB "
+                      f"(prep workers: {result['peak_child_rss_mb']:.1f} MB)")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"\nReport saved to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
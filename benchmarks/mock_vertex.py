@@ -0,0 +1,228 @@
+"""
+Local stand-in for the Vertex AI Llama 4 endpoint.
+Answers generateContent and streamGenerateContent requests with the same
+response shape as the real API, including usageMetadata, so the extractor
+can be benchmarked without credentials, network access or quota.
+
+Latency, HTTP 429/500 error rates and slow connections are configurable.
+
+Usage:
+    python benchmarks/mock_vertex.py --port 8765 --latency-ms 800 --error-429 0.05
+
+Then point the extractor at it:
+    LocalLlama4Extractor(endpoint="http://127.0.0.1:8765/v1/mock:generateContent",
+                         token_provider=StaticTokenProvider())
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock endpoint."""
+    # Median response latency and spread (log-normal sigma; 0 = constant)
+    latency_ms: float = 500.0
+    latency_sigma: float = 0.4
+    # Extra latency per output token, so long pages take longer
+    ms_per_output_token: float = 0.0
+    # Fraction of requests answered with HTTP 429 / HTTP 500
+    error_429_rate: float = 0.0
+    error_500_rate: float = 0.0
+    # Response bandwidth in bytes/second (0 = unlimited) to simulate slow links
+    bytes_per_second: float = 0.0
+    # Output tokens per answer and input tokens per KB of base64 image
+    output_tokens: int = 400
+    input_tokens_per_kb: float = 1.3
+    seed: int = 0
+
+
+def _make_text(output_tokens: int) -> str:
+    """Deterministic page-like text of roughly output_tokens tokens."""
+    words = ["the", "quick", "brown", "fox", "jumps", "over", "a", "lazy", "dog"]
+    lines = []
+    for i in range(max(1, output_tokens // 10)):
+        lines.append(" ".join(words[(i + j) % len(words)] for j in range(8)) + ".")
+    return "\n".join(lines)
+
+
+class MockVertexServer:
+    """
+    Threaded HTTP server speaking the generateContent request/response shape.
+
+    Use as a context manager; url is the generateContent URL to pass to
+    LocalLlama4Extractor(endpoint=...). Counters of answered requests by
+    status are kept in stats.
+    """
+
+    def __init__(self, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"200": 0, "429": 0, "500": 0, "400": 0}
+        self._text = _make_text(self.config.output_tokens)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                server._handle(self, body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/projects/mock/locations/local/publishers/meta/models/mock:generateContent"
+
+    def _draw(self):
+        """Random latency and error outcome for one request."""
+        config = self.config
+        with self._rng_lock:
+            roll = self._rng.random()
+            jitter = self._rng.gauss(0, config.latency_sigma) if config.latency_sigma else 0.0
+        latency = config.latency_ms / 1000 * math.exp(jitter)
+        if roll < config.error_429_rate:
+            return latency, 429
+        if roll < config.error_429_rate + config.error_500_rate:
+            return latency, 500
+        return latency, 200
+
+    def _count(self, status: int):
+        with self._rng_lock:
+            self.stats[str(status)] += 1
+
+    def _send(self, handler, status: int, payload: bytes, content_type: str):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        self._write_slowly(handler, payload)
+
+    def _write_slowly(self, handler, payload: bytes):
+        """Write the payload, throttled to bytes_per_second if configured."""
+        rate = self.config.bytes_per_second
+        if not rate:
+            handler.wfile.write(payload)
+            return
+        chunk = max(1, int(rate / 20))
+        for start in range(0, len(payload), chunk):
+            handler.wfile.write(payload[start:start + chunk])
+            handler.wfile.flush()
+            time.sleep(chunk / rate)
+
+    def _handle(self, handler, body: bytes):
+        try:
+            request = json.loads(body)
+            image = request["contents"][0]["parts"][1]["inlineData"]["data"]
+        except (ValueError, KeyError, IndexError):
+            self._count(400)
+            self._send(handler, 400, b'{"error": {"code": 400, "message": "bad request"}}',
+                       "application/json")
+            return
+
+        latency, status = self._draw()
+        if status != 200:
+            # Errors come back after a fraction of the normal latency
+            time.sleep(latency / 4)
+            self._count(status)
+            message = {"error": {"code": status, "message": "mock error"}}
+            self._send(handler, status, json.dumps(message).encode(), "application/json")
+            return
+
+        input_tokens = int(len(image) / 1024 * self.config.input_tokens_per_kb) + 60
+        output_tokens = self.config.output_tokens
+        usage = {"promptTokenCount": input_tokens,
+                 "candidatesTokenCount": output_tokens,
+                 "totalTokenCount": input_tokens + output_tokens}
+        time.sleep(latency + output_tokens * self.config.ms_per_output_token / 1000)
+        self._count(200)
+
+        if ":streamGenerateContent" in handler.path:
+            events = []
+            lines = self._text.split("\n")
+            for i, line in enumerate(lines):
+                event = {"candidates": [{"content": {"role": "model",
+                                                     "parts": [{"text": line + "\n"}]}}]}
+                if i == len(lines) - 1:
+                    event["candidates"][0]["finishReason"] = "STOP"
+                    event["usageMetadata"] = usage
+                events.append(f"data: {json.dumps(event)}\n\n")
+            self._send(handler, 200, "".join(events).encode(), "text/event-stream")
+            return
+
+        response = {"candidates": [{"content": {"role": "model",
+                                                "parts": [{"text": self._text}]},
+                                    "finishReason": "STOP"}],
+                    "usageMetadata": usage}
+        self._send(handler, 200, json.dumps(response).encode(), "application/json")
+
+    def start(self) -> "MockVertexServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class StaticTokenProvider:
+    """Token provider stand-in for the mock server (no credentials needed)."""
+
+    def auth_headers(self) -> Dict[str, str]:
+        return {"Authorization": "Bearer mock-token"}
+
+    def invalidate(self):
+        pass
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--bytes-per-second", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    args = parser.parse_args(argv)
+
+    config = MockConfig(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                        error_429_rate=args.error_429, error_500_rate=args.error_500,
+                        bytes_per_second=args.bytes_per_second,
+                        output_tokens=args.output_tokens)
+    with MockVertexServer(config, port=args.port) as server:
+        print(f"Mock Vertex endpoint listening at {server.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(f"\nAnswered: {server.stats}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,47 +2,49 @@
 Configuration settings for the Llama 4 text extraction project.
 This module loads settings from environment variables and provides
 them to the rest of the application.
+
+Importing it has no side effects: the .env file is read without changing
+os.environ, nothing is printed and no directories are created. Command-line
+entry points call ensure_directories() and configure_logging() themselves,
+and can report settings_warnings().
 """
 
 import os
-import sys
+import logging
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Dict, List, Optional
+from dotenv import dotenv_values
 
-# Load environment variables from .env file
-# The .env file should be in the project root
+# Read environment variables from the .env file in the project root;
+# variables set in the environment take precedence
 project_root = Path(__file__).parent.parent
 env_path = project_root / '.env'
+_env: Dict[str, str] = {key: value for key, value in dotenv_values(env_path).items()
+                        if value is not None} if env_path.exists() else {}
+
+
+def _getenv(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Setting from the environment, else from .env, else the default."""
+    return os.environ.get(name, _env.get(name, default))
 
-if env_path.exists():
-    load_dotenv(env_path)
-    print(f"Loaded environment variables from: {env_path}")
-else:
-    print(f"Warning: No .env file found at {env_path}")
-    print("Please create one using .env.example as a template")
 
 # Project paths - using Path objects for cross-platform compatibility
 PROJECT_ROOT = project_root
 INPUT_DIR = PROJECT_ROOT / "data" / "input"
 OUTPUT_DIR = PROJECT_ROOT / "data" / "output"
 LOG_DIR = PROJECT_ROOT / "logs"
-
-# Create directories if they don't exist
-for directory in [INPUT_DIR, OUTPUT_DIR, LOG_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
+JOURNAL_DIR = PROJECT_ROOT / "data" / "journal"  # Per-job progress journals
+BATCH_DIR = PROJECT_ROOT / "data" / "batches"  # Offline batch-job request/result files
+RESULTS_DB = PROJECT_ROOT / "data" / "results.sqlite"  # Append-only store of page results
 
 # Google Cloud settings
-PROJECT_ID = os.getenv('GOOGLE_CLOUD_PROJECT')
-LOCATION = os.getenv('GCP_LOCATION', 'us-central1')
-CREDENTIALS_PATH = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-
-# Validate critical settings
-if not PROJECT_ID:
-    print("Warning: GOOGLE_CLOUD_PROJECT not set in environment")
-if not CREDENTIALS_PATH:
-    print("Warning: GOOGLE_APPLICATION_CREDENTIALS not set in environment")
-elif not Path(CREDENTIALS_PATH).exists():
-    print(f"Warning: Credentials file not found at {CREDENTIALS_PATH}")
+PROJECT_ID = _getenv('GOOGLE_CLOUD_PROJECT')
+LOCATION = _getenv('GCP_LOCATION', 'us-central1')
+# Regions requests are spread across (comma-separated; the first is the primary)
+GCP_LOCATIONS = [location.strip() for location in _getenv('GCP_LOCATIONS', LOCATION).split(',')
+                 if location.strip()]
+CREDENTIALS_PATH = _getenv('GOOGLE_APPLICATION_CREDENTIALS')
+TOKEN_REFRESH_MARGIN_SECONDS = 300  # Refresh access tokens this long before expiry
 
 # Model settings for Llama 4
 MODEL_ID = "llama-4-maverick-17b-128e-instruct-maas"
@@ -54,7 +56,164 @@ TOP_K = 40
 # Image processing settings
 MAX_IMAGE_SIZE = (1024, 1024)  # Maximum dimensions for API
 IMAGE_QUALITY = 85  # JPEG quality when resizing
+# Decode large scans at reduced scale (JPEG draft mode) before the final resample
+FAST_DECODE = _getenv('FAST_DECODE', 'true').lower() in ('1', 'true', 'yes')
+
+# Adaptive resolution - send each page at the smallest size and quality that
+# keeps its text legible (MAX_IMAGE_SIZE and IMAGE_QUALITY become upper bounds)
+ADAPTIVE_RESOLUTION = _getenv('ADAPTIVE_RESOLUTION', 'false').lower() in ('1', 'true', 'yes')
+ADAPTIVE_MIN_QUALITY = 60  # Lowest JPEG quality adaptive mode may choose
+ADAPTIVE_MIN_STROKE_PX = 1.5  # Text stroke width (pixels) to keep after resizing
+
+# Page tiling - split tall or dense pages into overlapping tiles that are
+# extracted in parallel and stitched back together
+# 'off', 'auto' (tall pages, and pages whose output hit MAX_OUTPUT_TOKENS) or 'always'
+TILING_MODE = _getenv('TILING_MODE', 'off').lower()
+TILE_ROWS = 2  # Tile rows (tall pages get at least one row per page width)
+TILE_COLUMNS = 1  # Use 2 for two-column layouts
+TILE_OVERLAP = 0.08  # Vertical overlap between tiles, as a fraction of tile height
+TILE_TALL_RATIO = 1.6  # Height/width ratio from which 'auto' tiles a page
+TILE_WORKERS = 4  # Tiles of one page extracted concurrently (within the request limit)
+
+# Preprocessing pipeline settings
+# Worker processes preparing images ahead of the API requests (0 = prepare inline)
+PREPROCESS_WORKERS = int(_getenv('PREPROCESS_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Pages prepared ahead of the in-flight requests; bounds memory on large scans
+PREFETCH_DEPTH = int(_getenv('PREFETCH_DEPTH', '8'))
+
+# Concurrency settings
+# Number of pages that may have an API request in flight at the same time
+MAX_CONCURRENT_REQUESTS = int(_getenv('MAX_CONCURRENT_REQUESTS', '4'))
+
+# Streaming - use streamGenerateContent and write text to the output file as it arrives
+STREAM_RESPONSES = _getenv('STREAM_RESPONSES', 'false').lower() in ('1', 'true', 'yes')
+
+# HTTP transport settings
+HTTP_POOL_SIZE = int(_getenv('HTTP_POOL_SIZE', str(MAX_CONCURRENT_REQUESTS)))
+HTTP_CONNECT_TIMEOUT = float(_getenv('HTTP_CONNECT_TIMEOUT', '10'))  # seconds
+HTTP_READ_TIMEOUT = float(_getenv('HTTP_READ_TIMEOUT', '120'))  # seconds
+HTTP_COMPRESS_REQUESTS = _getenv('HTTP_COMPRESS_REQUESTS', 'false').lower() in ('1', 'true', 'yes')
+
+# Rate limiting settings - set these to your Vertex AI quota (0 disables a limit)
+REQUESTS_PER_MINUTE = int(_getenv('REQUESTS_PER_MINUTE', '60'))
+TOKENS_PER_MINUTE = int(_getenv('TOKENS_PER_MINUTE', '200000'))
+MAX_RETRIES = 5  # Retries per request after HTTP 429, 5xx or connection errors in every region
+BACKOFF_BASE_SECONDS = 2.0  # First backoff delay before such a retry
+BACKOFF_MAX_SECONDS = 60.0  # Longest single backoff delay
+
+# Multi-region routing - with several GCP_LOCATIONS, every region gets its own
+# rate limiter and a failing region is taken out of rotation for a while
+REGION_EJECT_AFTER_FAILURES = 3  # Consecutive 429/5xx/connection errors
+REGION_MAX_ERROR_RATE = 0.5  # Moving-average error rate that ejects a region
+REGION_EJECT_SECONDS = float(_getenv('REGION_EJECT_SECONDS', '30'))  # Doubles per ejection
+REGION_EJECT_MAX_SECONDS = 300.0
+REGION_HEALTH_CHECK_TIMEOUT = 10.0  # seconds
+
+# Hedged requests - a request slower than HEDGE_PERCENTILE of recent requests
+# gets one duplicate and the first answer wins. At most HEDGE_MAX_FRACTION of
+# the requests are hedged; the tokens of unused copies are reported as wasted.
+HEDGE_ENABLED = _getenv('HEDGE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+HEDGE_PERCENTILE = float(_getenv('HEDGE_PERCENTILE', '95'))
+HEDGE_MAX_FRACTION = float(_getenv('HEDGE_MAX_FRACTION', '0.05'))
+HEDGE_WINDOW = 200  # Recent latencies the percentile is taken over
+HEDGE_MIN_SAMPLES = 20  # Latencies needed before the first hedge
+
+# Pricing and budgets - spend is tracked per request from usageMetadata and
+# recorded in BUDGET_DB (shared by all runs and workers). A request that would
+# exceed BUDGET_JOB_USD stops the job; BUDGET_DAILY_USD pauses until the next
+# day and BUDGET_TOKENS_PER_MINUTE until the last minute's usage allows it.
+# 0 disables a limit. Check current Vertex AI pricing for the model.
+PRICE_INPUT_PER_MILLION = float(_getenv('PRICE_INPUT_PER_MILLION', '0.35'))  # USD per 1M input tokens
+PRICE_OUTPUT_PER_MILLION = float(_getenv('PRICE_OUTPUT_PER_MILLION', '1.15'))  # USD per 1M output tokens
+BUDGET_DB = PROJECT_ROOT / _getenv('BUDGET_DB', 'data/budget.sqlite')  # Relative to the project root
+BUDGET_JOB_USD = float(_getenv('BUDGET_JOB_USD', '0'))
+BUDGET_DAILY_USD = float(_getenv('BUDGET_DAILY_USD', '0'))
+BUDGET_TOKENS_PER_MINUTE = int(_getenv('BUDGET_TOKENS_PER_MINUTE', '0'))
+BUDGET_REPORT_PAGES = 20  # Log the spend and cost projection every this many pages
+
+# Result cache settings - identical requests are answered from disk
+CACHE_DIR = PROJECT_ROOT / "data" / "cache"
+CACHE_ENABLED = _getenv('CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CACHE_MAX_SIZE_MB = int(_getenv('CACHE_MAX_SIZE_MB', '500'))
+CACHE_MAX_AGE_DAYS = int(_getenv('CACHE_MAX_AGE_DAYS', '30'))
+
+# Near-duplicate detection - pages that look like an already extracted page
+# (rescans, copies of a book from another source) reuse its text
+DEDUP_DB = PROJECT_ROOT / "data" / "duplicates.sqlite"
+DEDUP_ENABLED = _getenv('DEDUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+DEDUP_MAX_DISTANCE = int(_getenv('DEDUP_MAX_DISTANCE', '6'))  # Bits of the 64-bit page hash
+DEDUP_MAX_DETAIL_DISTANCE = 40  # Bits of the 256-bit hash that confirms a match
+
+# Blank/low-content page pre-filter - blank versos, separator sheets and
+# full-page images are skipped without an API call. Check what would be
+# skipped with `python page_filter_report.py` before turning it on.
+PAGE_FILTER_ENABLED = _getenv('PAGE_FILTER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PAGE_FILTER_BLANK_MAX_INK = float(_getenv('PAGE_FILTER_BLANK_MAX_INK', '0.002'))  # Ink coverage fraction
+PAGE_FILTER_UNIFORM_MAX_STD = float(_getenv('PAGE_FILTER_UNIFORM_MAX_STD', '3.0'))  # Brightness std dev
+PAGE_FILTER_IMAGE_MIN_INK = float(_getenv('PAGE_FILTER_IMAGE_MIN_INK', '0.3'))
+PAGE_FILTER_IMAGE_MAX_EDGES = float(_getenv('PAGE_FILTER_IMAGE_MAX_EDGES', '6.0'))  # Gray levels per pixel
+
+# Hot-folder watch mode (watch_folder.py) - new pages are extracted as soon as
+# they are fully written; inotify is used on Linux, polling elsewhere
+WATCH_USE_INOTIFY = _getenv('WATCH_USE_INOTIFY', 'true').lower() in ('1', 'true', 'yes')
+WATCH_POLL_INTERVAL_SECONDS = float(_getenv('WATCH_POLL_INTERVAL_SECONDS', '2'))
+# A file unmodified this long counts as fully written (when polling)
+WATCH_SETTLE_SECONDS = float(_getenv('WATCH_SETTLE_SECONDS', '2'))
+
+# Shared work queue (queue_worker.py) - several worker processes or hosts
+# claim the pages of a job under leases; a lease not renewed within
+# QUEUE_LEASE_SECONDS (worker crashed) makes the page claimable again.
+# Point QUEUE_DB at a shared filesystem to spread a job across machines.
+QUEUE_DB = PROJECT_ROOT / _getenv('QUEUE_DB', 'data/queue.sqlite')  # Relative to the project root
+QUEUE_LEASE_SECONDS = float(_getenv('QUEUE_LEASE_SECONDS', '120'))
+QUEUE_MAX_ATTEMPTS = int(_getenv('QUEUE_MAX_ATTEMPTS', '3'))  # Claims per page before it fails
+QUEUE_POLL_SECONDS = 5.0  # How often an idle worker checks for new or expired work
+
+# Offline batch-job settings
+BATCH_SHARD_SIZE = 500  # Request lines per JSONL shard
+BATCH_GCS_URI = _getenv('BATCH_GCS_URI')  # gs://bucket/prefix for Vertex AI batch jobs
+BATCH_POLL_SECONDS = 60  # How often to check on a running batch job
+
+# Stage timing metrics - a Prometheus text file and a JSON report are written
+# to METRICS_DIR after every run; METRICS_PORT > 0 also serves /metrics over HTTP
+METRICS_DIR = LOG_DIR / "metrics"
+METRICS_PORT = int(_getenv('METRICS_PORT', '0'))
 
 # Logging configuration
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVEL = _getenv('LOG_LEVEL', 'INFO')
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def ensure_directories():
+    """Create the data and log directories if they don't exist."""
+    for directory in [INPUT_DIR, OUTPUT_DIR, LOG_DIR, JOURNAL_DIR, BATCH_DIR]:
+        directory.mkdir(parents=True, exist_ok=True)
+
+
+def configure_logging(log_file: Optional[Path] = LOG_DIR / 'extraction.log'):
+    """
+    Log to the console and, unless log_file is None, to a file.
+
+    Args:
+        log_file: File the log is appended to (defaults to logs/extraction.log)
+    """
+    handlers = [logging.StreamHandler()]
+    if log_file is not None:
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        handlers.insert(0, logging.FileHandler(log_file))
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, handlers=handlers)
+
+
+def settings_warnings() -> List[str]:
+    """Problems with critical settings, for the entry points to report."""
+    warnings = []
+    if not env_path.exists():
+        warnings.append(f"No .env file found at {env_path}; "
+                        f"please create one using .env.example as a template")
+    if not PROJECT_ID:
+        warnings.append("GOOGLE_CLOUD_PROJECT not set in environment")
+    if not CREDENTIALS_PATH:
+        warnings.append("GOOGLE_APPLICATION_CREDENTIALS not set in environment")
+    elif not Path(CREDENTIALS_PATH).exists():
+        warnings.append(f"Credentials file not found at {CREDENTIALS_PATH}")
+    return warnings
@@ -0,0 +1,122 @@
+"""
+Offline batch-job script for very large runs.
+Writes the requests for a folder to JSONL shards, submits them as one
+asynchronous batch prediction job and ingests the results into the usual
+per-page output files once the job has finished.
+
+Usage:
+    python offline_batch.py submit [--job NAME]
+    python offline_batch.py status --job NAME
+    python offline_batch.py collect --job NAME [--wait]
+
+Add --local-dir DIR to run the job in a local folder instead of Vertex AI
+(results are then expected as JSONL files in DIR/<job id>/output). The
+spend of such jobs is not real and stays out of the budget ledger.
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.append(str(project_root))
+
+from src.llama4_extractor import LocalLlama4Extractor
+from src.budget import BudgetGovernor, Pricing
+from src.batch_jobs import (LocalDirectoryBackend, LocalTokenProvider,
+                            VertexBatchBackend, STATE_RUNNING, STATE_SUCCEEDED,
+                            load_manifest)
+from config.settings import (INPUT_DIR, OUTPUT_DIR, BATCH_DIR, BATCH_GCS_URI,
+                             BATCH_POLL_SECONDS, PROJECT_ID, LOCATION, MODEL_ID,
+                             PRICE_INPUT_PER_MILLION, PRICE_OUTPUT_PER_MILLION,
+                             configure_logging, ensure_directories)
+
+JOB_FILE = "job.json"
+
+
+def make_extractor(local_dir: Path = None) -> LocalLlama4Extractor:
+    """
+    Extractor that writes the requests and ingests the results.
+
+    Jobs in a local folder make no API calls, so they need no credentials,
+    and their usage is recorded in an in-memory ledger rather than BUDGET_DB.
+    """
+    if local_dir:
+        return LocalLlama4Extractor(
+            token_provider=LocalTokenProvider(),
+            budget=BudgetGovernor(":memory:", Pricing(PRICE_INPUT_PER_MILLION,
+                                                      PRICE_OUTPUT_PER_MILLION)))
+    return LocalLlama4Extractor()
+
+
+def make_backend(extractor: LocalLlama4Extractor, local_dir: Path = None):
+    """Local folder backend if requested, otherwise Vertex AI batch prediction."""
+    if local_dir:
+        return LocalDirectoryBackend(local_dir)
+    if not BATCH_GCS_URI:
+        raise ValueError("BATCH_GCS_URI not set. Please update your .env file.")
+    return VertexBatchBackend(PROJECT_ID, LOCATION, MODEL_ID, BATCH_GCS_URI,
+                              extractor.credentials, extractor.token_provider,
+                              extractor.transport)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("command", choices=["submit", "status", "collect"])
+    parser.add_argument("--job", help="Job name (defaults to the input folder name)")
+    parser.add_argument("--input", type=Path, default=INPUT_DIR,
+                        help="Folder with the pages to submit")
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR,
+                        help="Folder to write the extracted text to")
+    parser.add_argument("--local-dir", type=Path,
+                        help="Run jobs in this local folder instead of Vertex AI")
+    parser.add_argument("--wait", action="store_true",
+                        help="When collecting, wait for a running job to finish")
+    args = parser.parse_args()
+
+    ensure_directories()
+    configure_logging()
+
+    job_name = args.job or args.input.name
+    job_dir = BATCH_DIR / job_name
+    extractor = make_extractor(args.local_dir)
+    backend = make_backend(extractor, args.local_dir)
+
+    if args.command == "submit":
+        job_dir = extractor.write_batch_requests(args.input, job_name)
+        shards = [job_dir / name for name in load_manifest(job_dir)["shards"]]
+        if not shards:
+            print("Nothing to submit: every page is already completed")
+            return
+        job_id = backend.submit(job_name, shards)
+        (job_dir / JOB_FILE).write_text(json.dumps({"job_id": job_id}), encoding='utf-8')
+        print(f"Submitted {len(shards)} shards as job {job_id}")
+        return
+
+    job_id = json.loads((job_dir / JOB_FILE).read_text(encoding='utf-8'))["job_id"]
+    state = backend.state(job_id)
+
+    if args.command == "status":
+        print(f"Job {job_id}: {state}")
+        return
+
+    while args.wait and state == STATE_RUNNING:
+        print(f"Job {job_id} still running, checking again in {BATCH_POLL_SECONDS}s...")
+        time.sleep(BATCH_POLL_SECONDS)
+        state = backend.state(job_id)
+
+    if state != STATE_SUCCEEDED:
+        print(f"Job {job_id} is {state}; nothing to collect yet")
+        return
+
+    result_files = backend.download_results(job_id, job_dir / "results")
+    summary = extractor.ingest_batch_results(job_dir, result_files, args.output)
+    done = sum(1 for page in summary["pages"] if page["status"] == "done")
+    print(f"Collected {done}/{len(summary['pages'])} pages "
+          f"({summary['total_tokens']:,} tokens) into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
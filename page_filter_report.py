@@ -0,0 +1,117 @@
+"""
+Dry run of the blank/low-content page pre-filter.
+Classifies every page of a folder with the configured thresholds, without
+calling the API, and reports which pages would be skipped and why, with the
+tokens that skipping them would save.
+
+Usage:
+    python page_filter_report.py [--input FOLDER] [--job NAME]
+
+Tune the PAGE_FILTER_* thresholds in .env until only pages without text are
+listed, then set PAGE_FILTER_ENABLED=true.
+"""
+
+import sys
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.append(str(project_root))
+
+from src.documents import iter_folder_pages
+from src.image_prep import classify_page_file
+from src.llama4_extractor import page_filter_thresholds
+from src.page_filter import SKIP_DESCRIPTIONS
+from src.results_store import ResultsStore
+from config.settings import (INPUT_DIR, OUTPUT_DIR, RESULTS_DB, MAX_IMAGE_SIZE,
+                             PREPROCESS_WORKERS, PAGE_FILTER_ENABLED,
+                             configure_logging, ensure_directories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--input", type=Path, default=INPUT_DIR,
+                        help="Folder with the pages to classify")
+    parser.add_argument("--job", help="Job whose earlier results estimate the tokens "
+                                      "saved (defaults to the input folder name)")
+    parser.add_argument("--report", type=Path, default=OUTPUT_DIR / "page_filter_report.txt",
+                        help="Where to write the report")
+    args = parser.parse_args()
+
+    ensure_directories()
+    configure_logging()
+
+    job = args.job or args.input.name
+    thresholds = page_filter_thresholds()
+    pages = list(iter_folder_pages(args.input))
+    print(f"Classifying {len(pages)} pages in {args.input}...")
+
+    with ProcessPoolExecutor(max_workers=max(1, PREPROCESS_WORKERS)) as executor:
+        verdicts = list(executor.map(classify_page_file,
+                                     [page.path for page in pages],
+                                     [thresholds] * len(pages),
+                                     [page.page_index for page in pages],
+                                     [MAX_IMAGE_SIZE] * len(pages)))
+
+    # Tokens the flagged pages used in earlier runs, or else the job's
+    # average per page, give the savings of skipping them
+    with ResultsStore(RESULTS_DB) as store:
+        job_summary = store.summary(job=job)
+        average_tokens = job_summary["total_tokens"] / job_summary["done"] \
+            if job_summary["done"] else None
+
+        flagged = []
+        for page, (reason, stats) in zip(pages, verdicts):
+            if not reason:
+                continue
+            record = store.latest(job, page.key)
+            tokens = record["total_tokens"] if record and record["status"] == "done" \
+                else average_tokens
+            flagged.append((page, reason, stats, tokens))
+
+    reasons = Counter(reason for _, reason, _, _ in flagged)
+    known_tokens = [tokens for *_, tokens in flagged if tokens is not None]
+    estimated_savings = sum(known_tokens)
+
+    with open(args.report, 'w', encoding='utf-8') as f:
+        f.write("Page Filter Dry Run\n")
+        f.write("=" * 50 + "\n\n")
+        f.write(f"Input folder: {args.input}\n")
+        f.write(f"Thresholds: blank below {thresholds.blank_max_ink:.2%} ink, "
+                f"uniform below std {thresholds.uniform_max_std}, "
+                f"image from {thresholds.image_min_ink:.0%} ink with edges below "
+                f"{thresholds.image_max_edges}\n\n")
+
+        f.write("Pages that would be skipped:\n")
+        f.write("-" * 30 + "\n")
+        for page, reason, stats, tokens in flagged:
+            f.write(f"{page.key}: {SKIP_DESCRIPTIONS[reason]} "
+                    f"(ink {stats['ink_coverage']:.2%}, std {stats['std']:.1f}, "
+                    f"edges {stats['edge_density']:.1f})")
+            f.write(f", ~{tokens:,.0f} tokens\n" if tokens is not None else "\n")
+
+        f.write("\nSummary:\n")
+        f.write("-" * 30 + "\n")
+        f.write(f"Pages classified: {len(pages)}\n")
+        f.write(f"Pages that would be skipped: {len(flagged)}\n")
+        for reason, count in reasons.most_common():
+            f.write(f"  {SKIP_DESCRIPTIONS[reason]}: {count}\n")
+        if known_tokens:
+            f.write(f"Estimated tokens saved: {estimated_savings:,.0f} "
+                    f"(from job '{job}' in the results store)\n")
+        else:
+            f.write(f"Estimated tokens saved: unknown (no results for job '{job}' yet)\n")
+
+    print(f"{len(flagged)} of {len(pages)} pages would be skipped", end="")
+    print(f", saving ~{estimated_savings:,.0f} tokens" if known_tokens else "")
+    for reason, count in reasons.most_common():
+        print(f"  {SKIP_DESCRIPTIONS[reason]}: {count}")
+    if not PAGE_FILTER_ENABLED:
+        print("The filter is off; set PAGE_FILTER_ENABLED=true to skip these pages")
+    print(f"Report saved to: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
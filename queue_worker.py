@@ -0,0 +1,79 @@
+"""
+Shared work queue for running one job on several workers.
+Enqueue the pages of a folder once, then start as many workers as you like,
+on this machine or on others that see the same folders (set QUEUE_DB to a
+path on the shared filesystem). Workers claim pages under leases; the pages
+of a worker that crashes are picked up by the others when its leases expire.
+
+Usage:
+    python queue_worker.py enqueue [--input DIR] [--job NAME]
+    python queue_worker.py work --job NAME [--workers N]
+    python queue_worker.py status --job NAME
+    python queue_worker.py retry --job NAME
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.append(str(project_root))
+
+from src.llama4_extractor import LocalLlama4Extractor
+from src.work_queue import WorkQueue
+from config.settings import (INPUT_DIR, OUTPUT_DIR, QUEUE_DB, QUEUE_LEASE_SECONDS,
+                             QUEUE_MAX_ATTEMPTS, MAX_CONCURRENT_REQUESTS,
+                             configure_logging, ensure_directories, settings_warnings)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("command", choices=["enqueue", "work", "status", "retry"])
+    parser.add_argument("--job", help="Job name (defaults to the input folder name)")
+    parser.add_argument("--input", type=Path, default=INPUT_DIR,
+                        help="Folder with the pages to enqueue")
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR,
+                        help="Folder to write the extracted text to")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help="Concurrent API requests of this worker")
+    parser.add_argument("--queue", type=Path, default=QUEUE_DB,
+                        help="Queue database shared by the workers")
+    args = parser.parse_args()
+
+    ensure_directories()
+    configure_logging()
+
+    job_name = args.job or args.input.name
+    with WorkQueue(args.queue, lease_seconds=QUEUE_LEASE_SECONDS,
+                   max_attempts=QUEUE_MAX_ATTEMPTS) as queue:
+        if args.command == "status":
+            counts = queue.counts(job_name)
+            print(f"Job '{job_name}': {counts['done']} done, {counts['pending']} pending, "
+                  f"{counts['leased']} leased, {counts['failed']} failed")
+            for worker, pages in sorted(queue.workers(job_name).items()):
+                print(f"  {worker}: {pages} pages in progress")
+            return
+
+        if args.command == "retry":
+            print(f"Requeued {queue.retry_failed(job_name)} failed pages of job '{job_name}'")
+            return
+
+        for warning in settings_warnings():
+            logger.warning(warning)
+        extractor = LocalLlama4Extractor()
+        if args.command == "enqueue":
+            added = extractor.enqueue_folder(queue, args.input, job_name)
+            print(f"Queued {added} pages for job '{job_name}' in {args.queue}")
+            return
+
+        extractor.serve_metrics()
+        processed = extractor.process_queue(queue, job_name, args.output,
+                                            max_workers=args.workers)
+        print(f"Processed {processed} pages of job '{job_name}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Token-aware adaptive image resolution.
+Input tokens scale with the size of the image sent to the model, so each
+page is sent at the smallest resolution and JPEG quality at which its text
+strokes stay legible.
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Candidate sizes as fractions of MAX_IMAGE_SIZE, smallest first
+SIZE_STEPS = (0.5, 0.625, 0.75, 0.875, 1.0)
+
+# Runs with fewer dark pixels than this are treated as a page without text
+MIN_RUNS_FOR_ESTIMATE = 200
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Global Otsu threshold of an 8-bit grayscale image."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    levels = np.arange(256)
+
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+
+    between_var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between_var))
+
+
+def estimate_stroke_width(gray: np.ndarray) -> Optional[float]:
+    """
+    Estimate the typical text stroke width in pixels.
+
+    The page is binarised with Otsu's threshold and the median length of
+    horizontal runs of ink is taken as the stroke width. Long runs (rules,
+    table borders, photos) are ignored.
+
+    Args:
+        gray: 8-bit grayscale page as a 2-D array
+
+    Returns:
+        Stroke width in pixels, or None if the page has too little ink
+    """
+    threshold = otsu_threshold(gray)
+    ink = gray <= threshold
+    # Text is dark on light paper; invert pages that are mostly "ink"
+    if ink.mean() > 0.5:
+        ink = ~ink
+
+    padded = np.pad(ink, ((0, 0), (1, 1))).astype(np.int8)
+    edges = np.diff(padded, axis=1)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    runs = ends - starts
+
+    runs = runs[runs <= gray.shape[1] // 20]
+    if runs.size < MIN_RUNS_FOR_ESTIMATE:
+        return None
+    return float(np.median(runs))
+
+
+def choose_settings(img: Image.Image, max_size: Tuple[int, int],
+                    max_quality: int, min_quality: int,
+                    min_stroke_px: float) -> Tuple[Tuple[int, int], int, Optional[float]]:
+    """
+    Pick the smallest bounding box and JPEG quality that keep text legible.
+
+    Args:
+        img: Page image (already reduced close to max_size is fine)
+        max_size: Largest (width, height) box that may be sent
+        max_quality: JPEG quality used for pages with thin strokes
+        min_quality: Lowest JPEG quality used for pages with thick strokes
+        min_stroke_px: Stroke width the text must keep after resizing
+
+    Returns:
+        Tuple of (bounding box, JPEG quality, stroke width at img's scale)
+    """
+    gray = np.asarray(img.convert('L'))
+    stroke_width = estimate_stroke_width(gray)
+
+    # Scale that fits img into the full-size box
+    full_scale = min(1.0, max_size[0] / img.size[0], max_size[1] / img.size[1])
+
+    if stroke_width is None:
+        # Nothing to read: send the smallest image
+        step = SIZE_STEPS[0]
+        quality = min_quality
+    else:
+        step = SIZE_STEPS[-1]
+        for candidate in SIZE_STEPS:
+            if stroke_width * full_scale * candidate >= min_stroke_px:
+                step = candidate
+                break
+
+        # Thin strokes suffer most from JPEG artefacts; use the headroom above
+        # the minimum stroke width to lower the quality gradually
+        margin = stroke_width * full_scale * step / min_stroke_px
+        headroom = min(1.0, max(0.0, margin - 1.0))
+        quality = round(max_quality - (max_quality - min_quality) * headroom)
+
+    box = (max(1, int(max_size[0] * step)), max(1, int(max_size[1] * step)))
+    logger.debug(f"Adaptive settings: stroke width {stroke_width}, box {box}, quality {quality}")
+    return box, quality, stroke_width
@@ -0,0 +1,119 @@
+"""
+Shared access-token management for direct Vertex AI REST calls.
+This module caches the OAuth bearer token and refreshes it only shortly
+before it expires, instead of on every request.
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import google.auth.transport.requests
+from google.oauth2 import service_account
+
+logger = logging.getLogger(__name__)
+
+CLOUD_PLATFORM_SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+
+class AccessTokenProvider:
+    """
+    Thread-safe cache around a google-auth credentials object.
+
+    get_token() returns the cached token while it is valid for longer than
+    the refresh margin. When a refresh is needed, exactly one caller performs
+    it while the others wait on a lock and then reuse the new token. Async
+    code can call get_token_async(), which shares the same lock.
+    """
+
+    def __init__(self, credentials, refresh_margin_seconds: float = 300):
+        """
+        Wrap existing credentials.
+
+        Args:
+            credentials: google-auth credentials (e.g. a service account)
+            refresh_margin_seconds: Refresh this long before the token expires
+        """
+        self.credentials = credentials
+        self.refresh_margin = timedelta(seconds=refresh_margin_seconds)
+
+        self._lock = threading.Lock()
+        # One transport request object is reused for all refreshes
+        self._auth_request = google.auth.transport.requests.Request()
+
+        self.refresh_count = 0
+
+    @classmethod
+    def from_service_account_file(cls, path: str,
+                                  scopes: Optional[List[str]] = None,
+                                  refresh_margin_seconds: float = 300) -> "AccessTokenProvider":
+        """
+        Create a provider from a service account key file.
+
+        Args:
+            path: Path to the service account JSON key
+            scopes: OAuth scopes (defaults to cloud-platform)
+            refresh_margin_seconds: Refresh this long before the token expires
+        """
+        credentials = service_account.Credentials.from_service_account_file(
+            path,
+            scopes=scopes or CLOUD_PLATFORM_SCOPES
+        )
+        return cls(credentials, refresh_margin_seconds)
+
+    def _needs_refresh(self) -> bool:
+        """True if there is no token or it expires within the margin."""
+        token = self.credentials.token
+        expiry = self.credentials.expiry
+        if not token:
+            return True
+        if expiry is None:
+            # Credentials without an expiry never need refreshing
+            return False
+
+        # google-auth stores expiry as a naive UTC datetime
+        if expiry.tzinfo is None:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+        else:
+            now = datetime.now(timezone.utc)
+        return expiry - now <= self.refresh_margin
+
+    def get_token(self) -> str:
+        """
+        Return a bearer token that stays valid for at least the refresh margin.
+
+        Returns:
+            OAuth access token string
+        """
+        # Fast path: no locking while the cached token is still fresh
+        if not self._needs_refresh():
+            return self.credentials.token
+
+        with self._lock:
+            # Another thread may have refreshed while we were waiting
+            if self._needs_refresh():
+                logger.info("Refreshing access token...")
+                self.credentials.refresh(self._auth_request)
+                self.refresh_count += 1
+                logger.debug(f"Access token valid until {self.credentials.expiry}")
+            return self.credentials.token
+
+    async def get_token_async(self) -> str:
+        """Async variant of get_token() that refreshes on a worker thread."""
+        if not self._needs_refresh():
+            return self.credentials.token
+        return await asyncio.to_thread(self.get_token)
+
+    def invalidate(self):
+        """Drop the cached token, e.g. after the API answered 401."""
+        with self._lock:
+            self.credentials.token = None
+
+    def auth_headers(self) -> Dict[str, str]:
+        """Request headers carrying the current bearer token."""
+        return {
+            "Authorization": f"Bearer {self.get_token()}",
+            "Content-Type": "application/json"
+        }
@@ -0,0 +1,459 @@
+"""
+Offline batch-job mode.
+Instead of one synchronous call per page, the generateContent request bodies
+are written to sharded JSONL files and submitted as a single asynchronous
+batch prediction job. When the job has finished, its JSONL results are
+ingested back into per-page output files, journal entries and a token
+summary.
+
+Submission goes through a BatchBackend, so the Vertex AI backend can be
+swapped for LocalDirectoryBackend, which runs jobs in a local folder.
+"""
+
+import json
+import hashlib
+import logging
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.documents import PageRef, iter_folder_pages
+from src.journal import (ProgressJournal, STATUS_DONE, STATUS_FAILED,
+                         source_fingerprint, text_hash)
+from src.responses import parse_response, usage_from_metadata
+from src.tiling import add_token_usage, stitch_tiles
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+# Created once the spend of a job's results has been recorded
+SPEND_MARKER = "spend_recorded"
+
+# Job states reported by BatchBackend.state()
+STATE_RUNNING = "running"
+STATE_SUCCEEDED = "succeeded"
+STATE_FAILED = "failed"
+
+
+def _request_key(page: PageRef, tile: Optional[int] = None) -> str:
+    """Key of one request line: the page key, plus the tile for tiled pages."""
+    return page.key if tile is None else f"{page.key}@tile{tile}"
+
+
+def request_fingerprint(body: Dict) -> str:
+    """
+    Hash of the image data in a request body.
+
+    Used to match result lines that come back without their "key" field to
+    the page they belong to.
+    """
+    digest = hashlib.sha256()
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "inlineData" in part:
+                digest.update(part["inlineData"]["data"].encode('ascii'))
+    return digest.hexdigest()
+
+
+def write_request_shards(extractor, input_folder: Path, job_dir: Path,
+                         job_name: str, shard_size: int = 500,
+                         skip_keys: Optional[set] = None) -> Dict:
+    """
+    Write the request bodies for every page of a folder to JSONL shards.
+
+    Each line is {"key": ..., "request": <generateContent body>}, with the
+    body built by extractor.build_request_body exactly as for a synchronous
+    call. Tiled pages get one line per tile. A manifest next to the shards
+    records which request keys belong to which page, and which pages the
+    pre-filter left out.
+
+    Args:
+        extractor: LocalLlama4Extractor used to prepare pages (prepare) and
+                   build bodies (build_request_body)
+        input_folder: Folder with images and documents
+        job_dir: Folder the shards and manifest are written to
+        job_name: Job name (also names the progress journal)
+        shard_size: Maximum request lines per shard
+        skip_keys: Page keys to leave out (e.g. completed in the journal)
+
+    Returns:
+        The manifest dict (also saved as job_dir/manifest.json)
+    """
+    job_dir.mkdir(parents=True, exist_ok=True)
+    skip_keys = skip_keys or set()
+
+    # Shards of an earlier write must not be submitted with this one, and
+    # the spend of the new job has not been recorded yet
+    for stale in job_dir.glob("requests-*.jsonl"):
+        stale.unlink()
+    (job_dir / SPEND_MARKER).unlink(missing_ok=True)
+
+    manifest = {"job_name": job_name, "created": time.time(),
+                "input_folder": str(input_folder),
+                "shards": [], "pages": [], "skipped": {}, "request_hashes": {}}
+    shard_file = None
+    lines_in_shard = 0
+
+    def write_line(key: str, body: Dict):
+        nonlocal shard_file, lines_in_shard
+        if shard_file is None or lines_in_shard >= shard_size:
+            if shard_file:
+                shard_file.close()
+            shard_path = job_dir / f"requests-{len(manifest['shards']):05d}.jsonl"
+            manifest["shards"].append(shard_path.name)
+            shard_file = open(shard_path, 'w', encoding='utf-8')
+            lines_in_shard = 0
+        shard_file.write(json.dumps({"key": key, "request": body}) + "\n")
+        manifest["request_hashes"][request_fingerprint(body)] = key
+        lines_in_shard += 1
+
+    try:
+        for page in iter_folder_pages(input_folder):
+            if page.key in skip_keys:
+                continue
+
+            prepared = extractor.prepare(page.path, page.page_index)
+            if prepared.skip_reason:
+                # Nothing to extract (see src/page_filter.py)
+                manifest["skipped"][page.key] = prepared.skip_reason
+                continue
+            entry = {"key": page.key, "path": str(page.path),
+                     "page_index": page.page_index,
+                     "output_stem": page.output_stem}
+
+            if prepared.tiles:
+                entry["tile_grid"] = list(prepared.tile_grid)
+                entry["requests"] = []
+                for i, tile in enumerate(prepared.tiles, 1):
+                    key = _request_key(page, i)
+                    write_line(key, extractor.build_request_body(tile.data))
+                    entry["requests"].append(key)
+            else:
+                key = _request_key(page)
+                write_line(key, extractor.build_request_body(prepared.data))
+                entry["requests"] = [key]
+
+            manifest["pages"].append(entry)
+    finally:
+        if shard_file:
+            shard_file.close()
+
+    with open(job_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Wrote {len(manifest['pages'])} pages to "
+                f"{len(manifest['shards'])} request shards in {job_dir}")
+    return manifest
+
+
+def load_manifest(job_dir: Path) -> Dict:
+    """Read the manifest written by write_request_shards."""
+    with open(job_dir / MANIFEST_NAME, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_results(result_files: List[Path]) -> Iterator[Dict]:
+    """
+    Yield the result lines of a batch job.
+
+    Args:
+        result_files: JSONL files downloaded from the backend
+
+    Yields:
+        Dict per line with key, request_hash, text, usage_metadata,
+        truncated and error
+    """
+    for path in result_files:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                result = {"key": record.get("key"),
+                          "request_hash": request_fingerprint(record.get("request", {})),
+                          "text": "",
+                          "usage_metadata": None, "truncated": False,
+                          "error": None}
+                response = record.get("response")
+                if response:
+                    result["text"], result["usage_metadata"], result["truncated"] = \
+                        parse_response(response)
+                else:
+                    # Failed lines carry an error status instead of a response
+                    result["error"] = str(record.get("status") or "no response")
+                yield result
+
+
+def ingest_results(job_dir: Path, result_files: List[Path], output_folder: Path,
+                   journal: ProgressJournal, results_store=None) -> Dict:
+    """
+    Turn the results of a batch job into per-page outputs.
+
+    Every page listed in the manifest gets its output file and a journal
+    entry, exactly as if it had been extracted synchronously; tiles are
+    stitched back together. Pages without a result (or with a failed
+    request) are recorded as failed so a later run can retry them.
+
+    Args:
+        job_dir: Folder holding the job's manifest
+        result_files: JSONL result files of the job
+        output_folder: Folder to write the <page>_extracted.txt files to
+        journal: Progress journal the page outcomes are recorded in
+        results_store: Optional ResultsStore the page outcomes are also
+                       appended to
+
+    Returns:
+        Summary dict with "pages" (per-page key, status and token usage) and
+        the total input/output/total tokens
+    """
+    manifest = load_manifest(job_dir)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    # Only the requests of the manifest are kept, one text per request key
+    wanted = {key for page in manifest["pages"] for key in page["requests"]}
+    results = {}
+    for result in iter_results(result_files):
+        # Fall back to the image hash if the backend dropped the key field
+        key = result["key"] or manifest["request_hashes"].get(result["request_hash"])
+        if key in wanted:
+            results[key] = result
+        else:
+            logger.warning(f"Ignoring result with unknown key: {key}")
+
+    summary = {"pages": [], "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+    for entry in manifest["pages"]:
+        page = PageRef(Path(entry["path"]), entry["page_index"])
+        fingerprint = source_fingerprint(page.path) if page.path.exists() else {}
+        page_results = [results.get(key) for key in entry["requests"]]
+
+        token_usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        for result in page_results:
+            if result:
+                token_usage = add_token_usage(token_usage,
+                                              usage_from_metadata(result["usage_metadata"]))
+
+        errors = [result["error"] if result else "missing from batch results"
+                  for result in page_results if not result or result["error"]]
+        if errors:
+            journal.record(page.key, STATUS_FAILED, error=errors[0],
+                           token_usage=token_usage, **fingerprint)
+            if results_store:
+                results_store.append(journal.path.stem, page, STATUS_FAILED,
+                                     token_usage=token_usage, error=errors[0])
+            logger.error(f"Batch request failed for {page.name}: {errors[0]}")
+            status = "failed"
+        else:
+            texts = [result["text"] for result in page_results]
+            if "tile_grid" in entry:
+                rows, columns = entry["tile_grid"]
+                text = stitch_tiles(texts, rows, columns)
+            else:
+                text = texts[0]
+            if any(result["truncated"] for result in page_results):
+                logger.warning(f"Batch output for {page.name} was truncated")
+
+            output_file = output_folder / f"{entry['output_stem']}_extracted.txt"
+            output_file.write_text(text, encoding='utf-8')
+            journal.record(page.key, STATUS_DONE, output_path=output_file,
+                           token_usage=token_usage, content_hash=text_hash(text),
+                           **fingerprint)
+            if results_store:
+                results_store.append(journal.path.stem, page, STATUS_DONE,
+                                     output_path=output_file, token_usage=token_usage,
+                                     characters=len(text))
+            status = "done"
+
+        summary["pages"].append({"key": page.key, "status": status,
+                                 "error": errors[0] if errors else None,
+                                 **token_usage})
+        for field in ("input_tokens", "output_tokens", "total_tokens"):
+            summary[field] += token_usage[field]
+
+    done = sum(1 for page in summary["pages"] if page["status"] == "done")
+    logger.info(f"Ingested batch results: {done}/{len(summary['pages'])} pages done, "
+                f"{summary['total_tokens']} tokens")
+    return summary
+
+
+class BatchBackend(ABC):
+    """
+    Where batch jobs are run.
+
+    Subclasses submit request shards, report the job state and fetch the
+    result JSONL files once the job has finished.
+    """
+
+    @abstractmethod
+    def submit(self, job_name: str, shard_paths: List[Path]) -> str:
+        """Start a job for the given request shards and return its id."""
+
+    @abstractmethod
+    def state(self, job_id: str) -> str:
+        """STATE_RUNNING, STATE_SUCCEEDED or STATE_FAILED."""
+
+    @abstractmethod
+    def download_results(self, job_id: str, dest_dir: Path) -> List[Path]:
+        """Copy the result JSONL files of a finished job to dest_dir."""
+
+
+class LocalTokenProvider:
+    """Token provider for LocalDirectoryBackend jobs (no credentials needed)."""
+
+    def auth_headers(self) -> Dict[str, str]:
+        return {}
+
+    def invalidate(self):
+        pass
+
+
+class LocalDirectoryBackend(BatchBackend):
+    """
+    Runs batch jobs in a local folder, for tests and dry runs.
+
+    Submitted shards are copied to <root>/<job_id>/input. If a responder is
+    given, it is called with every request body and its answer (a
+    generateContent response dict) is written to <root>/<job_id>/output right
+    away; otherwise the job stays running until result files are placed in
+    the output folder by hand and a SUCCESS marker file is created.
+    """
+
+    SUCCESS_MARKER = "SUCCESS"
+
+    def __init__(self, root: Path,
+                 responder: Optional[Callable[[Dict], Dict]] = None):
+        self.root = Path(root)
+        self.responder = responder
+
+    def submit(self, job_name: str, shard_paths: List[Path]) -> str:
+        job_id = f"{job_name}-{uuid.uuid4().hex[:8]}"
+        input_dir = self.root / job_id / "input"
+        output_dir = self.root / job_id / "output"
+        input_dir.mkdir(parents=True)
+        output_dir.mkdir()
+
+        for shard in shard_paths:
+            shutil.copy(shard, input_dir / shard.name)
+
+        if self.responder:
+            for shard in sorted(input_dir.glob("*.jsonl")):
+                result_path = output_dir / shard.name.replace("requests", "predictions")
+                with open(shard, encoding='utf-8') as src, \
+                        open(result_path, 'w', encoding='utf-8') as dst:
+                    for line in src:
+                        record = json.loads(line)
+                        try:
+                            record["response"] = self.responder(record["request"])
+                        except Exception as e:
+                            record["status"] = str(e)
+                        dst.write(json.dumps(record) + "\n")
+            (output_dir / self.SUCCESS_MARKER).touch()
+
+        return job_id
+
+    def state(self, job_id: str) -> str:
+        if (self.root / job_id / "output" / self.SUCCESS_MARKER).exists():
+            return STATE_SUCCEEDED
+        return STATE_RUNNING
+
+    def download_results(self, job_id: str, dest_dir: Path) -> List[Path]:
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for result in sorted((self.root / job_id / "output").glob("*.jsonl")):
+            paths.append(Path(shutil.copy(result, dest_dir / result.name)))
+        return paths
+
+
+class VertexBatchBackend(BatchBackend):
+    """
+    Runs batch jobs as Vertex AI batch prediction jobs.
+
+    Shards are uploaded to a Cloud Storage prefix, the job is created through
+    the batchPredictionJobs REST API and its predictions are downloaded from
+    the output prefix once the job has succeeded.
+    """
+
+    def __init__(self, project_id: str, location: str, model_id: str,
+                 gcs_uri: str, credentials, token_provider, transport):
+        """
+        Args:
+            project_id: Google Cloud project
+            location: Region the job runs in
+            model_id: Publisher model id (meta models)
+            gcs_uri: gs://bucket/prefix used for job input and output
+            credentials: Service account credentials for Cloud Storage
+            token_provider: AccessTokenProvider for the REST calls
+            transport: PooledTransport the REST calls are sent with
+        """
+        from google.cloud import storage
+
+        if not gcs_uri.startswith("gs://"):
+            raise ValueError(f"BATCH_GCS_URI must start with gs://, got {gcs_uri!r}")
+        bucket_name, _, self.prefix = gcs_uri[len("gs://"):].partition("/")
+        self.prefix = self.prefix.strip("/")
+        self.bucket = storage.Client(project=project_id,
+                                     credentials=credentials).bucket(bucket_name)
+
+        self.model = f"publishers/meta/models/{model_id}"
+        self.jobs_url = (f"https://{location}-aiplatform.googleapis.com/v1/projects/"
+                         f"{project_id}/locations/{location}/batchPredictionJobs")
+        self.token_provider = token_provider
+        self.transport = transport
+
+    def _gcs_path(self, *parts: str) -> str:
+        return "/".join(part for part in (self.prefix,) + parts if part)
+
+    def submit(self, job_name: str, shard_paths: List[Path]) -> str:
+        uris = []
+        for shard in shard_paths:
+            blob = self.bucket.blob(self._gcs_path(job_name, "input", shard.name))
+            blob.upload_from_filename(str(shard))
+            uris.append(f"gs://{self.bucket.name}/{blob.name}")
+
+        body = {
+            "displayName": job_name,
+            "model": self.model,
+            "inputConfig": {"instancesFormat": "jsonl", "gcsSource": {"uris": uris}},
+            "outputConfig": {
+                "predictionsFormat": "jsonl",
+                "gcsDestination": {
+                    "outputUriPrefix": f"gs://{self.bucket.name}/{self._gcs_path(job_name, 'output')}"
+                }
+            }
+        }
+        response = self.transport.post_json(self.jobs_url, body,
+                                            self.token_provider.auth_headers())
+        response.raise_for_status()
+        job_id = response.json()["name"]
+        logger.info(f"Submitted batch prediction job {job_id}")
+        return job_id
+
+    def _get_job(self, job_id: str) -> Dict:
+        url = f"https://{self.jobs_url.split('/')[2]}/v1/{job_id}"
+        response = self.transport.get(url, self.token_provider.auth_headers())
+        response.raise_for_status()
+        return response.json()
+
+    def state(self, job_id: str) -> str:
+        job_state = self._get_job(job_id).get("state", "")
+        if job_state == "JOB_STATE_SUCCEEDED":
+            return STATE_SUCCEEDED
+        if job_state in ("JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"):
+            return STATE_FAILED
+        return STATE_RUNNING
+
+    def download_results(self, job_id: str, dest_dir: Path) -> List[Path]:
+        output_dir = self._get_job(job_id)["outputInfo"]["gcsOutputDirectory"]
+        prefix = output_dir[len(f"gs://{self.bucket.name}/"):]
+
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for blob in self.bucket.client.list_blobs(self.bucket, prefix=prefix):
+            if blob.name.endswith(".jsonl"):
+                path = dest_dir / Path(blob.name).name
+                blob.download_to_filename(str(path))
+                paths.append(path)
+        return paths
@@ -0,0 +1,344 @@
+"""
+Token and cost budget governor for Llama 4 API calls.
+Every request is admitted before it is sent and settled with the token
+usage the API reports, priced separately for input and output tokens. The
+spend is appended to a SQLite ledger shared by all runs and worker
+processes, so per-job and per-day budgets hold across restarts and
+workers.
+
+A request that would push a job past its budget is refused (BudgetExceeded)
+and the job stops sending pages; they can be resumed with a larger budget.
+A request that would exceed the daily budget waits for the next day, and
+one that would exceed the tokens-per-minute limit waits until the last
+minute's usage allows it. Requests still in flight are counted at the
+current average cost per request, so a budget is overshot by at most what
+other processes have in flight.
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spend (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day TEXT NOT NULL,
+    job TEXT,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_spend_day ON spend (day);
+CREATE INDEX IF NOT EXISTS idx_spend_job ON spend (job);
+"""
+
+
+class Pricing(NamedTuple):
+    """Price in USD per million input and output tokens."""
+    input_per_million: float
+    output_per_million: float
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        """Price of a request's tokens in USD."""
+        return (input_tokens * self.input_per_million
+                + output_tokens * self.output_per_million) / 1_000_000
+
+    def usage_cost(self, token_usage: Dict[str, int]) -> float:
+        """Price of a token usage dict (input_tokens, output_tokens)."""
+        return self.cost(token_usage.get("input_tokens", 0), token_usage.get("output_tokens", 0))
+
+
+class BudgetExceeded(Exception):
+    """A request was refused because it would exceed the job budget."""
+
+
+def _seconds_until_tomorrow() -> float:
+    """Seconds until local midnight, when the daily budget starts over."""
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds()
+
+
+class BudgetGovernor:
+    """
+    Thread-safe admission control for API requests by cost and token rate.
+
+    Call admit() before sending a request, then settle() with its token
+    usage once it has answered (also for discarded hedged copies, which are
+    billed too), or release() if nothing was billed. A limit of 0 disables
+    that limit; spend is recorded either way.
+    """
+
+    def __init__(self, path: Path, pricing: Pricing, job_budget: float = 0.0,
+                 daily_budget: float = 0.0, tokens_per_minute: int = 0,
+                 initial_input_tokens: int = 1500, initial_output_tokens: int = 500,
+                 check_seconds: float = 30.0):
+        """
+        Open the spend ledger, creating it if needed.
+
+        Args:
+            path: Location of the SQLite ledger (":memory:" keeps it in
+                  memory, for runs whose spend is not real)
+            pricing: Input and output token prices
+            job_budget: Most a job may spend in USD, over all its runs
+            daily_budget: Most all jobs together may spend per calendar day
+            tokens_per_minute: Most tokens this process may use per minute
+            initial_input_tokens: Input tokens assumed per request until
+                                  real usage has been seen
+            initial_output_tokens: Likewise for output tokens
+            check_seconds: Longest single sleep while paused
+        """
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pricing = pricing
+        self.job_budget = job_budget
+        self.daily_budget = daily_budget
+        self.tokens_per_minute = tokens_per_minute
+        self.check_seconds = check_seconds
+        self.job: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+        # Running average usage per request, seeded with the initial guess
+        self._estimate = [float(initial_input_tokens), float(initial_output_tokens)]
+        self._settled = 0
+        self._outstanding = 0
+        # (time, tokens) of the requests settled in the last minute
+        self._window = deque()
+        # Set by stop(): paused and future requests are refused
+        self._stopped = threading.Event()
+
+        # Statistics of this process
+        self.run_input_tokens = 0
+        self.run_output_tokens = 0
+        self.run_cost = 0.0
+        self.paused_seconds = 0.0
+        self.stop_reason: Optional[str] = None
+
+    def start_job(self, job: str):
+        """Charge the following requests to a job (and its budget)."""
+        with self._lock:
+            self.job = job
+            self.stop_reason = None
+            self._stopped.clear()
+
+    @property
+    def stopped(self) -> bool:
+        """True once the job budget is used up or stop() was called."""
+        return self._stopped.is_set()
+
+    def stop(self, reason: str = "Stopped"):
+        """Refuse further requests and wake up any that are paused."""
+        with self._lock:
+            self.stop_reason = self.stop_reason or reason
+        self._stopped.set()
+
+    def estimated_request_cost(self) -> float:
+        """Average cost of one request so far (the initial guess before any)."""
+        with self._lock:
+            return self.pricing.cost(*self._estimate)
+
+    def _spent(self, where: str, value: str) -> float:
+        row = self._conn.execute(f"SELECT COALESCE(SUM(cost), 0) FROM spend WHERE {where} = ?",
+                                 (value,)).fetchone()
+        return row[0]
+
+    def job_spent(self) -> float:
+        """USD spent on the current job, over all runs and workers."""
+        with self._lock:
+            return self._spent("job", self.job) if self.job else 0.0
+
+    def spent_today(self) -> float:
+        """USD spent today by all jobs."""
+        with self._lock:
+            return self._spent("day", date.today().isoformat())
+
+    def _pause_needed(self) -> Optional[Tuple[float, str]]:
+        """(seconds, reason) to wait before the next request, or None."""
+        request_cost = self.pricing.cost(*self._estimate)
+        in_flight = self._outstanding * request_cost
+
+        if self.job_budget and self.job:
+            spent = self._spent("job", self.job)
+            if spent + in_flight + request_cost > self.job_budget:
+                raise BudgetExceeded(f"Job budget of ${self.job_budget:.2f} for '{self.job}' "
+                                     f"would be exceeded (${spent:.4f} spent)")
+
+        if self.daily_budget:
+            spent = self._spent("day", date.today().isoformat())
+            if spent + in_flight + request_cost > self.daily_budget:
+                return (_seconds_until_tomorrow(),
+                        f"daily budget of ${self.daily_budget:.2f} reached (${spent:.4f} spent)")
+
+        if self.tokens_per_minute:
+            now = time.monotonic()
+            while self._window and self._window[0][0] <= now - 60:
+                self._window.popleft()
+            used = sum(tokens for _, tokens in self._window)
+            request_tokens = sum(self._estimate)
+            # A single request larger than the limit only waits for an empty
+            # window, so it can never block forever
+            if self._window and used + (self._outstanding + 1) * request_tokens > self.tokens_per_minute:
+                return (self._window[0][0] + 60 - now,
+                        f"{used:,} tokens used in the last minute "
+                        f"(limit {self.tokens_per_minute:,})")
+        return None
+
+    def admit(self, cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Wait until a request fits the budgets, then count it as in flight.
+
+        Args:
+            cancel: If set while paused, give up without admitting
+
+        Returns:
+            True if the request may be sent, False if it was cancelled
+
+        Raises:
+            BudgetExceeded: If the request would exceed the job budget, or
+                            the governor was stopped
+        """
+        logged = None
+        while True:
+            with self._lock:
+                if self._stopped.is_set():
+                    raise BudgetExceeded(self.stop_reason or "Stopped")
+                try:
+                    pause = self._pause_needed()
+                except BudgetExceeded as e:
+                    self.stop_reason = self.stop_reason or str(e)
+                    self._stopped.set()
+                    raise
+                if pause is None:
+                    self._outstanding += 1
+                    return True
+            seconds, reason = pause
+            if reason != logged:
+                logger.warning(f"Pausing requests: {reason}; waiting {seconds:.0f}s")
+                logged = reason
+
+            seconds = min(max(seconds, 0.05), self.check_seconds)
+            start = time.monotonic()
+            if cancel is not None:
+                if cancel.wait(seconds):
+                    return False
+            else:
+                # stop() wakes the wait up
+                self._stopped.wait(seconds)
+            with self._lock:
+                self.paused_seconds += time.monotonic() - start
+
+    def _append(self, job: Optional[str], input_tokens: int, output_tokens: int) -> float:
+        """Add spend to the ledger and this run's totals (called with the lock held)."""
+        cost = self.pricing.cost(input_tokens, output_tokens)
+        self._conn.execute(
+            "INSERT INTO spend (day, job, input_tokens, output_tokens, cost, recorded_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (date.today().isoformat(), job, input_tokens, output_tokens, cost, time.time()))
+        self._conn.commit()
+        self.run_input_tokens += input_tokens
+        self.run_output_tokens += output_tokens
+        self.run_cost += cost
+        return cost
+
+    def settle(self, token_usage: Dict[str, int]):
+        """Record the usage of an admitted request that was answered."""
+        input_tokens = token_usage.get("input_tokens", 0)
+        output_tokens = token_usage.get("output_tokens", 0)
+        with self._lock:
+            self._append(self.job, input_tokens, output_tokens)
+            # Only once it is recorded, so a failed write can still be released
+            self._outstanding = max(0, self._outstanding - 1)
+            self._window.append((time.monotonic(), input_tokens + output_tokens))
+            if input_tokens or output_tokens:
+                self._settled += 1
+                self._estimate[0] += (input_tokens - self._estimate[0]) / self._settled
+                self._estimate[1] += (output_tokens - self._estimate[1]) / self._settled
+
+    def record(self, token_usage: Dict[str, int], job: Optional[str] = None) -> float:
+        """
+        Record the usage of a request that was not admitted, such as one
+        answered by an offline batch job.
+
+        The spend counts towards the job and daily budgets of later
+        requests, but not towards the tokens-per-minute limit.
+
+        Args:
+            token_usage: Token usage dict (input_tokens, output_tokens)
+            job: Job to charge (defaults to the current job)
+
+        Returns:
+            The cost in USD
+        """
+        with self._lock:
+            return self._append(job or self.job, token_usage.get("input_tokens", 0),
+                                token_usage.get("output_tokens", 0))
+
+    def release(self):
+        """Forget an admitted request that was not billed (failed or cancelled)."""
+        with self._lock:
+            self._outstanding = max(0, self._outstanding - 1)
+
+    def projection(self, pages_done: int, pages_remaining: int) -> Dict[str, float]:
+        """
+        Project the cost of the pages still to do from this run's spend.
+
+        Args:
+            pages_done: Pages finished in this run (including free ones,
+                        such as cache hits)
+            pages_remaining: Pages not done yet
+
+        Returns:
+            Dict with the job's spend so far, the average cost per page, the
+            projected remaining and total cost, and the job budget (0 if none)
+        """
+        per_page = (self.run_cost / pages_done if pages_done
+                    else self.estimated_request_cost())
+        spent = self.job_spent()
+        return {
+            "spent": spent,
+            "cost_per_page": per_page,
+            "remaining": per_page * pages_remaining,
+            "projected_total": spent + per_page * pages_remaining,
+            "budget": self.job_budget
+        }
+
+    def log_projection(self, pages_done: int, pages_remaining: int):
+        """Log the spend so far and the projected cost of the job."""
+        projection = self.projection(pages_done, pages_remaining)
+        message = (f"Spend: ${projection['spent']:.4f} so far, ~${projection['cost_per_page']:.5f}/page, "
+                   f"projected ${projection['projected_total']:.4f} for the job "
+                   f"({pages_remaining} pages to go)")
+        if projection["budget"]:
+            message += f", budget ${projection['budget']:.2f}"
+        if projection["budget"] and projection["projected_total"] > projection["budget"]:
+            logger.warning(message + "; the budget will run out before the job is done")
+        else:
+            logger.info(message)
+
+    def stats(self) -> Dict[str, float]:
+        """Spend of this process, the current job and today."""
+        return {
+            "run_input_tokens": self.run_input_tokens,
+            "run_output_tokens": self.run_output_tokens,
+            "run_cost": self.run_cost,
+            "job_spent": self.job_spent(),
+            "spent_today": self.spent_today(),
+            "paused_seconds": self.paused_seconds
+        }
+
+    def close(self):
+        """Close the ledger."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,267 @@
+"""
+Near-duplicate page detection with perceptual hashes.
+Rescans of the same page and copies of a book from another source produce
+images that differ byte for byte but look the same. Every extracted page is
+remembered under a 64-bit perceptual hash (the signs of the low-frequency
+DCT coefficients of a 32x32 thumbnail), and a new page whose hash lies within
+a small Hamming distance of a known one reuses that page's text instead of
+calling the API.
+
+The index is a multi-index hash: the 64-bit hash is split into four 16-bit
+chunks, each with its own table of buckets. Two hashes within distance r
+agree to within r // 4 bits on at least one chunk (pigeonhole), so a lookup
+only probes the few buckets near the query's chunks and compares the handful
+of candidates found; it stays well under a millisecond at hundreds of
+thousands of pages.
+Candidates are confirmed with a finer 256-bit hash, because pages that share
+a layout can come close on the coarse hash alone.
+
+The database uses SQLite's rollback journal rather than WAL, like the work
+queue, so workers on other hosts can share it over a network filesystem.
+"""
+
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from array import array
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_hashes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phash INTEGER NOT NULL,
+    detail_hash BLOB NOT NULL,
+    page_key TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    text BLOB NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_page_hashes_phash ON page_hashes (phash);
+"""
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix, so that D @ x @ D.T is the 2-D DCT of x."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+_DCT_64 = _dct_matrix(64)
+
+
+def _sign_bits(coefficients: np.ndarray) -> np.ndarray:
+    """Bits of the coefficients above their median, ignoring the DC term."""
+    flat = coefficients.flatten()
+    return flat > np.median(flat[1:])
+
+
+def page_hashes(img: Image.Image) -> Tuple[int, bytes]:
+    """
+    Perceptual hashes of a page image.
+
+    Both hashes come from one 64x64 grayscale thumbnail, so they cost a
+    single resample of the decoded page.
+
+    Args:
+        img: Decoded page image (any size and mode)
+
+    Returns:
+        Tuple of (64-bit hash used for the index lookup, 256-bit detail hash
+        used to confirm a match)
+    """
+    thumbnail = np.asarray(img.convert('L').resize((64, 64), Image.BOX), dtype=np.float64)
+
+    # Coarse hash: 8x8 lowest frequencies of the 32x32 thumbnail
+    small = thumbnail.reshape(32, 2, 32, 2).mean(axis=(1, 3))
+    coarse = _sign_bits((_DCT_32 @ small @ _DCT_32.T)[:8, :8])
+    phash = int.from_bytes(np.packbits(coarse).tobytes(), 'big')
+
+    # Detail hash: 16x16 lowest frequencies of the 64x64 thumbnail
+    detail = _sign_bits((_DCT_64 @ thumbnail @ _DCT_64.T)[:16, :16])
+    return phash, np.packbits(detail).tobytes()
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits of two hashes."""
+    return (a ^ b).bit_count()
+
+
+def _chunks(phash: int) -> List[int]:
+    """The hash split into CHUNKS values, most significant first."""
+    mask = (1 << CHUNK_BITS) - 1
+    return [(phash >> (CHUNK_BITS * (CHUNKS - 1 - i))) & mask for i in range(CHUNKS)]
+
+
+def _neighbours(value: int, radius: int) -> List[int]:
+    """All chunk values within `radius` bits of value (including itself)."""
+    values = [value]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), distance):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+def _to_signed(phash: int) -> int:
+    """Map an unsigned 64-bit hash onto SQLite's signed INTEGER range."""
+    return phash - (1 << HASH_BITS) if phash >= 1 << (HASH_BITS - 1) else phash
+
+
+class DuplicateIndex:
+    """
+    Persistent Hamming-distance index of extracted pages.
+
+    The pages (hashes, keys and compressed text) live in SQLite. The chunk
+    buckets of the multi-index hash are kept in memory, built from the
+    database when the index is opened and topped up from it before every
+    lookup, so pages added by other processes are found as well. Thread-safe;
+    one SQLite connection is shared by all worker threads.
+    """
+
+    def __init__(self, path: Path, max_distance: int = 6,
+                 max_detail_distance: int = 40, timeout: float = 30):
+        """
+        Open the index, creating the database if needed.
+
+        Args:
+            path: Location of the SQLite database file
+            max_distance: Largest Hamming distance of the 64-bit hashes at
+                          which two pages count as the same page
+            max_detail_distance: Largest distance of the 256-bit detail
+                                 hashes that confirms a match
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_distance = max_distance
+        self.max_detail_distance = max_detail_distance
+        # Chunk values within this many bits are probed per chunk
+        self._chunk_radius = max_distance // CHUNKS
+
+        self._lock = threading.Lock()
+        # Autocommit mode; additions open their transaction explicitly
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        # Indexes created in WAL mode by earlier versions are switched back
+        if self._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(SCHEMA)
+
+        # One dict per chunk position: chunk value -> hashes having it
+        self._buckets: List[Dict[int, array]] = [{} for _ in range(CHUNKS)]
+        self._loaded_id = 0
+        self._size = 0
+        with self._lock:
+            self._load_new_rows()
+        logger.info(f"Duplicate index: {self._size} known pages")
+
+    def _load_new_rows(self):
+        """Add rows written since the last load to the in-memory buckets."""
+        cursor = self._conn.execute(
+            "SELECT id, phash FROM page_hashes WHERE id > ? ORDER BY id", (self._loaded_id,))
+        for row_id, phash in cursor:
+            self._index(phash & HASH_MASK)
+            self._loaded_id = row_id
+
+    def _index(self, phash: int):
+        for bucket, chunk in zip(self._buckets, _chunks(phash)):
+            bucket.setdefault(chunk, array('Q')).append(phash)
+        self._size += 1
+
+    def find(self, phash: int, detail_hash: bytes) -> Optional[Dict]:
+        """
+        Look up the closest known page within the distance limits.
+
+        Args:
+            phash: 64-bit hash of the page (see page_hashes)
+            detail_hash: 256-bit detail hash of the page
+
+        Returns:
+            Dict with page_key, source_path, distance and the page's text,
+            or None if no known page is close enough
+        """
+        with self._lock:
+            self._load_new_rows()
+
+            candidates = set()
+            for bucket, chunk in zip(self._buckets, _chunks(phash)):
+                for value in _neighbours(chunk, self._chunk_radius):
+                    candidates.update(bucket.get(value, ()))
+            close = sorted((hamming(phash, candidate), candidate) for candidate in candidates)
+
+            # Confirm the closest candidates with the detail hash
+            detail = int.from_bytes(detail_hash, 'big')
+            for distance, candidate in close:
+                if distance > self.max_distance:
+                    break
+                rows = self._conn.execute(
+                    "SELECT page_key, source_path, detail_hash, text FROM page_hashes"
+                    " WHERE phash = ? ORDER BY id DESC", (_to_signed(candidate),)).fetchall()
+                for page_key, source_path, candidate_detail, text in rows:
+                    if hamming(detail, int.from_bytes(candidate_detail, 'big')) <= self.max_detail_distance:
+                        return {"page_key": page_key, "source_path": source_path,
+                                "distance": distance,
+                                "text": zlib.decompress(text).decode('utf-8')}
+        return None
+
+    def add(self, phash: int, detail_hash: bytes, page_key: str,
+            source_path: Path, text: str):
+        """
+        Remember an extracted page.
+
+        Args:
+            phash: 64-bit hash of the page
+            detail_hash: 256-bit detail hash of the page
+            page_key: Key of the page (see PageRef.key)
+            source_path: Input file the page came from
+            text: Text extracted from the page
+        """
+        row = (_to_signed(phash), detail_hash, page_key, str(source_path),
+               zlib.compress(text.encode('utf-8')), time.time())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO page_hashes (phash, detail_hash, page_key, source_path,"
+                    " text, recorded_at) VALUES (?, ?, ?, ?, ?, ?)", row)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            # Picks up this row along with any written by other processes
+            self._load_new_rows()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
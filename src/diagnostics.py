@@ -0,0 +1,162 @@
+"""
+Endpoint probes for the Vertex AI Llama 4 API.
+Used by diagnose_api.py to find out which endpoint format works, and by the
+region router (src/regions.py) to health-check an ejected region before it
+receives traffic again.
+"""
+
+import time
+import logging
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Simple text payload in the chat format. generateContent answers it with
+# HTTP 400, which proves the endpoint exists without spending any tokens.
+TEST_PAYLOAD = {
+    "parameters": {
+        "max_output_tokens": 100,
+        "temperature": 0.1
+    },
+    "messages": [
+        {
+            "role": "user",
+            "content": "Hello, please respond with 'API is working' if you can see this message."
+        }
+    ]
+}
+
+# Status codes showing that a region is up and accepts our credentials
+HEALTHY_STATUS_CODES = (200, 400)
+
+
+class EndpointProbe(NamedTuple):
+    """Outcome of one probe request."""
+    status_code: Optional[int]  # None if no response was received
+    seconds: float
+    error: Optional[str] = None
+    preview: str = ""  # Start of the body of a successful answer
+
+    @property
+    def healthy(self) -> bool:
+        """True if the endpoint answered without a quota, auth or server error."""
+        return self.status_code in HEALTHY_STATUS_CODES
+
+    def describe(self) -> str:
+        """Short human-readable explanation of the outcome."""
+        if self.status_code is None:
+            return f"✗ {self.error}"
+        if self.status_code == 200:
+            return "✓ SUCCESS! This endpoint works!"
+        if self.status_code == 404:
+            return "✗ Not Found - endpoint doesn't exist"
+        if self.status_code == 403:
+            return "✗ Forbidden - check permissions or license agreement"
+        if self.status_code == 400:
+            return "⚠ Bad Request - endpoint exists but request format may be wrong"
+        if self.status_code == 429:
+            return "✗ Too Many Requests - quota exhausted"
+        return f"✗ Error: {self.status_code}"
+
+
+def location_url(project_id: str, location: str) -> str:
+    """Base URL of a project's resources in one Vertex AI region."""
+    return (f"https://{location}-aiplatform.googleapis.com/v1/projects/{project_id}"
+            f"/locations/{location}")
+
+
+def model_endpoint(project_id: str, location: str, model_id: str,
+                   method: str = "generateContent") -> str:
+    """
+    URL of a Llama 4 method in one region.
+
+    Args:
+        project_id: Google Cloud project
+        location: Vertex AI region, e.g. us-east5
+        model_id: Publisher model ID
+        method: API method, e.g. generateContent or streamChat
+
+    Returns:
+        The endpoint URL
+    """
+    return f"{location_url(project_id, location)}/publishers/meta/models/{model_id}:{method}"
+
+
+def candidate_endpoints(project_id: str, location: str) -> List[str]:
+    """The endpoint formats diagnose_api.py tries, most likely first."""
+    return [
+        # Format 1: Standard MaaS endpoint
+        model_endpoint(project_id, location, "llama-4-maverick-17b-128e-instruct-maas", "streamChat"),
+        # Format 2: Without -maas suffix
+        model_endpoint(project_id, location, "llama-4-maverick-17b-128e-instruct", "streamChat"),
+        # Format 3: Alternative chat endpoint
+        model_endpoint(project_id, location, "llama-4-maverick-17b-128e-instruct-maas", "chat"),
+        # Format 4: Predict endpoint
+        model_endpoint(project_id, location, "llama-4-maverick-17b-128e-instruct-maas", "predict"),
+        # Format 5: generateContent endpoint (Gemini-style)
+        model_endpoint(project_id, location, "llama-4-maverick-17b-128e-instruct-maas",
+                       "generateContent"),
+    ]
+
+
+def probe_endpoint(endpoint: str, headers: Dict[str, str],
+                   payload: Optional[Dict] = None, timeout: float = 10.0,
+                   session: Optional[requests.Session] = None) -> EndpointProbe:
+    """
+    POST a small test payload to an endpoint.
+
+    Args:
+        endpoint: URL to probe
+        headers: Authorization headers
+        payload: Request body (defaults to TEST_PAYLOAD)
+        timeout: Seconds to wait for the answer
+        session: Optional session to send the request with
+
+    Returns:
+        EndpointProbe with the status code (None on a timeout or connection
+        error) and the time the probe took
+    """
+    start = time.perf_counter()
+    try:
+        response = (session or requests).post(
+            endpoint,
+            headers=headers,
+            json=TEST_PAYLOAD if payload is None else payload,
+            timeout=timeout
+        )
+        preview = response.text[:100] if response.status_code == 200 else ""
+        response.close()
+        return EndpointProbe(response.status_code, time.perf_counter() - start,
+                             preview=preview)
+    except requests.exceptions.Timeout:
+        return EndpointProbe(None, time.perf_counter() - start,
+                             "Timeout - endpoint might be valid but slow")
+    except Exception as e:
+        return EndpointProbe(None, time.perf_counter() - start,
+                             f"Error: {type(e).__name__}: {e}")
+
+
+def check_vertex_access(project_id: str, location: str, headers: Dict[str, str],
+                        timeout: float = 10.0) -> EndpointProbe:
+    """
+    Check that the Vertex AI API of a region is reachable with our credentials.
+
+    Args:
+        project_id: Google Cloud project
+        location: Vertex AI region
+        headers: Authorization headers
+        timeout: Seconds to wait for the answer
+
+    Returns:
+        EndpointProbe of a GET on the project's location resource
+    """
+    start = time.perf_counter()
+    try:
+        response = requests.get(location_url(project_id, location), headers=headers,
+                                timeout=timeout)
+        return EndpointProbe(response.status_code, time.perf_counter() - start)
+    except Exception as e:
+        return EndpointProbe(None, time.perf_counter() - start,
+                             f"Error: {type(e).__name__}: {e}")
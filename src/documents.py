@@ -0,0 +1,157 @@
+"""
+Page-level access to input documents.
+Single images, multi-frame TIFFs and PDFs are all expanded into page
+references that are cheap to create and to send to worker processes. The
+pixels of a page are only produced when that page is prepared, so memory
+stays flat regardless of document size.
+"""
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff'}
+MULTIPAGE_EXTENSIONS = {'.tif', '.tiff', '.pdf'}
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS | {'.pdf'}
+
+# PDF pages are rendered at this resolution unless that is far larger than needed
+PDF_RENDER_DPI = 200
+
+
+@dataclass(frozen=True)
+class PageRef:
+    """One page of an input document."""
+    path: Path
+    # 0-based page within a multi-page document; None for single images
+    page_index: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        """Journal key: the file name, plus the page number for documents."""
+        if self.page_index is None:
+            return self.path.name
+        return f"{self.path.name}#p{self.page_index + 1:04d}"
+
+    @property
+    def output_stem(self) -> str:
+        """Stem of the page's output file."""
+        if self.page_index is None:
+            return self.path.stem
+        return f"{self.path.stem}_p{self.page_index + 1:04d}"
+
+    @property
+    def name(self) -> str:
+        """Human-readable page name for logs."""
+        if self.page_index is None:
+            return self.path.name
+        return f"{self.path.name} (page {self.page_index + 1})"
+
+
+def _import_pdfium():
+    """Import the optional PDF renderer with a helpful error."""
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ImportError("PDF input requires pypdfium2. Please run: pip install pypdfium2")
+    return pypdfium2
+
+
+def page_count(path: Path) -> int:
+    """
+    Number of pages in a document without decoding any pixels.
+
+    Args:
+        path: Path to an image, TIFF or PDF file
+    """
+    suffix = path.suffix.lower()
+    if suffix == '.pdf':
+        pdfium = _import_pdfium()
+        pdf = pdfium.PdfDocument(str(path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    if suffix in ('.tif', '.tiff'):
+        with Image.open(path) as img:
+            return getattr(img, 'n_frames', 1)
+
+    return 1
+
+
+def iter_pages(path: Path) -> Iterator[PageRef]:
+    """
+    Yield a PageRef for every page of a document.
+
+    Single-frame files yield one reference without a page index, so their
+    journal keys and output names stay the same as before multi-page support.
+
+    Args:
+        path: Path to an image, TIFF or PDF file
+    """
+    if path.suffix.lower() not in MULTIPAGE_EXTENSIONS:
+        yield PageRef(path)
+        return
+
+    count = page_count(path)
+    if count == 1 and path.suffix.lower() != '.pdf':
+        yield PageRef(path)
+        return
+
+    logger.info(f"{path.name}: {count} pages")
+    for index in range(count):
+        yield PageRef(path, index)
+
+
+def iter_folder_pages(folder: Path) -> Iterator[PageRef]:
+    """Yield the pages of every supported file in a folder, in name order."""
+    for path in sorted(folder.iterdir()):
+        if path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            yield from iter_pages(path)
+
+
+@contextmanager
+def open_page(path: Path, page_index: Optional[int] = None,
+              target_size: Optional[Tuple[int, int]] = None) -> Iterator[Image.Image]:
+    """
+    Open a single page as a PIL image.
+
+    TIFF frames are decoded on demand by seeking to the frame. PDF pages are
+    rendered individually, at PDF_RENDER_DPI or at twice target_size if that
+    is smaller, so large pages never produce oversized bitmaps.
+
+    Args:
+        path: Path to the document
+        page_index: 0-based page (None for single images)
+        target_size: Size the page will be reduced to afterwards
+    """
+    if path.suffix.lower() == '.pdf':
+        pdfium = _import_pdfium()
+        pdf = pdfium.PdfDocument(str(path))
+        try:
+            page = pdf[page_index or 0]
+            width_pt, height_pt = page.get_size()
+            scale = PDF_RENDER_DPI / 72
+            if target_size:
+                scale = min(scale, 2 * target_size[0] / width_pt,
+                            2 * target_size[1] / height_pt)
+            img = page.render(scale=scale).to_pil()
+            page.close()
+        finally:
+            pdf.close()
+        try:
+            yield img
+        finally:
+            img.close()
+        return
+
+    with Image.open(path) as img:
+        if page_index:
+            img.seek(page_index)
+        yield img
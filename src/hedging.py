@@ -0,0 +1,230 @@
+"""
+Hedged requests for Llama 4 API calls.
+A few pages take many times longer than the median request. When a request
+has been in flight longer than a rolling latency percentile, one speculative
+duplicate is sent; whichever answers first is used and the other is
+abandoned. Hedges are capped as a fraction of all requests, so the extra
+cost stays bounded, and the tokens spent on abandoned copies are reported
+separately.
+
+An HTTP request that is already on the wire cannot be interrupted with
+requests, so an abandoned copy that was sent runs to completion in its
+thread and its usage is handed to a discard callback. A copy still waiting
+for quota is cancelled before it is sent.
+
+Both copies count against the caller's limit on requests in flight: the
+hedge is only sent if a slot is free at once, so hedging never queues pages
+behind duplicates.
+"""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict, Optional, TypeVar
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# An attempt receives two events: it sets the first when its request goes on
+# the wire, and returns None without sending if the second is set first
+Attempt = Callable[[Optional[threading.Event], Optional[threading.Event]], Optional[T]]
+
+
+class HedgePolicy:
+    """
+    Thread-safe bookkeeping of request latencies and the hedge budget.
+
+    Latencies of successful requests are kept in a rolling window; the
+    hedge delay is a percentile of that window. No request is hedged until
+    min_samples latencies have been seen, or while hedges already make up
+    max_fraction of the requests.
+    """
+
+    def __init__(self, percentile: float = 95.0, max_fraction: float = 0.05,
+                 window: int = 200, min_samples: int = 20):
+        """
+        Configure the policy.
+
+        Args:
+            percentile: Latency percentile after which a request is hedged
+            max_fraction: Largest share of requests that may be hedged
+            window: Number of recent latencies the percentile is taken over
+            min_samples: Latencies needed before the first hedge
+        """
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.no_slot = 0
+
+    def record_latency(self, seconds: float):
+        """Add the latency of a successful request to the window."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def record_request(self):
+        """Count a request that could be hedged."""
+        with self._lock:
+            self.requests += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds after which a request in flight gets a duplicate.
+
+        Returns:
+            The rolling latency percentile, or None if there are too few
+            samples or the hedge budget is used up
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples or not self._has_budget():
+                return None
+            return float(np.percentile(self._latencies, self.percentile))
+
+    def _has_budget(self) -> bool:
+        return self.hedged + 1 <= self.max_fraction * self.requests
+
+    def try_hedge(self) -> bool:
+        """Claim one hedge from the budget; False if none is left."""
+        with self._lock:
+            if not self._has_budget():
+                return False
+            self.hedged += 1
+            return True
+
+    def record_no_slot(self):
+        """Count a hedge left out because no request slot was free."""
+        with self._lock:
+            self.no_slot += 1
+
+    def record_winner(self, hedge_won: bool):
+        """Count which copy of a hedged request answered first."""
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Requests seen, hedges sent or left out and how often the hedge won."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "no_slot": self.no_slot,
+                "hedged_fraction": self.hedged / self.requests if self.requests else 0.0
+            }
+
+
+def _start(attempt: Attempt, sent: threading.Event, cancel: threading.Event,
+           slots: Optional[threading.Semaphore] = None) -> Future:
+    """
+    Run an attempt in its own thread and return its future.
+
+    A slot the caller took from slots is given back when the attempt ends.
+    """
+    future = Future()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(attempt(sent, cancel))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    threading.Thread(target=run, name="hedged-request", daemon=True).start()
+    return future
+
+
+def run_hedged(attempt: Attempt, policy: HedgePolicy,
+               discard: Callable[[T], None],
+               slots: Optional[threading.Semaphore] = None) -> T:
+    """
+    Run a request, hedging it if it takes longer than the policy allows.
+
+    Args:
+        attempt: Sends the request (see Attempt for the two events)
+        policy: Latency window and hedge budget
+        discard: Called with the result of the copy that answered last
+                 (possibly later, from its thread)
+        slots: Limit on requests in flight; the request waits for a slot,
+               the hedge is skipped if none is free
+
+    Returns:
+        The result of the copy that succeeded first. If both copies fail,
+        the last error is raised.
+    """
+    policy.record_request()
+    delay = policy.hedge_delay()
+    if slots is not None:
+        slots.acquire()
+    if delay is None:
+        try:
+            return attempt(None, None)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    primary_sent, primary_cancel = threading.Event(), threading.Event()
+    primary = _start(attempt, primary_sent, primary_cancel, slots)
+
+    # The clock starts once the request is on the wire, not while it waits
+    # for quota
+    while not primary_sent.wait(0.05):
+        if primary.done():
+            return primary.result()
+    if wait([primary], timeout=delay).done:
+        return primary.result()
+    if slots is not None and not slots.acquire(blocking=False):
+        policy.record_no_slot()
+        return primary.result()
+    if not policy.try_hedge():
+        if slots is not None:
+            slots.release()
+        return primary.result()
+
+    logger.info(f"Request in flight for more than {delay:.2f}s; sending a hedged copy")
+    hedge_cancel = threading.Event()
+    hedge = _start(attempt, threading.Event(), hedge_cancel, slots)
+    cancels = {primary: primary_cancel, hedge: hedge_cancel}
+
+    def discard_result(future: Future):
+        if future.exception() is None and future.result() is not None:
+            try:
+                discard(future.result())
+            except Exception as e:
+                logger.warning(f"Could not discard a hedged request: {e}")
+
+    winner = None
+    error = None
+    pending = {primary, hedge}
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+            elif winner is None:
+                winner = future
+            else:
+                # Both copies finished at once
+                discard_result(future)
+
+    for future in pending:
+        cancels[future].set()
+        future.add_done_callback(discard_result)
+
+    if winner is None:
+        raise error
+    policy.record_winner(winner is hedge)
+    return winner.result()
@@ -0,0 +1,259 @@
+"""
+Image preparation for the Llama 4 API.
+These functions are kept free of extractor state so they can run in worker
+processes as well as on the calling thread.
+"""
+
+import io
+import time
+import base64
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from src.adaptive import choose_settings
+from src.documents import open_page
+from src.dedup import page_hashes
+from src.page_filter import FilterThresholds, classify_page
+from src.tiling import plan_tiles
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreparedImage:
+    """A page ready to be sent: the JPEG plus what was sent."""
+    # Raw JPEG bytes; base64-encoded only while the request is sent
+    # (see src/request_body.py)
+    jpeg: bytes
+    width: int
+    height: int
+    quality: int
+    # Estimated text stroke width in pixels of the sent image (adaptive mode)
+    stroke_width: Optional[float] = None
+    # Overlapping tiles of the page in reading order, when the page is tiled
+    tiles: Optional[List["PreparedImage"]] = None
+    # (rows, columns) of the tiles
+    tile_grid: Optional[Tuple[int, int]] = None
+    # Seconds spent per preparation stage (decode, resize, jpeg_encode, ...)
+    timings: Optional[Dict[str, float]] = None
+    # Perceptual hashes of the page for near-duplicate detection (src/dedup.py)
+    phash: Optional[int] = None
+    detail_hash: Optional[bytes] = None
+    # Why the page needs no extraction (src/page_filter.py); such pages are
+    # not encoded and jpeg is empty
+    skip_reason: Optional[str] = None
+    content_stats: Optional[Dict[str, float]] = None
+
+    @property
+    def data(self) -> str:
+        """The JPEG as a base64 string, e.g. for a batch-job request file."""
+        return base64.b64encode(self.jpeg).decode('ascii')
+
+
+def _add_time(timings: Optional[Dict[str, float]], stage: str, start: float):
+    """Add the time since `start` to a stage of a timings dict."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _reduced_decode(img: Image.Image, target: Tuple[int, int]) -> Image.Image:
+    """
+    Cheaply shrink an image that is much larger than the target size.
+
+    JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale via draft mode, which
+    skips most of the IDCT work and never materialises the full-resolution
+    bitmap. Other formats are box-reduced by an integer factor that keeps at
+    least twice the target resolution for the final LANCZOS resample.
+    """
+    if img.format == 'JPEG':
+        # Picks the largest DCT scale that keeps both sides >= target
+        img.draft(None, target)
+        return img
+
+    factor = int(min(img.size[0] / target[0], img.size[1] / target[1]) // 2)
+    if factor >= 2:
+        # reduce() does not support palette or CMYK images
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        return img.reduce(factor)
+    return img
+
+
+def _fit(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Size an image of `size` will have after thumbnail(box)."""
+    ratio = min(1.0, box[0] / size[0], box[1] / size[1])
+    return (max(1, round(size[0] * ratio)), max(1, round(size[1] * ratio)))
+
+
+def _encode(img: Image.Image, max_size: Tuple[int, int], quality: int,
+            stroke_width: Optional[float] = None,
+            timings: Optional[Dict[str, float]] = None) -> PreparedImage:
+    """
+    Shrink an image to fit max_size (in place) and encode it as JPEG.
+
+    Time spent resizing and JPEG encoding is added to `timings` if given.
+    """
+    # Resize if too large
+    start = time.perf_counter()
+    if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        logger.debug(f"Resized image to: {img.size}")
+    _add_time(timings, "resize", start)
+
+    # Save to bytes; getvalue() hands over the buffer without a copy
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality)
+    jpeg = buffer.getvalue()
+    _add_time(timings, "jpeg_encode", start)
+
+    return PreparedImage(jpeg=jpeg, width=img.size[0],
+                         height=img.size[1], quality=quality,
+                         stroke_width=stroke_width)
+
+
+def prepare_page(image_path: Path, max_size: Tuple[int, int],
+                 quality: int, fast_decode: bool = True,
+                 adaptive: bool = False, min_quality: int = 60,
+                 min_stroke_px: float = 1.5,
+                 page_index: Optional[int] = None,
+                 tiling: str = 'off', tile_rows: int = 2,
+                 tile_columns: int = 1, tile_overlap: float = 0.08,
+                 tall_ratio: float = 1.6,
+                 page_hash: bool = False,
+                 content_filter: Optional[FilterThresholds] = None) -> PreparedImage:
+    """
+    Resize an image to fit max_size and encode it as JPEG.
+
+    In adaptive mode the page is measured first and sent at the smallest
+    size and quality that keep its text strokes at least min_stroke_px wide
+    (see src/adaptive.py); max_size and quality become upper bounds.
+
+    When the page is tiled, the overlapping tiles are cut from the page at
+    source resolution and each is encoded to fit max_size on its own, so
+    every tile carries more detail than the whole page could.
+
+    Args:
+        image_path: Path to the image file
+        max_size: Maximum (width, height) sent to the API
+        quality: JPEG quality of the re-encoded image
+        fast_decode: Decode large images at a reduced scale before the
+                     final high-quality resample
+        adaptive: Choose size and quality per page
+        min_quality: Lowest JPEG quality adaptive mode may choose
+        min_stroke_px: Stroke width adaptive mode keeps legible
+        page_index: Page of a multi-page TIFF or PDF (None for single images)
+        tiling: 'off', 'auto' (tile pages taller than tall_ratio) or 'always'
+        tile_rows: Tile rows for tiled pages (tall pages get at least one
+                   row per page width of height)
+        tile_columns: Tile columns for tiled pages
+        tile_overlap: Vertical overlap between tiles as a fraction of height
+        tall_ratio: Height/width ratio from which 'auto' tiles a page
+        page_hash: Also compute the page's perceptual hashes
+        content_filter: Thresholds to classify the page with; a blank page,
+                        separator sheet or full-page image is returned
+                        unencoded with its skip_reason set
+
+    Returns:
+        PreparedImage with the JPEG (and tiles if the page was tiled)
+        and the time spent per stage in its timings
+    """
+    timings = {}
+    start = time.perf_counter()
+    decode_box = max_size
+    if tiling == 'always':
+        decode_box = (max_size[0] * tile_columns, max_size[1] * tile_rows)
+
+    with open_page(Path(image_path), page_index, decode_box) as img:
+        # Decide on tiling from the header size, before decoding pixels
+        rows = columns = 1
+        if tiling == 'always' or (tiling == 'auto' and img.size[1] >= tall_ratio * img.size[0]):
+            rows = max(tile_rows, round(img.size[1] / img.size[0]))
+            columns = tile_columns
+            decode_box = (max_size[0] * columns, max_size[1] * rows)
+
+        if fast_decode and (img.size[0] > decode_box[0] or img.size[1] > decode_box[1]):
+            img = _reduced_decode(img, _fit(img.size, decode_box))
+            logger.debug(f"Reduced decode to: {img.size}")
+
+        # Convert to RGB if necessary
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+            logger.debug("Converted image to RGB")
+
+        # Decode now so the time is attributed to decoding, not resizing
+        img.load()
+        _add_time(timings, "decode", start)
+
+        # Pages without text are not worth encoding
+        if content_filter:
+            start = time.perf_counter()
+            skip_reason, content_stats = classify_page(img, content_filter)
+            _add_time(timings, "classify", start)
+            if skip_reason:
+                return PreparedImage(jpeg=b"", width=img.size[0], height=img.size[1],
+                                     quality=0, skip_reason=skip_reason,
+                                     content_stats=content_stats, timings=timings)
+
+        # Hash the whole decoded page, before tiling and resizing
+        hashes = None
+        if page_hash:
+            start = time.perf_counter()
+            hashes = page_hashes(img)
+            _add_time(timings, "phash", start)
+
+        # Cut the tiles before the page itself is shrunk
+        tiles = None
+        if rows * columns > 1:
+            tiles = [_encode(img.crop(box), max_size, quality, timings=timings)
+                     for box in plan_tiles(img.size, rows, columns, tile_overlap)]
+            logger.debug(f"Split page into {rows}x{columns} tiles")
+
+        # Pick the page's size and quality in adaptive mode
+        stroke_width = None
+        analysed_width = img.size[0]
+        if adaptive:
+            start = time.perf_counter()
+            max_size, quality, stroke_width = choose_settings(
+                img, max_size, quality, min_quality, min_stroke_px
+            )
+            _add_time(timings, "analyze", start)
+
+        prepared = _encode(img, max_size, quality, timings=timings)
+        if stroke_width is not None:
+            prepared.stroke_width = stroke_width * prepared.width / analysed_width
+        if tiles:
+            prepared.tiles = tiles
+            prepared.tile_grid = (rows, columns)
+        if hashes:
+            prepared.phash, prepared.detail_hash = hashes
+        prepared.timings = timings
+        return prepared
+
+
+def classify_page_file(image_path: Path, thresholds: FilterThresholds,
+                       page_index: Optional[int] = None,
+                       decode_size: Tuple[int, int] = (1024, 1024)) -> Tuple[Optional[str], Dict[str, float]]:
+    """
+    Classify a page without preparing it for the API.
+
+    The page is decoded the same way prepare_page decodes it, so the result
+    matches what the pre-filter decides during extraction.
+
+    Args:
+        image_path: Path to the image file
+        thresholds: Classification limits
+        page_index: Page of a multi-page TIFF or PDF (None for single images)
+        decode_size: Size the page is reduced to before classifying
+
+    Returns:
+        Tuple of (skip reason or None, page statistics)
+    """
+    with open_page(Path(image_path), page_index, decode_size) as img:
+        if img.size[0] > decode_size[0] or img.size[1] > decode_size[1]:
+            img = _reduced_decode(img, _fit(img.size, decode_size))
+        return classify_page(img, thresholds)
@@ -0,0 +1,171 @@
+"""
+Crash-safe progress journal for extraction jobs.
+Every finished (or failed) page is appended to a per-job JSONL file as soon
+as it completes, so an interrupted job can resume where it stopped instead
+of re-billing every page.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+# Pages the pre-filter found nothing to extract on (see src/page_filter.py)
+STATUS_SKIPPED = "skipped"
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of an extracted text, used to verify output files on resume."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def source_fingerprint(path: Path) -> Dict[str, float]:
+    """Size and modification time of an input file, to detect changed scans."""
+    stat = path.stat()
+    return {"source_size": stat.st_size, "source_mtime": stat.st_mtime}
+
+
+class ProgressJournal:
+    """
+    Append-only JSONL journal with one record per page attempt.
+
+    The file is replayed on open; the last record for each page wins. Each
+    record is flushed and fsynced before record() returns, and a torn final
+    line left by a crash is ignored on the next replay.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Open a journal, creating it if it does not exist.
+
+        Args:
+            path: Location of the JSONL journal file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._latest: Dict[str, Dict] = {}
+        self._replay()
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self._has_torn_tail():
+            # Terminate the partial line so the next record starts cleanly
+            self._file.write("\n")
+            self._file.flush()
+
+    def _has_torn_tail(self) -> bool:
+        """True if the file does not end with a newline."""
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _replay(self):
+        """Load the latest record of every page from disk."""
+        if not self.path.exists():
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping damaged journal line {line_number} in {self.path.name}")
+                    continue
+                self._latest[entry["key"]] = entry
+
+        if self._latest:
+            done = sum(1 for e in self._latest.values() if e["status"] == STATUS_DONE)
+            logger.info(f"Journal {self.path.name}: {done} of {len(self._latest)} recorded pages done")
+
+    def record(self, key: str, status: str, output_path: Optional[Path] = None,
+               token_usage: Optional[Dict[str, int]] = None,
+               content_hash: Optional[str] = None, error: Optional[str] = None,
+               **extra):
+        """
+        Durably append the outcome of one page.
+
+        Args:
+            key: Page identifier
+            status: STATUS_DONE, STATUS_FAILED or STATUS_SKIPPED
+            output_path: Where the extracted text was written
+            token_usage: Token usage dict for the page
+            content_hash: text_hash() of the extracted text
+            error: Error message for failed pages
+            **extra: Additional fields to store (e.g. the source fingerprint)
+        """
+        entry = {
+            "key": key,
+            "status": status,
+            "output_path": str(output_path) if output_path else None,
+            "token_usage": token_usage,
+            "content_hash": content_hash,
+            "error": error,
+            "recorded_at": time.time(),
+            **extra
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._latest[key] = entry
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Latest record for a page, or None if it was never attempted."""
+        with self._lock:
+            return self._latest.get(key)
+
+    def is_complete(self, key: str, fingerprint: Optional[Dict[str, float]] = None) -> bool:
+        """
+        Check whether a page can be skipped on resume.
+
+        A page counts as complete when its last record is "done", the output
+        file still exists with the recorded content hash and, if given, the
+        input file fingerprint is unchanged.
+
+        Args:
+            key: Page identifier
+            fingerprint: Current source_fingerprint() of the input file
+        """
+        entry = self.get(key)
+        if not entry or entry["status"] != STATUS_DONE or not entry["output_path"]:
+            return False
+
+        if fingerprint:
+            for name, value in fingerprint.items():
+                if entry.get(name) != value:
+                    return False
+
+        output_path = Path(entry["output_path"])
+        try:
+            text = output_path.read_text(encoding='utf-8')
+        except OSError:
+            return False
+        return text_hash(text) == entry["content_hash"]
+
+    def close(self):
+        """Close the journal file."""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -8,8 +8,14 @@ import sys
 import json
 import base64
 import logging
+import random
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple, Union
 from PIL import Image
 import io
 
@@ -20,28 +26,79 @@ sys.path.append(str(project_root))
 # Import our configuration
 from config.settings import *
 
-# Import Google Cloud libraries
+from src.rate_limiter import AdaptiveRateLimiter
+from src.regions import Region, RegionRouter
+from src.diagnostics import model_endpoint, probe_endpoint
+from src.hedging import HedgePolicy, run_hedged
+from src.budget import BudgetExceeded, BudgetGovernor, Pricing
+from src.request_body import IMAGE_PLACEHOLDER, ImageRequestBody
+from src.result_cache import ExtractionCache
+from src.documents import PageRef, iter_folder_pages, iter_pages
+from src.image_prep import PreparedImage, prepare_page
+from src.tiling import add_token_usage, stitch_tiles
+from src.responses import (TRUNCATION_FINISH_REASONS, parse_response,
+                           usage_from_metadata)
+from src.streaming import StrippedWriter, event_text, iter_sse_events
+from src.pipeline import PreparePipeline
+from src.metrics import StageMetrics
+from src.results_store import ResultsStore
+from src.dedup import DuplicateIndex
+from src.page_filter import SKIP_DESCRIPTIONS, FilterThresholds
+from src.watcher import open_watcher
+from src.work_queue import Lease, WorkQueue
+from src.batch_jobs import (SPEND_MARKER, ingest_results, load_manifest,
+                             write_request_shards)
+from src.journal import (ProgressJournal, STATUS_DONE, STATUS_FAILED,
+                         STATUS_SKIPPED, source_fingerprint, text_hash)
+
+# Import HTTP libraries. google-auth is only imported when the extractor
+# authenticates with the service account (see __init__); the Vertex AI SDK
+# is not needed at all, since every call is a plain REST request.
 try:
-    from google.cloud import aiplatform
-    from google.oauth2 import service_account
-    import google.auth
+    from src.transport import PooledTransport
     import requests
 except ImportError as e:
     print(f"Error importing required libraries: {e}")
     print("Please run: pip install -r requirements.txt")
     sys.exit(1)
 
-# Set up logging
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format=LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(LOG_DIR / 'extraction.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging is configured by the entry points (see configure_logging)
 logger = logging.getLogger(__name__)
 
+# Prompt sent with every page for text extraction
+EXTRACTION_PROMPT = """Extract ALL text from this scanned textbook page.
+
+IMPORTANT INSTRUCTIONS:
+1. Extract the text EXACTLY as it appears on the page
+2. Maintain all original formatting including:
+   - Paragraph breaks
+   - Section headings
+   - Bullet points or numbered lists
+   - Indentation
+3. Do NOT add any commentary or explanations
+4. Do NOT describe images or diagrams
+5. ONLY output the actual text content from the page
+
+Begin extraction now:"""
+
+
+def page_filter_thresholds() -> FilterThresholds:
+    """Thresholds of the blank/low-content page filter from the settings."""
+    return FilterThresholds(
+        blank_max_ink=PAGE_FILTER_BLANK_MAX_INK,
+        uniform_max_std=PAGE_FILTER_UNIFORM_MAX_STD,
+        image_min_ink=PAGE_FILTER_IMAGE_MIN_INK,
+        image_max_edges=PAGE_FILTER_IMAGE_MAX_EDGES
+    )
+
+
+class APIRequestError(Exception):
+    """Raised when the Llama 4 API answers with a non-200 status code."""
+    
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
 
 class LocalLlama4Extractor:
     """
@@ -49,125 +106,269 @@ class LocalLlama4Extractor:
     This version is designed for ease of use and testing.
     """
     
-    def __init__(self):
-        """Initialize the extractor with Google Cloud credentials."""
-        
-        logger.info("Initializing Llama 4 Text Extractor...")
+    def __init__(self, rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 use_cache: Optional[bool] = None,
+                 transport: Optional["PooledTransport"] = None,
+                 endpoint: Optional[Union[str, Dict[str, str]]] = None,
+                 token_provider=None,
+                 results_store: Optional[ResultsStore] = None,
+                 use_dedup: Optional[bool] = None,
+                 use_page_filter: Optional[bool] = None,
+                 regions: Optional[List[str]] = None,
+                 use_hedging: Optional[bool] = None,
+                 budget: Optional[BudgetGovernor] = None):
+        """
+        Initialize the extractor with Google Cloud credentials.
         
-        # Check for required configuration
-        if not PROJECT_ID:
-            raise ValueError("GOOGLE_CLOUD_PROJECT not set. Please update your .env file.")
+        Args:
+            rate_limiter: Optional limiter consulted before every API request;
+                          with several regions it limits the primary region
+                          and every other region gets a copy (quota is per region)
+            use_cache: Reuse stored results for identical requests
+                       (defaults to CACHE_ENABLED; False bypasses the cache)
+            transport: HTTP transport to send requests with (defaults to a
+                       pooled keep-alive transport built from the settings)
+            endpoint: generateContent URL to call instead of Vertex AI, e.g.
+                      the local mock server in benchmarks/mock_vertex.py, or
+                      a dict of region name to URL to route between
+            token_provider: Object with auth_headers() and invalidate() to
+                            use instead of the service account credentials
+                            (no Google Cloud configuration is needed then)
+            results_store: Store every page outcome is appended to
+                           (defaults to the database at RESULTS_DB)
+            use_dedup: Reuse the text of near-duplicate pages (defaults to
+                       DEDUP_ENABLED; False extracts every page)
+            use_page_filter: Skip blank pages, separator sheets and
+                             full-page images (defaults to PAGE_FILTER_ENABLED)
+            regions: Vertex AI regions to spread requests across (defaults
+                     to GCP_LOCATIONS; ignored when endpoint is given)
+            use_hedging: Send a duplicate of unusually slow requests and keep
+                         the first answer (defaults to HEDGE_ENABLED)
+            budget: Governor every request is admitted by and its spend
+                    recorded with (defaults to one with the configured
+                    prices and budgets, recording to BUDGET_DB, or to an
+                    in-memory ledger when endpoint is given)
+        """
         
-        if not CREDENTIALS_PATH or not Path(CREDENTIALS_PATH).exists():
-            raise ValueError(f"Credentials file not found at {CREDENTIALS_PATH}")
+        logger.info("Initializing Llama 4 Text Extractor...")
         
-        # Initialize Vertex AI
-        logger.info(f"Using project: {PROJECT_ID}")
-        logger.info(f"Using location: {LOCATION}")
+        self.credentials = None
+        self.token_provider = token_provider
         
-        aiplatform.init(
-            project=PROJECT_ID,
-            location=LOCATION,
-            credentials=service_account.Credentials.from_service_account_file(
-                CREDENTIALS_PATH
+        if self.token_provider is None:
+            # Check for required configuration
+            if not PROJECT_ID:
+                raise ValueError("GOOGLE_CLOUD_PROJECT not set. Please update your .env file.")
+            
+            if not CREDENTIALS_PATH or not Path(CREDENTIALS_PATH).exists():
+                raise ValueError(f"Credentials file not found at {CREDENTIALS_PATH}")
+            
+            logger.info(f"Using project: {PROJECT_ID}")
+            logger.info(f"Using location: {', '.join(regions or GCP_LOCATIONS)}")
+            
+            # Imported here, so clients with their own token provider never
+            # load google-auth
+            from google.oauth2 import service_account
+            from src.auth import AccessTokenProvider, CLOUD_PLATFORM_SCOPES
+            
+            # Set up authentication for direct API calls. The token provider
+            # caches the bearer token and only refreshes it shortly before expiry.
+            self.credentials = service_account.Credentials.from_service_account_file(
+                CREDENTIALS_PATH,
+                scopes=CLOUD_PLATFORM_SCOPES
+            )
+            self.token_provider = AccessTokenProvider(
+                self.credentials,
+                refresh_margin_seconds=TOKEN_REFRESH_MARGIN_SECONDS
             )
-        )
-        
-        # Set up authentication for direct API calls
-        self.credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_PATH,
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
         
-        # Use the generateContent endpoint which exists (based on diagnostic results)
-        self.endpoint = f"https://{LOCATION}-aiplatform.googleapis.com/v1/projects/{PROJECT_ID}/locations/{LOCATION}/publishers/meta/models/{MODEL_ID}:generateContent"
+        # One generateContent endpoint per region (based on diagnostic results)
+        if isinstance(endpoint, dict):
+            endpoints = dict(endpoint)
+        elif endpoint:
+            endpoints = {"custom": endpoint}
+        else:
+            endpoints = {region: model_endpoint(PROJECT_ID, region, MODEL_ID)
+                         for region in (regions or GCP_LOCATIONS)}
         
         # Initialize token tracking
+        # The lock guards the cumulative counters, which are updated from
+        # worker threads when process_folder runs pages concurrently
+        self._stats_lock = threading.Lock()
         self.total_input_tokens = 0
         self.total_output_tokens = 0
         self.total_api_calls = 0
+        self.cache_hits = 0
+        self.duplicate_hits = 0
+        self.pages_skipped = 0
+        # Tokens spent on hedged copies whose answer was not used
+        self.wasted_input_tokens = 0
+        self.wasted_output_tokens = 0
+        
+        self.rate_limiter = rate_limiter
+        
+        # Requests are spread across the regions by observed latency and
+        # error rate; failing regions are ejected (see src/regions.py)
+        self.router = RegionRouter(
+            [Region(name, url,
+                    rate_limiter if i == 0 or rate_limiter is None else rate_limiter.spawn())
+             for i, (name, url) in enumerate(endpoints.items())],
+            health_check=self._check_region if len(endpoints) > 1 else None,
+            eject_after=REGION_EJECT_AFTER_FAILURES,
+            max_error_rate=REGION_MAX_ERROR_RATE,
+            eject_seconds=REGION_EJECT_SECONDS,
+            max_eject_seconds=REGION_EJECT_MAX_SECONDS
+        )
+        # Endpoints of the primary region
+        self.endpoint = self.router.regions[0].endpoint
+        self.stream_endpoint = self.router.regions[0].stream_endpoint
+        
+        # Speculative duplicates of slow requests (see src/hedging.py)
+        use_hedging = HEDGE_ENABLED if use_hedging is None else use_hedging
+        self.hedging = HedgePolicy(
+            percentile=HEDGE_PERCENTILE,
+            max_fraction=HEDGE_MAX_FRACTION,
+            window=HEDGE_WINDOW,
+            min_samples=HEDGE_MIN_SAMPLES
+        ) if use_hedging else None
+        
+        # Per-stage timing histograms (see src/metrics.py)
+        self.metrics = StageMetrics()
+        
+        # Append-only record of every page outcome (see src/results_store.py)
+        self.results_store = results_store or ResultsStore(RESULTS_DB)
+        
+        # Live spend tracking and budgets (see src/budget.py). Calls to a
+        # custom endpoint (such as the mock server) cost nothing, so they
+        # stay out of the shared ledger and its daily budget.
+        self.budget = budget or BudgetGovernor(
+            BUDGET_DB if endpoint is None else ":memory:",
+            Pricing(PRICE_INPUT_PER_MILLION, PRICE_OUTPUT_PER_MILLION),
+            job_budget=BUDGET_JOB_USD,
+            daily_budget=BUDGET_DAILY_USD,
+            tokens_per_minute=BUDGET_TOKENS_PER_MINUTE
+        )
+        
+        # Requests in flight at once, shared by the page workers, the tiles
+        # of their pages and hedges; every run sizes it to its max_workers
+        self.request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        
+        # Keep-alive connection pool shared by all requests
+        self.transport = transport or PooledTransport(
+            pool_size=HTTP_POOL_SIZE,
+            connect_timeout=HTTP_CONNECT_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT,
+            compress=HTTP_COMPRESS_REQUESTS
+        )
+        
+        # Set up the on-disk result cache
+        use_cache = CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = ExtractionCache(
+            CACHE_DIR,
+            max_size_bytes=CACHE_MAX_SIZE_MB * 1024 * 1024,
+            max_age_seconds=CACHE_MAX_AGE_DAYS * 24 * 3600
+        ) if use_cache else None
+        
+        # Perceptual-hash index of extracted pages (see src/dedup.py)
+        use_dedup = DEDUP_ENABLED if use_dedup is None else use_dedup
+        self.duplicates = DuplicateIndex(
+            DEDUP_DB,
+            max_distance=DEDUP_MAX_DISTANCE,
+            max_detail_distance=DEDUP_MAX_DETAIL_DISTANCE
+        ) if use_dedup else None
+        
+        # Thresholds of the blank/low-content page filter (see src/page_filter.py)
+        use_page_filter = PAGE_FILTER_ENABLED if use_page_filter is None else use_page_filter
+        self.page_filter = page_filter_thresholds() if use_page_filter else None
         
         logger.info("Initialization complete!")
     
-    def prepare_image(self, image_path: Path) -> str:
+    def serve_metrics(self):
         """
-        Prepare an image for the API by resizing and encoding it.
+        Serve the stage metrics at /metrics if METRICS_PORT is set.
+        
+        Called once per process by the command-line entry points, so
+        extractors built by tests or libraries never bind the port.
+        """
+        if METRICS_PORT:
+            self.metrics.serve(METRICS_PORT)
+    
+    def _prepare_options(self) -> Dict:
+        """Keyword arguments for prepare_page taken from the settings."""
+        return {
+            "max_size": MAX_IMAGE_SIZE,
+            "quality": IMAGE_QUALITY,
+            "fast_decode": FAST_DECODE,
+            "adaptive": ADAPTIVE_RESOLUTION,
+            "min_quality": ADAPTIVE_MIN_QUALITY,
+            "min_stroke_px": ADAPTIVE_MIN_STROKE_PX,
+            "tiling": TILING_MODE,
+            "tile_rows": TILE_ROWS,
+            "tile_columns": TILE_COLUMNS,
+            "tile_overlap": TILE_OVERLAP,
+            "tall_ratio": TILE_TALL_RATIO,
+            "page_hash": self.duplicates is not None,
+            "content_filter": self.page_filter
+        }
+    
+    def prepare(self, image_path: Path,
+                page_index: Optional[int] = None) -> PreparedImage:
+        """
+        Prepare an image and keep the settings it was encoded with.
+        
+        The page is decoded, filtered and encoded with the configured
+        options, exactly as for a request, so this is also what offline
+        batch jobs build their requests from.
         
         Args:
             image_path: Path to the image file
+            page_index: Page of a multi-page TIFF or PDF (None for single images)
             
         Returns:
-            Base64 encoded string of the image
+            PreparedImage with the encoded data, size and JPEG quality
         """
         logger.info(f"Preparing image: {image_path}")
         
         try:
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode not in ('RGB', 'L'):
-                    img = img.convert('RGB')
-                    logger.debug("Converted image to RGB")
-                
-                # Resize if too large
-                if img.size[0] > MAX_IMAGE_SIZE[0] or img.size[1] > MAX_IMAGE_SIZE[1]:
-                    img.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
-                    logger.debug(f"Resized image to: {img.size}")
-                
-                # Save to bytes
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=IMAGE_QUALITY)
-                buffer.seek(0)
-                
-                # Encode to base64
-                encoded = base64.b64encode(buffer.read()).decode('utf-8')
-                logger.info(f"Image prepared successfully. Size: {len(encoded)} bytes")
-                
-                return encoded
+            prepared = prepare_page(image_path, page_index=page_index,
+                                    **self._prepare_options())
+            self.metrics.merge(prepared.timings)
+            logger.info(f"Image prepared successfully. Size: {len(prepared.jpeg)} bytes")
+            return prepared
                 
         except Exception as e:
             logger.error(f"Error preparing image: {e}")
             raise
     
-    def extract_text_from_image(self, image_path: Path) -> Tuple[str, Dict[str, int]]:
+    def prepare_image(self, image_path: Path) -> str:
         """
-        Extract text from a single image file with token counting.
+        Prepare an image for the API by resizing and encoding it.
         
         Args:
             image_path: Path to the image file
             
         Returns:
-            Tuple of (extracted text, token usage dict)
+            Base64 encoded string of the image
         """
+        return self.prepare(image_path).data
+    
+    def build_request_body(self, encoded_image: str) -> Dict:
+        """
+        Build the generateContent request body for one prepared image.
         
-        logger.info(f"Starting text extraction for: {image_path.name}")
-        
-        # Prepare the image
-        encoded_image = self.prepare_image(image_path)
-        
-        # Create the prompt for text extraction
-        extraction_prompt = """Extract ALL text from this scanned textbook page.
-
-IMPORTANT INSTRUCTIONS:
-1. Extract the text EXACTLY as it appears on the page
-2. Maintain all original formatting including:
-   - Paragraph breaks
-   - Section headings
-   - Bullet points or numbered lists
-   - Indentation
-3. Do NOT add any commentary or explanations
-4. Do NOT describe images or diagrams
-5. ONLY output the actual text content from the page
-
-Begin extraction now:"""
-        
-        # Prepare the API request for generateContent endpoint
-        request_body = {
+        Args:
+            encoded_image: Base64 encoded JPEG from prepare_image
+            
+        Returns:
+            Request body dict ready to be sent as JSON
+        """
+        return {
             "contents": [
                 {
                     "role": "user",
                     "parts": [
                         {
-                            "text": extraction_prompt
+                            "text": EXTRACTION_PROMPT
                         },
                         {
                             "inlineData": {
@@ -185,153 +386,973 @@ Begin extraction now:"""
                 "topK": TOP_K
             }
         }
+    
+    def _request_body(self, image: Union[bytes, str]) -> ImageRequestBody:
+        """
+        Build the generateContent request for one page, encoded while it is sent.
         
-        # Get authentication token
-        self.credentials.refresh(google.auth.transport.requests.Request())
+        Args:
+            image: JPEG bytes of a PreparedImage, or a base64 string from
+                   prepare_image
+            
+        Returns:
+            ImageRequestBody to pass to the transport
+        """
+        return ImageRequestBody(self.build_request_body(IMAGE_PLACEHOLDER), image)
+    
+    def extract_text_from_image(self, image_path: Path,
+                                encoded_image: Optional[str] = None,
+                                prepared: Optional[PreparedImage] = None) -> Tuple[str, Dict[str, int]]:
+        """
+        Extract text from a single image file with token counting.
         
-        # Make the API request
-        headers = {
-            "Authorization": f"Bearer {self.credentials.token}",
-            "Content-Type": "application/json"
-        }
+        Args:
+            image_path: Path to the image file
+            encoded_image: Output of prepare_image if the image was already
+                           prepared (e.g. by the preprocessing pipeline)
+            prepared: Output of prepare() if the caller already prepared the
+                      page, e.g. to check its skip_reason first
+            
+        Returns:
+            Tuple of (extracted text, token usage dict)
+        """
+        
+        logger.info(f"Starting text extraction for: {image_path.name}")
+        
+        # Prepare the image unless that already happened ahead of time
+        if encoded_image is not None:
+            return self.extract_text_from_prepared(encoded_image, image_path.name)
+        prepared = prepared or self.prepare(image_path)
+        if prepared.skip_reason:
+            self._note_skipped(prepared, image_path.name)
+            return "", {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        
+        # Reuse the text of a page that looks the same
+        duplicate = self._find_duplicate(prepared, image_path.name)
+        if duplicate:
+            return duplicate["text"], {"input_tokens": 0, "output_tokens": 0,
+                                       "total_tokens": 0}
+        
+        extracted_text, token_usage = self.extract_text_from_prepared(prepared.jpeg,
+                                                                      image_path.name)
+        self._remember_page(prepared, PageRef(image_path), extracted_text)
+        return extracted_text, token_usage
+    
+    def _find_duplicate(self, prepared: PreparedImage, name: str) -> Optional[Dict]:
+        """
+        Look up an already extracted page that looks the same as this one.
+        
+        Args:
+            prepared: Prepared page, with its perceptual hashes
+            name: Name of the page, used in log messages
+            
+        Returns:
+            The match from DuplicateIndex.find, or None
+        """
+        if self.duplicates is None or prepared.phash is None:
+            return None
+        with self.metrics.timer("duplicate_lookup"):
+            duplicate = self.duplicates.find(prepared.phash, prepared.detail_hash)
+        if duplicate:
+            logger.info(f"{name} is a near-duplicate of {duplicate['page_key']} "
+                        f"(distance {duplicate['distance']}); reusing its text")
+            with self._stats_lock:
+                self.duplicate_hits += 1
+        return duplicate
+    
+    def _note_skipped(self, prepared: PreparedImage, name: str):
+        """Log and count a page the pre-filter found nothing to extract on."""
+        logger.info(f"Skipping {name}: {SKIP_DESCRIPTIONS[prepared.skip_reason]} "
+                    f"(ink {prepared.content_stats['ink_coverage']:.2%}, "
+                    f"std {prepared.content_stats['std']:.1f}, "
+                    f"edges {prepared.content_stats['edge_density']:.1f})")
+        with self._stats_lock:
+            self.pages_skipped += 1
+    
+    def _remember_page(self, prepared: PreparedImage, page: PageRef, text: str):
+        """Add an extracted page to the duplicate index."""
+        if self.duplicates is not None and prepared.phash is not None:
+            self.duplicates.add(prepared.phash, prepared.detail_hash, page.key,
+                                page.path, text)
+    
+    def extract_text_from_prepared(self, encoded_image: Union[bytes, str],
+                                   name: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Extract text from an already prepared image with token counting.
+        
+        Args:
+            encoded_image: JPEG bytes of a prepared page, or the base64
+                           string returned by prepare_image
+            name: Name of the page, used in log messages
+            
+        Returns:
+            Tuple of (extracted text, token usage dict)
+        """
+        extracted_text, token_usage, _ = self._generate(encoded_image, name)
+        return extracted_text, token_usage
+    
+    def _generate(self, encoded_image: Union[bytes, str],
+                  name: str) -> Tuple[str, Dict[str, int], bool]:
+        """
+        Send one generateContent request and parse the answer.
+        
+        Args:
+            encoded_image: JPEG bytes of a prepared page, or the base64
+                           string returned by prepare_image
+            name: Name of the page, used in log messages
+            
+        Returns:
+            Tuple of (extracted text, token usage dict, truncated), where
+            truncated is True if the output stopped at MAX_OUTPUT_TOKENS
+        """
+        # Build the generateContent request
+        request_body = self._request_body(encoded_image)
+        
+        # Reuse a stored result if this exact request was made before
+        cache_key = None
+        if self.cache:
+            with self.metrics.timer("cache_lookup"):
+                cache_key = self.cache.make_key(
+                    encoded_image, EXTRACTION_PROMPT, MODEL_ID,
+                    request_body.template["generationConfig"]
+                )
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Cache hit for {name}; skipping API call")
+                with self._stats_lock:
+                    self.cache_hits += 1
+                # Truncated results are never cached
+                return cached[0], cached[1], False
         
         logger.info("Sending request to Llama 4 API...")
         
         try:
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                json=request_body
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"API error: {response.status_code} - {response.text}")
-                raise Exception(f"API request failed: {response.status_code}")
-            
-            # Parse response
-            response_data = response.json()
-            
-            # Extract text from response
-            extracted_text = ""
-            if "candidates" in response_data:
-                for candidate in response_data["candidates"]:
-                    if "content" in candidate and "parts" in candidate["content"]:
-                        for part in candidate["content"]["parts"]:
-                            if "text" in part:
-                                extracted_text += part["text"]
-            
-            # Extract token usage information
-            token_usage = {
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "total_tokens": 0
-            }
+            if self.hedging is not None:
+                # The hedge needs a request slot of its own
+                response, region, reserved_tokens = run_hedged(
+                    lambda sent, cancel: self._send(request_body, name, sent=sent, cancel=cancel),
+                    self.hedging, self._discard_hedged, self.request_slots)
+            else:
+                with self.request_slots:
+                    response, region, reserved_tokens = self._send(request_body, name)
             
-            if "usageMetadata" in response_data:
-                usage = response_data["usageMetadata"]
-                token_usage["input_tokens"] = usage.get("promptTokenCount", 0)
-                token_usage["output_tokens"] = usage.get("candidatesTokenCount", 0)
-                token_usage["total_tokens"] = usage.get("totalTokenCount", 0)
+            # The request stays in flight with the budget governor until its
+            # usage is settled; an answer that cannot be parsed releases it
+            settled = False
+            try:
+                # Parse response
+                with self.metrics.timer("json_parse"):
+                    extracted_text, usage_metadata, truncated = parse_response(response.json())
+                if truncated:
+                    logger.warning(f"Output for {name} was truncated at {MAX_OUTPUT_TOKENS} tokens")
                 
-                # Log token usage for this API call
-                logger.info(f"Token Usage for {image_path.name}:")
-                logger.info(f"  - Input tokens: {token_usage['input_tokens']}")
-                logger.info(f"  - Output tokens: {token_usage['output_tokens']}")
-                logger.info(f"  - Total tokens: {token_usage['total_tokens']}")
+                # Extract token usage information
+                token_usage = self._record_usage(usage_metadata, name, reserved_tokens, region)
+                settled = True
+            finally:
+                if not settled:
+                    self.budget.release()
+            
+            if self.cache and not truncated:
+                with self.metrics.timer("cache_write"):
+                    self.cache.put(cache_key, extracted_text, token_usage)
+            
+            logger.info(f"Successfully extracted {len(extracted_text)} characters")
+            return extracted_text, token_usage, truncated
+            
+        except Exception as e:
+            logger.error(f"Error during text extraction: {e}")
+            raise
+    
+    def _send(self, request_body: ImageRequestBody, name: str, stream: bool = False,
+              sent: Optional[threading.Event] = None,
+              cancel: Optional[threading.Event] = None
+              ) -> Optional[Tuple["requests.Response", Region, int]]:
+        """
+        Admit a request with the budget governor, then send it.
+        
+        The request counts as in flight with the governor until its usage
+        is settled (_record_usage, _discard_hedged); a request that fails
+        or is cancelled is released again. Once a response is returned,
+        the caller must settle it or release it, also when reading it fails.
+        
+        Raises:
+            BudgetExceeded: If the request would exceed the job budget
+            
+        See _send_to_regions for the arguments and the return value.
+        """
+        if not self.budget.admit(cancel):
+            return None
+        try:
+            result = self._send_to_regions(request_body, name, stream, sent, cancel)
+        except BaseException:
+            self.budget.release()
+            raise
+        if result is None:
+            self.budget.release()
+        return result
+    
+    def _send_to_regions(self, request_body: ImageRequestBody, name: str, stream: bool = False,
+                         sent: Optional[threading.Event] = None,
+                         cancel: Optional[threading.Event] = None
+                         ) -> Optional[Tuple["requests.Response", Region, int]]:
+        """
+        Send a request to the best region, failing over to the others.
+        
+        The router picks the region and learns from the outcome. A request
+        that fails with HTTP 429, a 5xx or a connection error is sent again
+        to another region that has not failed it yet. Once every region has
+        failed it (always the case with a single region), it is retried
+        after a backoff, up to MAX_RETRIES times; any other error raises.
+        
+        Args:
+            request_body: generateContent request body from _request_body
+            name: Name of the page, used in log messages
+            stream: Call streamGenerateContent and return before the body
+                    has been read
+            sent: Set when the request goes on the wire (for hedging)
+            cancel: If set while waiting for quota, nothing is sent
+            
+        Returns:
+            Tuple of (HTTP 200 response, region that answered, tokens
+            reserved with the region's rate limiter), or None if cancelled
+        """
+        tried = []
+        retries = 0
+        region = self.router.choose()
+        while True:
+            # Get authentication headers (refreshes the token only when needed)
+            with self.metrics.timer("token"):
+                headers = self.token_provider.auth_headers()
+            
+            # Wait for the region's quota if a rate limiter is configured
+            with self.metrics.timer("rate_limit_wait"):
+                reserved_tokens = region.rate_limiter.acquire() if region.rate_limiter else 0
+            if cancel is not None and cancel.is_set():
+                return None
+            if sent is not None:
+                sent.set()
+            
+            start = time.perf_counter()
+            try:
+                response = self.transport.post_json(
+                    region.stream_endpoint if stream else region.endpoint,
+                    request_body,
+                    headers,
+                    stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.router.record_failure(region, type(e).__name__)
+                error = e
+            else:
+                elapsed = time.perf_counter() - start
+                if not stream:
+                    self.metrics.observe("network", elapsed)
+                if response.status_code == 200:
+                    self.router.record_success(region, elapsed)
+                    if self.hedging is not None and not stream:
+                        self.hedging.record_latency(elapsed)
+                    return response, region, reserved_tokens
                 
-                # Update cumulative totals
+                try:
+                    self._check_response(response, region)
+                except APIRequestError as e:
+                    error = e
+                finally:
+                    response.close()
+                # Errors of the request itself would fail in every region
+                if error.status_code != 429 and error.status_code < 500:
+                    raise error
+                self.router.record_failure(region, f"HTTP {error.status_code}")
+            
+            tried.append(region)
+            region = self.router.choose(exclude=tried)
+            if region is not None:
+                logger.warning(f"Retrying {name} in region {region.name}")
+                continue
+            
+            # No region left to fail over to: back off and start over
+            if retries == MAX_RETRIES:
+                raise error
+            retries += 1
+            delay = self._retry_delay(retries, error, tried[-1])
+            logger.warning(f"Retrying {name} in {delay:.1f}s ({retries}/{MAX_RETRIES})")
+            if cancel is not None:
+                if cancel.wait(delay):
+                    return None
+            else:
+                time.sleep(delay)
+            tried = []
+            region = self.router.choose()
+    
+    def _retry_delay(self, retry: int, error: Exception, region: Region) -> float:
+        """
+        Seconds to wait before retrying a request that failed everywhere.
+        
+        A 429 has already made the region's rate limiter back off, and the
+        next acquire() waits for it. Otherwise the delay grows exponentially
+        from BACKOFF_BASE_SECONDS up to BACKOFF_MAX_SECONDS, with random
+        jitter so concurrent pages do not retry in lockstep.
+        """
+        if getattr(error, "status_code", None) == 429 and region.rate_limiter:
+            return 0.0
+        ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (retry - 1))
+        return random.uniform(ceiling / 2, ceiling)
+    
+    def _discard_hedged(self, result: Tuple["requests.Response", Region, int]):
+        """Count the tokens of a hedged copy whose answer was not used."""
+        response, region, reserved_tokens = result
+        try:
+            token_usage = usage_from_metadata(response.json().get("usageMetadata"))
+        except ValueError:
+            token_usage = usage_from_metadata(None)
+        finally:
+            response.close()
+        
+        if region.rate_limiter:
+            region.rate_limiter.record_usage(reserved_tokens, token_usage)
+        self.budget.settle(token_usage)
+        with self._stats_lock:
+            self.wasted_input_tokens += token_usage["input_tokens"]
+            self.wasted_output_tokens += token_usage["output_tokens"]
+        logger.info(f"Discarded the slower copy of a hedged request "
+                    f"({token_usage['total_tokens']} tokens wasted)")
+    
+    def _check_region(self, region: Region) -> bool:
+        """Health check of an ejected region: probe its endpoint."""
+        probe = probe_endpoint(region.endpoint, self.token_provider.auth_headers(),
+                               timeout=REGION_HEALTH_CHECK_TIMEOUT)
+        logger.info(f"Health check of region {region.name}: {probe.describe()}")
+        return probe.healthy
+    
+    def _check_response(self, response, region: Optional[Region] = None):
+        """
+        Raise APIRequestError for a non-200 response.
+        
+        A 429 slows the region's rate limiter down and a 401 drops the cached
+        token, so the caller's next attempt starts from a sensible state.
+        """
+        if response.status_code == 200:
+            return
+        
+        logger.error(f"API error: {response.status_code} - {response.text}")
+        rate_limiter = region.rate_limiter if region else self.rate_limiter
+        if response.status_code == 429 and rate_limiter:
+            rate_limiter.record_throttled()
+        elif response.status_code == 401:
+            # Force a fresh token for the next attempt
+            self.token_provider.invalidate()
+        raise APIRequestError(response.status_code,
+                              f"API request failed: {response.status_code}")
+    
+    def _record_usage(self, usage_metadata: Optional[Dict], name: str,
+                      reserved_tokens: int,
+                      region: Optional[Region] = None) -> Dict[str, int]:
+        """
+        Turn a response's usageMetadata into a token usage dict and count it.
+        
+        Args:
+            usage_metadata: The usageMetadata of the response (None if missing)
+            name: Name of the page, used in log messages
+            reserved_tokens: Tokens reserved with the rate limiter for the call
+            region: Region that answered (its rate limiter is updated)
+            
+        Returns:
+            Token usage dict with input, output and total tokens
+        """
+        token_usage = usage_from_metadata(usage_metadata)
+        
+        if usage_metadata:
+            # Log token usage for this API call
+            logger.info(f"Token Usage for {name}:")
+            logger.info(f"  - Input tokens: {token_usage['input_tokens']}")
+            logger.info(f"  - Output tokens: {token_usage['output_tokens']}")
+            logger.info(f"  - Total tokens: {token_usage['total_tokens']}")
+            
+            # Update cumulative totals
+            with self._stats_lock:
                 self.total_input_tokens += token_usage["input_tokens"]
                 self.total_output_tokens += token_usage["output_tokens"]
                 self.total_api_calls += 1
+        else:
+            logger.warning("No token usage metadata found in API response")
+        
+        rate_limiter = region.rate_limiter if region else self.rate_limiter
+        if rate_limiter:
+            rate_limiter.record_usage(reserved_tokens, token_usage)
+        self.budget.settle(token_usage)
+        
+        return token_usage
+    
+    def extract_text_streaming(self, encoded_image: Union[bytes, str], name: str,
+                               output_file: Path,
+                               on_chunk: Optional[Callable[[str], None]] = None
+                               ) -> Tuple[Dict[str, int], Dict]:
+        """
+        Extract text via streamGenerateContent, writing it as it arrives.
+        
+        Text chunks are appended to output_file as soon as they are received,
+        so the first lines of a page can be read while the rest is still being
+        generated, and the text never has to be held in memory. The final
+        usageMetadata of the stream is counted like a normal response.
+        
+        Args:
+            encoded_image: JPEG bytes of a prepared page, or the base64
+                           string returned by prepare_image
+            name: Name of the page, used in log messages
+            output_file: File the text is written to (overwritten)
+            on_chunk: Optional callback receiving every text chunk, e.g. to
+                      echo the text to the terminal
+            
+        Returns:
+            Tuple of (token usage dict, stream stats) where the stats hold
+            time_to_first_token and total_seconds (None on a cache hit),
+            characters written and whether the output was truncated
+        """
+        request_body = self._request_body(encoded_image)
+        
+        # A cached result is written out in one go
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(
+                encoded_image, EXTRACTION_PROMPT, MODEL_ID,
+                request_body.template["generationConfig"]
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Cache hit for {name}; skipping API call")
+                with self._stats_lock:
+                    self.cache_hits += 1
+                output_file.write_text(cached[0], encoding='utf-8')
+                if on_chunk:
+                    on_chunk(cached[0])
+                return cached[1], {"time_to_first_token": None, "total_seconds": None,
+                                   "characters": len(cached[0]), "truncated": False}
+        
+        logger.info("Sending streaming request to Llama 4 API...")
+        
+        try:
+            time_to_first_token = None
+            usage_metadata = None
+            truncated = False
+            
+            # The connection is busy until the stream has been read
+            with self.request_slots:
+                response, region, reserved_tokens = self._send(request_body, name, stream=True)
+                # Time from sending the request, not counting quota waits or
+                # attempts in regions that failed
+                start = time.perf_counter() - response.elapsed.total_seconds()
+                # A stream that breaks off is released with the budget governor
+                settled = False
+                try:
+                    with open(output_file, 'w', encoding='utf-8') as f:
+                        writer = StrippedWriter(f)
+                        for event in iter_sse_events(response.iter_lines()):
+                            chunk = event_text(event)
+                            if chunk:
+                                if time_to_first_token is None:
+                                    time_to_first_token = time.perf_counter() - start
+                                    logger.info(f"First tokens for {name} after {time_to_first_token:.2f}s")
+                                writer.write(chunk)
+                                if on_chunk:
+                                    on_chunk(chunk)
+                        
+                            # Only the last event carries the complete usage
+                            if "usageMetadata" in event:
+                                usage_metadata = event["usageMetadata"]
+                            if any(candidate.get("finishReason") in TRUNCATION_FINISH_REASONS
+                                   for candidate in event.get("candidates", [])):
+                                truncated = True
+                
+                    total_seconds = time.perf_counter() - start
+                    self.metrics.observe("network", total_seconds)
+                    if time_to_first_token is not None:
+                        self.metrics.observe("first_token", time_to_first_token)
+                    if truncated:
+                        logger.warning(f"Output for {name} was truncated at {MAX_OUTPUT_TOKENS} tokens")
+                
+                    token_usage = self._record_usage(usage_metadata, name, reserved_tokens, region)
+                    settled = True
+                finally:
+                    response.close()
+                    if not settled:
+                        self.budget.release()
+            
+            if self.cache and not truncated:
+                self.cache.put(cache_key, output_file.read_text(encoding='utf-8'), token_usage)
+            
+            logger.info(f"Streamed {writer.characters} characters in {total_seconds:.2f}s")
+            return token_usage, {"time_to_first_token": time_to_first_token,
+                                 "total_seconds": total_seconds,
+                                 "characters": writer.characters,
+                                 "truncated": truncated}
+            
+        except Exception as e:
+            logger.error(f"Error during streaming text extraction: {e}")
+            raise
+    
+    def _extract_tiles(self, tiled: PreparedImage, name: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Extract the tiles of a page in parallel and stitch the results.
+        
+        Each tile request takes one of the request slots, so the tiles of
+        all pages together stay within the run's concurrency limit.
+        
+        Args:
+            tiled: PreparedImage carrying tiles and tile_grid
+            name: Name of the page, used in log messages
+            
+        Returns:
+            Tuple of (stitched text, summed token usage dict)
+        """
+        rows, columns = tiled.tile_grid
+        logger.info(f"Extracting {name} as {len(tiled.tiles)} tiles ({rows}x{columns})")
+        
+        with ThreadPoolExecutor(max_workers=min(TILE_WORKERS, len(tiled.tiles)),
+                                thread_name_prefix="tile") as executor:
+            results = list(executor.map(
+                lambda item: self.extract_text_from_prepared(
+                    item[1].jpeg, f"{name} [tile {item[0]}/{len(tiled.tiles)}]"),
+                enumerate(tiled.tiles, 1)
+            ))
+        
+        token_usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        for _, tile_usage in results:
+            token_usage = add_token_usage(token_usage, tile_usage)
+        
+        return stitch_tiles([text for text, _ in results], rows, columns), token_usage
+    
+    def _extract_page(self, page: PageRef,
+                      prepared_image: PreparedImage) -> Tuple[str, Dict[str, int]]:
+        """
+        Extract a prepared page, using tiles where the page calls for them.
+        
+        Pages prepared with tiles are extracted tile by tile. In 'auto' tiling
+        mode, a whole-page answer that was cut off at MAX_OUTPUT_TOKENS is
+        replaced by a tiled extraction, so dense pages still come back complete.
+        
+        Args:
+            page: Page being processed
+            prepared_image: The page's PreparedImage
+            
+        Returns:
+            Tuple of (extracted text, token usage dict)
+        """
+        if prepared_image.tiles:
+            return self._extract_tiles(prepared_image, page.name)
+        
+        extracted_text, token_usage, truncated = self._generate(prepared_image.jpeg, page.name)
+        
+        if truncated and TILING_MODE == 'auto':
+            extracted_text, token_usage = self._retile_truncated(page, token_usage)
+        
+        return extracted_text, token_usage
+    
+    def _retile_truncated(self, page: PageRef,
+                          token_usage: Dict[str, int]) -> Tuple[str, Dict[str, int]]:
+        """
+        Re-extract a page whose whole-page output was truncated as tiles.
+        
+        Args:
+            page: Page whose output hit MAX_OUTPUT_TOKENS
+            token_usage: Usage of the truncated call, which was billed as well
+            
+        Returns:
+            Tuple of (stitched text, combined token usage dict)
+        """
+        logger.info(f"Re-extracting {page.name} as tiles after truncation")
+        tiled = prepare_page(page.path, page_index=page.page_index,
+                             **dict(self._prepare_options(), tiling='always'))
+        self.metrics.merge(tiled.timings)
+        extracted_text, tile_usage = self._extract_tiles(tiled, page.name)
+        return extracted_text, add_token_usage(token_usage, tile_usage)
+    
+    def _process_page(self, page: PageRef, output_folder: Path,
+                      position: int, total: Optional[int], journal: ProgressJournal,
+                      prepared: Optional[Future] = None,
+                      job: Optional[str] = None) -> Tuple[str, Dict[str, int]]:
+        """
+        Extract text from one page and save it next to the other outputs.
+        
+        This is the unit of work handed to the worker threads by process_folder.
+        The outcome is appended to the job journal and to the results store
+        as soon as the page is done.
+        
+        Args:
+            page: Page to process (a single image or one page of a document)
+            output_folder: Folder to save the text file in
+            position: 1-based position of the page in the batch (for logging)
+            total: Number of pages in the batch (for logging; None when
+                   watching a folder)
+            journal: Progress journal of the running job
+            prepared: Future of the PreparedImage from the preprocessing
+                      pipeline (None prepares the image on this thread)
+            job: Job name the page is recorded under in the results store
+                 (defaults to the journal name)
+            
+        Returns:
+            Tuple of (extracted text, token usage dict)
+        """
+        logger.info(f"\nProcessing page {position}{f'/{total}' if total else ''}: {page.name}")
+        page_start = time.perf_counter()
+        fingerprint = source_fingerprint(page.path)
+        job = job or journal.path.stem
+        # Stage timings of this page alone, kept with its results record
+        timings = {}
+        
+        try:
+            # Use the image prepared ahead of time, or prepare it now
+            if prepared:
+                wait_start = time.perf_counter()
+                prepared_image = prepared.result()
+                timings["prepare_wait"] = time.perf_counter() - wait_start
+                self.metrics.observe("prepare_wait", timings["prepare_wait"])
+                # Stage timings measured in the worker process
+                self.metrics.merge(prepared_image.timings)
             else:
-                logger.warning("No token usage metadata found in API response")
+                prepared_image = self.prepare(page.path, page.page_index)
+            timings.update(prepared_image.timings)
             
-            logger.info(f"Successfully extracted {len(extracted_text)} characters")
-            return extracted_text.strip(), token_usage
+            # Blank pages, separator sheets and full-page images cost nothing
+            if prepared_image.skip_reason:
+                self._note_skipped(prepared_image, page.name)
+                journal.record(page.key, STATUS_SKIPPED, reason=prepared_image.skip_reason,
+                               content_stats=prepared_image.content_stats, **fingerprint)
+                timings["page_total"] = time.perf_counter() - page_start
+                self.results_store.append(job, page, STATUS_SKIPPED, characters=0,
+                                          timings=timings,
+                                          error=SKIP_DESCRIPTIONS[prepared_image.skip_reason])
+                return "", {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
             
+            output_file = output_folder / f"{page.output_stem}_extracted.txt"
+            stream_stats = None
+            duplicate = self._find_duplicate(prepared_image, page.name)
+            
+            if duplicate:
+                # Same page as one extracted before: no API call
+                extracted_text = duplicate["text"]
+                token_usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+                with self.metrics.timer("file_write"):
+                    output_file.write_text(extracted_text, encoding='utf-8')
+            elif STREAM_RESPONSES and not prepared_image.tiles:
+                # Stream the text straight into the output file
+                token_usage, stream_stats = self.extract_text_streaming(
+                    prepared_image.jpeg, page.name, output_file
+                )
+                if stream_stats["truncated"] and TILING_MODE == 'auto':
+                    extracted_text, token_usage = self._retile_truncated(page, token_usage)
+                    output_file.write_text(extracted_text, encoding='utf-8')
+                else:
+                    extracted_text = output_file.read_text(encoding='utf-8')
+            else:
+                # Extract text and get token usage
+                extract_start = time.perf_counter()
+                extracted_text, token_usage = self._extract_page(page, prepared_image)
+                timings["extract"] = time.perf_counter() - extract_start
+                
+                # Save to file
+                with self.metrics.timer("file_write"):
+                    output_file.write_text(extracted_text, encoding='utf-8')
         except Exception as e:
-            logger.error(f"Error during text extraction: {e}")
+            journal.record(page.key, STATUS_FAILED, error=str(e), **fingerprint)
+            self.results_store.append(job, page, STATUS_FAILED, error=str(e),
+                                      timings=timings)
             raise
+        
+        # Keep the image settings next to the token usage so the effect of
+        # adaptive resolution on promptTokenCount can be measured per book
+        image_settings = {
+            "width": prepared_image.width,
+            "height": prepared_image.height,
+            "quality": prepared_image.quality,
+            "stroke_width": prepared_image.stroke_width
+        }
+        stream_info = {"time_to_first_token": stream_stats["time_to_first_token"]} \
+            if stream_stats else {}
+        if duplicate:
+            stream_info["duplicate_of"] = duplicate["page_key"]
+        else:
+            self._remember_page(prepared_image, page, extracted_text)
+        if stream_stats:
+            timings["extract"] = stream_stats["total_seconds"]
+            timings["first_token"] = stream_stats["time_to_first_token"]
+        with self.metrics.timer("journal"):
+            journal.record(page.key, STATUS_DONE, output_path=output_file,
+                           token_usage=token_usage,
+                           content_hash=text_hash(extracted_text),
+                           image=image_settings, **stream_info, **fingerprint)
+        timings["page_total"] = time.perf_counter() - page_start
+        self.metrics.observe("page_total", timings["page_total"])
+        self.results_store.append(job, page, STATUS_DONE, output_path=output_file,
+                                  token_usage=token_usage,
+                                  characters=len(extracted_text),
+                                  timings=timings, image=image_settings)
+        
+        logger.info(f"Saved extracted text to: {output_file}")
+        return extracted_text, token_usage
+    
+    def write_batch_requests(self, input_folder: Optional[Path] = None,
+                             job_name: Optional[str] = None,
+                             resume: bool = True) -> Path:
+        """
+        Write the requests for a folder to JSONL shards for an offline batch job.
+        
+        The request bodies are built exactly as for synchronous calls. Pages
+        the job journal records as completed are left out when resuming.
+        
+        Args:
+            input_folder: Folder containing images (defaults to INPUT_DIR)
+            job_name: Name of the job and its journal (defaults to the
+                      input folder name)
+            resume: Leave out pages the journal records as completed
+            
+        Returns:
+            The job folder holding the shards and the manifest
+        """
+        input_folder = input_folder or INPUT_DIR
+        job_name = job_name or input_folder.name
+        
+        completed = set()
+        if resume:
+            with ProgressJournal(JOURNAL_DIR / f"{job_name}.jsonl") as journal:
+                completed = {page.key for page in iter_folder_pages(input_folder)
+                             if journal.is_complete(page.key, source_fingerprint(page.path))}
+            if completed:
+                logger.info(f"Leaving out {len(completed)} pages already completed")
+        
+        job_dir = BATCH_DIR / job_name
+        write_request_shards(self, input_folder, job_dir, job_name,
+                             shard_size=BATCH_SHARD_SIZE, skip_keys=completed)
+        return job_dir
+    
+    def ingest_batch_results(self, job_dir: Path, result_files: List[Path],
+                             output_folder: Optional[Path] = None) -> Dict:
+        """
+        Write the results of a finished batch job to per-page output files.
+        
+        Pages are recorded in the job journal like synchronously extracted
+        ones, so process_folder skips them afterwards, and their tokens are
+        added to this extractor's totals. Their spend is recorded with the
+        budget governor, once per job even if the results are ingested
+        again, so it counts towards the job and daily budgets. A token
+        summary is saved as batch_job_summary.txt in the output folder.
+        
+        Args:
+            job_dir: Job folder returned by write_batch_requests
+            result_files: Result JSONL files downloaded from the backend
+            output_folder: Folder to save text files (defaults to OUTPUT_DIR)
+            
+        Returns:
+            Summary dict from ingest_results
+        """
+        output_folder = output_folder or OUTPUT_DIR
+        job_name = load_manifest(job_dir)["job_name"]
+        
+        with ProgressJournal(JOURNAL_DIR / f"{job_name}.jsonl") as journal:
+            summary = ingest_results(job_dir, result_files, output_folder, journal,
+                                     results_store=self.results_store)
+        
+        with self._stats_lock:
+            self.total_input_tokens += summary["input_tokens"]
+            self.total_output_tokens += summary["output_tokens"]
+            self.total_api_calls += sum(1 for page in summary["pages"]
+                                        if page["status"] == "done")
+        
+        # Failed pages may have been billed for some of their tiles too
+        spend_marker = job_dir / SPEND_MARKER
+        if spend_marker.exists():
+            logger.info(f"Spend of batch job {job_name} was recorded before")
+        else:
+            cost = sum(self.budget.record(page, job=job_name) for page in summary["pages"])
+            spend_marker.touch()
+            logger.info(f"Recorded ${cost:.4f} of batch spend for job {job_name}")
+        
+        summary_file = output_folder / "batch_job_summary.txt"
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            f.write(f"Batch Job Summary: {job_name}\n")
+            f.write("=" * 50 + "\n\n")
+            for page in summary["pages"]:
+                if page["status"] == "done":
+                    f.write(f"✅ {page['key']}: {page['input_tokens']} input, "
+                            f"{page['output_tokens']} output tokens\n")
+                else:
+                    f.write(f"❌ {page['key']}: {page['error']}\n")
+            f.write(f"\nTotal input tokens: {summary['input_tokens']}\n")
+            f.write(f"Total output tokens: {summary['output_tokens']}\n")
+            f.write(f"Total tokens used: {summary['total_tokens']}\n")
+        
+        logger.info(f"Batch job summary saved to: {summary_file}")
+        return summary
     
     def process_folder(self, input_folder: Optional[Path] = None, 
-                      output_folder: Optional[Path] = None) -> Dict[str, str]:
+                      output_folder: Optional[Path] = None,
+                      max_workers: Optional[int] = None,
+                      job_name: Optional[str] = None,
+                      resume: bool = True,
+                      keep_results: bool = True) -> Dict[str, str]:
         """
-        Process all images in a folder and save extracted text.
+        Process all images and documents in a folder and save extracted text.
+        
+        Multi-page TIFFs and PDFs are expanded into their pages; each page
+        gets its own output file (<document>_p0001_extracted.txt) and journal
+        entry (<document>#p0001). Pages are decoded one at a time, so memory
+        does not grow with document size.
+        
+        Pages are extracted concurrently by a bounded pool of worker threads,
+        so several API requests can be in flight while others are being
+        prepared or written. Use max_workers=1 for strictly sequential runs.
+        
+        With PREPROCESS_WORKERS > 0, images are decoded and encoded by a pool
+        of worker processes ahead of the requests. At most max_workers +
+        PREFETCH_DEPTH pages are prepared or in flight at any time, which
+        keeps memory bounded on large scans.
+        
+        Every finished page is recorded in a per-job journal. When a job is
+        run again, pages that were completed before (and whose input and
+        output files are unchanged) are skipped instead of re-extracted.
+        
+        Each page's outcome is also appended to the results store, from
+        which extraction_summary.txt is written at the end. With
+        keep_results=False no page text is held in memory at all, so memory
+        stays flat on archives of any size.
         
         Args:
             input_folder: Folder containing images (defaults to INPUT_DIR)
             output_folder: Folder to save text files (defaults to OUTPUT_DIR)
+            max_workers: Maximum number of concurrent API requests
+                         (defaults to MAX_CONCURRENT_REQUESTS)
+            job_name: Name of the job journal (defaults to the input folder name)
+            resume: Skip pages the journal records as completed
+            keep_results: Return the extracted text of every page; pass
+                          False for large runs and read results from the
+                          output files or the results store instead
             
         Returns:
-            Dictionary mapping image filenames to extracted text
+            Dictionary mapping page keys (the file name, plus "#p0001" etc.
+            for document pages) to extracted text (empty if keep_results
+            is False)
         """
         
         # Use default folders if not specified
         input_folder = input_folder or INPUT_DIR
         output_folder = output_folder or OUTPUT_DIR
+        output_folder.mkdir(parents=True, exist_ok=True)
+        max_workers = max(1, max_workers or MAX_CONCURRENT_REQUESTS)
+        self.request_slots = threading.BoundedSemaphore(max_workers)
         
-        # Get all image files
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff'}
-        image_files = [f for f in input_folder.iterdir() 
-                      if f.suffix.lower() in image_extensions]
+        # Expand all supported files into page references (no pixels yet)
+        pages = list(iter_folder_pages(input_folder))
         
-        if not image_files:
+        if not pages:
             logger.warning(f"No image files found in {input_folder}")
             return {}
         
-        logger.info(f"Found {len(image_files)} images to process")
+        logger.info(f"Found {len(pages)} pages to process")
+        
+        # Open the job journal and work out which pages are already done
+        job = job_name or input_folder.name
+        journal = ProgressJournal(JOURNAL_DIR / f"{job}.jsonl")
+        completed = set()
+        if resume:
+            completed = {page.key for page in pages
+                         if journal.is_complete(page.key, source_fingerprint(page.path))}
+            if completed:
+                logger.info(f"Resuming job: {len(completed)} pages already completed")
+        
+        logger.info(f"Using up to {max_workers} concurrent requests")
+        self.budget.start_job(job)
+        pages_open = len(pages) - len(completed)
+        self.budget.log_projection(0, pages_open)
+        
+        # Pages completed before the results store existed get a record
+        # from the journal, so the summary below covers the whole job
+        for page in pages:
+            if page.key in completed and not self.results_store.latest(job, page.key):
+                entry = journal.get(page.key)
+                self.results_store.append(job, page, STATUS_DONE,
+                                          output_path=entry["output_path"],
+                                          token_usage=entry["token_usage"],
+                                          image=entry.get("image"))
         
         results = {}
-        token_summary = []
+        pages_finished = 0
         
-        # Process each image
-        for i, image_file in enumerate(image_files, 1):
-            logger.info(f"\nProcessing image {i}/{len(image_files)}: {image_file.name}")
-            
+        def collect(page: PageRef, future: Future):
+            """Surface the outcome of a page; keep its text only if asked to."""
+            nonlocal pages_finished
+            pages_finished += 1
+            if pages_finished % BUDGET_REPORT_PAGES == 0:
+                self.budget.log_projection(pages_finished, pages_open - pages_finished)
             try:
-                # Extract text and get token usage
-                extracted_text, token_usage = self.extract_text_from_image(image_file)
-                
-                # Save to file
-                output_file = output_folder / f"{image_file.stem}_extracted.txt"
-                output_file.write_text(extracted_text, encoding='utf-8')
-                
-                logger.info(f"Saved extracted text to: {output_file}")
-                results[image_file.name] = extracted_text
-                
-                # Store token usage for summary
-                token_summary.append({
-                    "file": image_file.name,
-                    "input_tokens": token_usage["input_tokens"],
-                    "output_tokens": token_usage["output_tokens"],
-                    "total_tokens": token_usage["total_tokens"]
-                })
-                
+                extracted_text, _ = future.result()
+                if keep_results:
+                    results[page.key] = extracted_text
             except Exception as e:
-                logger.error(f"Failed to process {image_file.name}: {e}")
-                results[image_file.name] = f"ERROR: {str(e)}"
+                logger.error(f"Failed to process {page.name}: {e}")
+                if keep_results:
+                    results[page.key] = f"ERROR: {str(e)}"
         
-        # Log overall token usage summary
-        logger.info("\n" + "="*60)
-        logger.info("TOKEN USAGE SUMMARY:")
-        logger.info("="*60)
-        logger.info(f"Total API calls: {self.total_api_calls}")
-        logger.info(f"Total input tokens: {self.total_input_tokens}")
-        logger.info(f"Total output tokens: {self.total_output_tokens}")
-        logger.info(f"Total tokens used: {self.total_input_tokens + self.total_output_tokens}")
+        # Process the pages on a bounded thread pool. The requests spend
+        # nearly all their time waiting on the network, so threads overlap
+        # well despite the GIL. Image preparation runs ahead in worker
+        # processes; the semaphore caps how many pages are outstanding.
+        pipeline = PreparePipeline(PREPROCESS_WORKERS, **self._prepare_options()) \
+            if PREPROCESS_WORKERS > 0 else None
+        slots = threading.BoundedSemaphore(max_workers + PREFETCH_DEPTH)
         
-        if self.total_api_calls > 0:
-            logger.info(f"Average input tokens per call: {self.total_input_tokens / self.total_api_calls:.2f}")
-            logger.info(f"Average output tokens per call: {self.total_output_tokens / self.total_api_calls:.2f}")
+        try:
+            with journal, ThreadPoolExecutor(max_workers=max_workers,
+                                             thread_name_prefix="extract") as executor:
+                # Finished pages are collected in input order while later
+                # pages are still being submitted, so futures (and the text
+                # they hold) do not pile up over a long run
+                pending = deque()
+                try:
+                    for i, page in enumerate(pages, 1):
+                        if page.key in completed:
+                            if keep_results:
+                                entry = journal.get(page.key)
+                                results[page.key] = Path(entry["output_path"]).read_text(encoding='utf-8')
+                            continue
+                        
+                        # Pages not sent stay open in the journal for a later run
+                        if self.budget.stopped:
+                            logger.warning(f"{self.budget.stop_reason}; not sending the "
+                                           f"remaining pages")
+                            break
+                        
+                        slots.acquire()
+                        prepared = pipeline.submit(page) if pipeline else None
+                        future = executor.submit(self._process_page, page,
+                                                 output_folder, i, len(pages),
+                                                 journal, prepared, job)
+                        future.add_done_callback(lambda _: slots.release())
+                        pending.append((page, future))
+                        
+                        while pending and pending[0][1].done():
+                            collect(*pending.popleft())
+                    
+                    while pending:
+                        collect(*pending.popleft())
+                except KeyboardInterrupt:
+                    # Don't leave worker threads paused by a budget
+                    self.budget.stop("Interrupted")
+                    raise
+        finally:
+            # Every page has finished at this point unless we are unwinding
+            # from an error, in which case queued preparations are dropped
+            if pipeline:
+                pipeline.close(cancel_pending=True)
         
-        # Estimate cost (approximate - adjust based on actual pricing)
-        # Example pricing: $0.075 per 1M tokens
-        estimated_cost = (self.total_input_tokens + self.total_output_tokens) / 1_000_000 * 0.075
-        logger.info(f"Estimated cost: ${estimated_cost:.4f}")
-        logger.info("="*60)
+        # Spend priced from the usage of every request of this run,
+        # including unused hedged copies (see src/budget.py)
+        budget_stats = self.budget.stats()
+        estimated_cost = budget_stats["run_cost"]
         
-        # Create detailed summary file
+        # Create detailed summary file from the results store
         summary_file = output_folder / "extraction_summary.txt"
+        job_summary = self.results_store.summary(job=job)
+        first_token_times = []
         with open(summary_file, 'w', encoding='utf-8') as f:
             f.write("Text Extraction Summary\n")
             f.write("=" * 50 + "\n\n")
@@ -339,25 +1360,43 @@ Begin extraction now:"""
             # File processing results
             f.write("Processing Results:\n")
             f.write("-" * 30 + "\n")
-            for filename, status in results.items():
-                if status.startswith("ERROR"):
-                    f.write(f"❌ {filename}: {status}\n")
+            for record in self.results_store.iter_pages(job=job):
+                if record["status"] == STATUS_FAILED:
+                    f.write(f"❌ {record['page_key']}: ERROR: {record['error']}\n")
+                elif record["status"] == STATUS_SKIPPED:
+                    f.write(f"⏭️ {record['page_key']}: Skipped ({record['error']})\n")
+                elif record["characters"] is not None:
+                    f.write(f"✅ {record['page_key']}: Extracted {record['characters']} characters\n")
                 else:
-                    f.write(f"✅ {filename}: Extracted {len(status)} characters\n")
+                    f.write(f"✅ {record['page_key']}: Extracted\n")
             
             # Token usage details
             f.write("\n\nToken Usage Details:\n")
             f.write("-" * 30 + "\n")
-            for item in token_summary:
-                f.write(f"{item['file']}:\n")
-                f.write(f"  Input tokens: {item['input_tokens']}\n")
-                f.write(f"  Output tokens: {item['output_tokens']}\n")
-                f.write(f"  Total: {item['total_tokens']}\n\n")
+            for record in self.results_store.iter_pages(job=job):
+                if record["status"] != STATUS_DONE:
+                    continue
+                f.write(f"{record['page_key']}:\n")
+                f.write(f"  Input tokens: {record['input_tokens']}\n")
+                f.write(f"  Output tokens: {record['output_tokens']}\n")
+                f.write(f"  Total: {record['total_tokens']}\n")
+                if record["image"]:
+                    f.write(f"  Image sent: {record['image']['width']}x{record['image']['height']}, "
+                            f"JPEG quality {record['image']['quality']}\n")
+                first_token = (record["timings"] or {}).get("first_token")
+                if first_token is not None:
+                    f.write(f"  Time to first token: {first_token:.2f}s\n")
+                    first_token_times.append(first_token)
+                f.write("\n")
             
             # Overall summary
             f.write("\nOverall Token Usage:\n")
             f.write("-" * 30 + "\n")
             f.write(f"Total API calls: {self.total_api_calls}\n")
+            f.write(f"Cache hits (no API call): {self.cache_hits}\n")
+            f.write(f"Near-duplicate pages (no API call): {self.duplicate_hits}\n")
+            f.write(f"Pages skipped by the pre-filter: {self.pages_skipped}\n")
+            f.write(f"Adaptive resolution: {'on' if ADAPTIVE_RESOLUTION else 'off'}\n")
             f.write(f"Total input tokens: {self.total_input_tokens}\n")
             f.write(f"Total output tokens: {self.total_output_tokens}\n")
             f.write(f"Total tokens used: {self.total_input_tokens + self.total_output_tokens}\n")
@@ -366,31 +1405,430 @@ Begin extraction now:"""
                 f.write(f"Average input tokens per call: {self.total_input_tokens / self.total_api_calls:.2f}\n")
                 f.write(f"Average output tokens per call: {self.total_output_tokens / self.total_api_calls:.2f}\n")
             
-            f.write(f"\nEstimated cost: ${estimated_cost:.4f}\n")
+            if self.hedging is not None:
+                hedge_stats = self.hedging.stats()
+                f.write(f"Hedged requests: {hedge_stats['hedged']} of {hedge_stats['requests']} "
+                        f"({hedge_stats['hedge_wins']} answered first by the hedge, "
+                        f"{hedge_stats['no_slot']} left out for lack of a request slot)\n")
+                f.write(f"Wasted tokens (unused hedged copies): {self.wasted_input_tokens} input, "
+                        f"{self.wasted_output_tokens} output\n")
+            
+            f.write(f"\nEstimated cost: ${estimated_cost:.4f} "
+                    f"(${self.budget.pricing.input_per_million}/1M input, "
+                    f"${self.budget.pricing.output_per_million}/1M output tokens)\n")
+            f.write(f"Job spend (all runs): ${budget_stats['job_spent']:.4f}\n")
+            f.write(f"Spend today (all jobs): ${budget_stats['spent_today']:.4f}\n")
+            if budget_stats["paused_seconds"]:
+                f.write(f"Paused by budgets: {budget_stats['paused_seconds']:.0f}s\n")
+            if self.budget.stop_reason:
+                f.write(f"Stopped early: {self.budget.stop_reason}\n")
+            
+            if len(self.router) > 1:
+                f.write("\nRegions:\n")
+                f.write("-" * 30 + "\n")
+                for entry in self.router.stats():
+                    latency = f"{entry['latency']:.2f}s" if entry["latency"] is not None else "n/a"
+                    f.write(f"{entry['region']}: {entry['requests']} requests, "
+                            f"{entry['failures']} failures, {entry['ejections']} ejections, "
+                            f"latency {latency}\n")
+            
+            # Whole job, including pages finished by earlier runs
+            f.write(f"\nJob '{job}' (all runs):\n")
+            f.write("-" * 30 + "\n")
+            f.write(f"Pages done: {job_summary['done']} of {job_summary['pages']} "
+                    f"({job_summary['failed']} failed, {job_summary['skipped']} skipped)\n")
+            f.write(f"Total tokens used: {job_summary['total_tokens']}\n")
+        
+        # Log overall token usage summary
+        logger.info("\n" + "="*60)
+        logger.info("TOKEN USAGE SUMMARY:")
+        logger.info("="*60)
+        logger.info(f"Total API calls: {self.total_api_calls}")
+        logger.info(f"Cache hits (no API call): {self.cache_hits}")
+        logger.info(f"Near-duplicate pages (no API call): {self.duplicate_hits}")
+        logger.info(f"Pages skipped by the pre-filter: {self.pages_skipped}")
+        logger.info(f"Pages resumed from journal: {len(completed)}")
+        logger.info(f"Total input tokens: {self.total_input_tokens}")
+        logger.info(f"Total output tokens: {self.total_output_tokens}")
+        logger.info(f"Total tokens used: {self.total_input_tokens + self.total_output_tokens}")
+        
+        if self.total_api_calls > 0:
+            logger.info(f"Average input tokens per call: {self.total_input_tokens / self.total_api_calls:.2f}")
+            logger.info(f"Average output tokens per call: {self.total_output_tokens / self.total_api_calls:.2f}")
+        
+        if self.hedging is not None:
+            hedge_stats = self.hedging.stats()
+            logger.info(f"Hedged requests: {hedge_stats['hedged']} of {hedge_stats['requests']} "
+                        f"({hedge_stats['hedge_wins']} answered first by the hedge, "
+                        f"{hedge_stats['no_slot']} left out for lack of a request slot)")
+            logger.info(f"Wasted tokens (unused hedged copies): {self.wasted_input_tokens} input, "
+                        f"{self.wasted_output_tokens} output")
+        
+        logger.info(f"Estimated cost: ${estimated_cost:.4f} "
+                    f"(job ${budget_stats['job_spent']:.4f}, today ${budget_stats['spent_today']:.4f})")
+        if self.budget.stop_reason:
+            logger.warning(f"Stopped early: {self.budget.stop_reason}")
+        logger.info(f"Job pages done: {job_summary['done']} of {job_summary['pages']} "
+                    f"({job_summary['failed']} failed)")
+        
+        if first_token_times:
+            logger.info(f"Average time to first token: "
+                        f"{sum(first_token_times) / len(first_token_times):.2f}s")
+        self.transport.log_stats()
+        if len(self.router) > 1:
+            self.router.log_stats()
+        logger.info("Time per stage:")
+        self.metrics.log_summary()
+        logger.info("="*60)
+        
+        # Export the stage timings for dashboards and for comparing runs
+        self.metrics.write_prometheus(METRICS_DIR / f"{job}.prom")
+        self.metrics.write_json(METRICS_DIR / f"{job}_{time.strftime('%Y%m%d-%H%M%S')}.json")
         
         logger.info(f"\nProcessing complete! Summary saved to: {summary_file}")
         return results
 
+    def watch_folder(self, input_folder: Optional[Path] = None,
+                     output_folder: Optional[Path] = None,
+                     max_workers: Optional[int] = None,
+                     job_name: Optional[str] = None,
+                     stop: Optional[threading.Event] = None,
+                     use_inotify: Optional[bool] = None) -> int:
+        """
+        Extract pages continuously as they are dropped into a folder.
+        
+        Files already in the folder are queued first, then every new or
+        rewritten file as soon as it is fully written (see src/watcher.py).
+        Pages go through the same worker threads, preprocessing pipeline,
+        journal and results store as in process_folder, and are written to
+        the same output files. Pages the journal records as completed with
+        an unchanged input file are never sent again, so restarting the
+        watcher or touching the folder does not re-bill anything.
+        
+        Runs until stop is set or the process is interrupted (Ctrl+C); pages
+        already queued are finished before returning.
+        
+        Args:
+            input_folder: Folder to watch (defaults to INPUT_DIR)
+            output_folder: Folder to save text files (defaults to OUTPUT_DIR)
+            max_workers: Maximum number of concurrent API requests
+                         (defaults to MAX_CONCURRENT_REQUESTS)
+            job_name: Name of the job journal (defaults to the input folder name)
+            stop: Event that ends the watch when set
+            use_inotify: Use inotify where available (defaults to
+                         WATCH_USE_INOTIFY; False always polls)
+            
+        Returns:
+            Number of pages extracted while watching (pages that failed or
+            were skipped by the page filter are not counted)
+        """
+        
+        # Use default folders if not specified
+        input_folder = input_folder or INPUT_DIR
+        output_folder = output_folder or OUTPUT_DIR
+        output_folder.mkdir(parents=True, exist_ok=True)
+        max_workers = max(1, max_workers or MAX_CONCURRENT_REQUESTS)
+        self.request_slots = threading.BoundedSemaphore(max_workers)
+        use_inotify = WATCH_USE_INOTIFY if use_inotify is None else use_inotify
+        stop = stop or threading.Event()
+        
+        job = job_name or input_folder.name
+        journal = ProgressJournal(JOURNAL_DIR / f"{job}.jsonl")
+        self.budget.start_job(job)
+        pipeline = PreparePipeline(PREPROCESS_WORKERS, **self._prepare_options()) \
+            if PREPROCESS_WORKERS > 0 else None
+        slots = threading.BoundedSemaphore(max_workers + PREFETCH_DEPTH)
+        # Pages queued or in flight, so repeated events for a file that is
+        # still being processed do not queue it twice
+        in_flight = set()
+        lock = threading.Lock()
+        queued = 0
+        extracted = 0
+        
+        def finished(page: PageRef, future: Future):
+            """Release the page's slot and surface its outcome."""
+            nonlocal extracted
+            with lock:
+                in_flight.discard(page.key)
+                if future.exception() is None and journal.get(page.key)["status"] == STATUS_DONE:
+                    extracted += 1
+            slots.release()
+            if future.exception() is not None:
+                logger.error(f"Failed to process {page.name}: {future.exception()}")
+        
+        def queue_file(path: Path, executor: ThreadPoolExecutor):
+            """Queue the pages of a file that are not completed yet."""
+            nonlocal queued
+            try:
+                pages = list(iter_pages(path))
+            except Exception as e:
+                # Deleted, or not a valid document; a rewrite is picked up again
+                logger.warning(f"Cannot read {path.name}: {e}")
+                return
+            
+            for page in pages:
+                if self.budget.stopped:
+                    return
+                try:
+                    fingerprint = source_fingerprint(page.path)
+                except OSError:
+                    return
+                with lock:
+                    if page.key in in_flight:
+                        continue
+                if journal.is_complete(page.key, fingerprint):
+                    logger.debug(f"{page.name} already extracted")
+                    continue
+                
+                slots.acquire()
+                with lock:
+                    in_flight.add(page.key)
+                queued += 1
+                prepared = pipeline.submit(page) if pipeline else None
+                future = executor.submit(self._process_page, page, output_folder,
+                                         queued, None, journal, prepared, job)
+                future.add_done_callback(lambda done, page=page: finished(page, done))
+        
+        try:
+            with journal, open_watcher(input_folder, use_inotify, WATCH_POLL_INTERVAL_SECONDS,
+                                       WATCH_SETTLE_SECONDS) as watcher, \
+                    ThreadPoolExecutor(max_workers=max_workers,
+                                       thread_name_prefix="extract") as executor:
+                logger.info(f"Watching {input_folder} for new pages ({watcher.kind}); "
+                            f"press Ctrl+C to stop")
+                try:
+                    # The watch is in place before the folder is listed, so
+                    # no file dropped in between is missed
+                    for path in watcher.existing_files():
+                        queue_file(path, executor)
+                    
+                    while not stop.is_set() and not self.budget.stopped:
+                        for path in watcher.poll(timeout=1.0):
+                            queue_file(path, executor)
+                    if self.budget.stopped:
+                        logger.warning(f"{self.budget.stop_reason}; no longer watching")
+                except KeyboardInterrupt:
+                    logger.info("Stopping; finishing the pages already queued...")
+                    self.budget.stop("Interrupted")
+        finally:
+            if pipeline:
+                pipeline.close()
+        
+        logger.info(f"Watch of {input_folder} ended: {extracted} of {queued} queued pages "
+                    f"extracted, {self.total_input_tokens + self.total_output_tokens} tokens used")
+        self.transport.log_stats()
+        self.metrics.write_prometheus(METRICS_DIR / f"{job}.prom")
+        return extracted
+
+
+    def enqueue_folder(self, queue: WorkQueue, input_folder: Optional[Path] = None,
+                       job_name: Optional[str] = None) -> int:
+        """
+        Add the pages of a folder to a shared work queue.
+        
+        Pages the job journal records as completed (with an unchanged input
+        file) are left out, as are pages already in the queue.
+        
+        Args:
+            queue: Work queue the workers claim pages from
+            input_folder: Folder containing images (defaults to INPUT_DIR)
+            job_name: Job name (defaults to the input folder name)
+            
+        Returns:
+            Number of pages added to the queue
+        """
+        input_folder = input_folder or INPUT_DIR
+        job = job_name or input_folder.name
+        with ProgressJournal(JOURNAL_DIR / f"{job}.jsonl") as journal:
+            pages = [page for page in iter_folder_pages(input_folder)
+                     if not journal.is_complete(page.key, source_fingerprint(page.path))]
+        added = queue.enqueue(job, pages)
+        logger.info(f"Queued {added} of {len(pages)} open pages for job '{job}'")
+        return added
+    
+    def process_queue(self, queue: WorkQueue, job: str,
+                      output_folder: Optional[Path] = None,
+                      max_workers: Optional[int] = None,
+                      worker: Optional[str] = None,
+                      stop: Optional[threading.Event] = None) -> int:
+        """
+        Work on a job from a shared queue together with other workers.
+        
+        Pages are claimed under leases, a few more than there are request
+        threads so preparation can run ahead, and extracted exactly as in
+        process_folder (same results store and output files). Each worker
+        keeps its own journal, <job>_<worker>.jsonl, because appends from
+        several hosts to one file can interleave on a network share. A
+        heartbeat thread renews the leases of the pages in progress; if this
+        process dies, its pages go back to the other workers once their
+        leases expire. A failed page is retried (by any worker) until the
+        queue's max_attempts.
+        
+        Returns once no page of the job is pending or leased, or when stop
+        is set or the process is interrupted (Ctrl+C); pages already claimed
+        are finished first.
+        
+        Args:
+            queue: Work queue to claim pages from
+            job: Job name, as used when enqueuing
+            output_folder: Folder to save text files (defaults to OUTPUT_DIR)
+            max_workers: Maximum number of concurrent API requests
+                         (defaults to MAX_CONCURRENT_REQUESTS)
+            worker: Name of this worker in the queue (defaults to
+                    <host>:<process id>)
+            stop: Event that ends the work loop when set
+            
+        Returns:
+            Number of pages this worker processed
+        """
+        output_folder = output_folder or OUTPUT_DIR
+        output_folder.mkdir(parents=True, exist_ok=True)
+        max_workers = max(1, max_workers or MAX_CONCURRENT_REQUESTS)
+        self.request_slots = threading.BoundedSemaphore(max_workers)
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        stop = stop or threading.Event()
+        capacity = max_workers + PREFETCH_DEPTH
+        
+        # Named like the metrics file written at the end
+        worker_name = worker.replace(':', '_')
+        journal = ProgressJournal(JOURNAL_DIR / f"{job}_{worker_name}.jsonl")
+        self.budget.start_job(job)
+        pipeline = PreparePipeline(PREPROCESS_WORKERS, **self._prepare_options()) \
+            if PREPROCESS_WORKERS > 0 else None
+        # Leases of the pages claimed and not finished yet, by lease id
+        held: Dict[str, Lease] = {}
+        lock = threading.Lock()
+        # Set when a page finishes, so a full worker claims more right away
+        wake = threading.Event()
+        finished_all = threading.Event()
+        processed = 0
+        
+        def heartbeat():
+            """Renew the held leases well before they expire."""
+            while not finished_all.wait(queue.lease_seconds / 3):
+                with lock:
+                    leases = list(held.values())
+                for lease in leases:
+                    if not queue.renew(lease):
+                        logger.warning(f"Lost the lease on {lease.page.name}; "
+                                       f"another worker may process it too")
+        
+        def finished(lease: Lease, future: Future):
+            """Report the page's outcome to the queue."""
+            with lock:
+                held.pop(lease.lease_id, None)
+            error = future.exception()
+            if error is None:
+                recorded = queue.complete(lease)
+            elif isinstance(error, BudgetExceeded):
+                # Not the page's fault; leave it for a run with budget left
+                recorded = queue.release(lease)
+            else:
+                logger.error(f"Failed to process {lease.page.name}: {error}")
+                recorded = queue.fail(lease, str(error))
+            if not recorded:
+                logger.warning(f"Lease on {lease.page.name} expired before it finished")
+            wake.set()
+        
+        renewer = threading.Thread(target=heartbeat, name="lease-heartbeat", daemon=True)
+        renewer.start()
+        logger.info(f"Worker {worker} processing job '{job}' from {queue.path}")
+        
+        try:
+            with journal, ThreadPoolExecutor(max_workers=max_workers,
+                                             thread_name_prefix="extract") as executor:
+                try:
+                    while not stop.is_set() and not self.budget.stopped:
+                        with lock:
+                            free = capacity - len(held)
+                        leases = queue.claim(job, worker, limit=free)
+                        for lease in leases:
+                            with lock:
+                                held[lease.lease_id] = lease
+                            processed += 1
+                            prepared = pipeline.submit(lease.page) if pipeline else None
+                            future = executor.submit(self._process_page, lease.page,
+                                                     output_folder, processed, None,
+                                                     journal, prepared, job)
+                            future.add_done_callback(
+                                lambda done, lease=lease: finished(lease, done))
+                        
+                        if leases:
+                            continue
+                        with lock:
+                            idle = not held
+                        if idle and queue.is_drained(job):
+                            break
+                        # Wait for a page of ours to finish, or for leases
+                        # of other workers to expire
+                        wake.wait(QUEUE_POLL_SECONDS)
+                        wake.clear()
+                    if self.budget.stopped:
+                        logger.warning(f"{self.budget.stop_reason}; claiming no more pages")
+                except KeyboardInterrupt:
+                    logger.info("Stopping; finishing the pages already claimed...")
+                    self.budget.stop("Interrupted")
+        finally:
+            finished_all.set()
+            if pipeline:
+                pipeline.close()
+        
+        counts = queue.counts(job)
+        logger.info(f"Worker {worker} processed {processed} pages; job '{job}': "
+                    f"{counts['done']} done, {counts['pending']} pending, "
+                    f"{counts['leased']} leased, {counts['failed']} failed")
+        self.transport.log_stats()
+        # One metrics file per worker, so workers sharing a folder don't collide
+        self.metrics.write_prometheus(METRICS_DIR / f"{job}_{worker_name}.prom")
+        return processed
+
+
 
 def main():
     """Main function to demonstrate usage."""
     
+    ensure_directories()
+    configure_logging()
+    for warning in settings_warnings():
+        logger.warning(warning)
+    
     print("Llama 4 Text Extractor - Local Version with Token Counting")
     print("=" * 60)
     
     try:
         # Create extractor instance
         extractor = LocalLlama4Extractor()
+        extractor.serve_metrics()
+        
+        # Pages given on the command line are streamed to the terminal
+        if len(sys.argv) > 1:
+            for arg in sys.argv[1:]:
+                for page in iter_pages(Path(arg)):
+                    print(f"\n--- {page.name} ---")
+                    prepared = extractor.prepare(page.path, page.page_index)
+                    if prepared.skip_reason:
+                        print(f"--- skipped: {SKIP_DESCRIPTIONS[prepared.skip_reason]} ---")
+                        continue
+                    token_usage, stream_stats = extractor.extract_text_streaming(
+                        prepared.jpeg, page.name,
+                        OUTPUT_DIR / f"{page.output_stem}_extracted.txt",
+                        on_chunk=lambda chunk: print(chunk, end="", flush=True)
+                    )
+                    print(f"\n--- {token_usage['total_tokens']} tokens", end="")
+                    if stream_stats["time_to_first_token"] is not None:
+                        print(f", first text after {stream_stats['time_to_first_token']:.2f}s", end="")
+                    print(" ---")
+            return
         
-        # Check for images in input folder
-        image_files = list(INPUT_DIR.glob("*.jpg")) + list(INPUT_DIR.glob("*.png"))
+        # Check for images and documents in input folder
+        pages = list(iter_folder_pages(INPUT_DIR))
         
-        if not image_files:
+        if not pages:
             print(f"\nNo images found in {INPUT_DIR}")
             print("Please add some scanned textbook pages to the input folder.")
             return
         
-        print(f"\nFound {len(image_files)} images in {INPUT_DIR}")
+        print(f"\nFound {len(pages)} pages in {INPUT_DIR}")
         
         # Process all images
         print("\nStarting text extraction...")
@@ -0,0 +1,215 @@
+"""
+Per-stage timing metrics.
+Every stage of a page (decode, resize, JPEG encode, token refresh,
+network, JSON parse, file write, ...) is timed and aggregated into a
+fixed-bucket histogram. Recording a sample is a bisect and a few additions
+under a lock, so the metrics can stay on in production.
+
+The histograms can be exported in the Prometheus text format (as a file for
+the node_exporter textfile collector, or over HTTP) and as a JSON report.
+"""
+
+import os
+import json
+import errno
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Histogram upper bounds in seconds, from 0.5 ms to 5 minutes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0, 120.0, 300.0)
+
+METRIC_NAME = "llama4_stage_duration_seconds"
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations, as used by Prometheus."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One extra slot for samples above the last bound (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile by linear interpolation within its bucket.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Estimated value in seconds (None without samples)
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+
+class StageMetrics:
+    """
+    Thread-safe registry of one histogram per stage.
+
+    Use timer() around a stage on the current thread, or observe()/merge()
+    for durations measured elsewhere (e.g. in preparation worker processes).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.started = time.time()
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration for a stage."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def merge(self, timings: Optional[Dict[str, float]]):
+        """Record a dict of stage durations, e.g. PreparedImage.timings."""
+        for stage, seconds in (timings or {}).items():
+            self.observe(stage, seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block as one sample of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def stages(self) -> List[str]:
+        with self._lock:
+            return sorted(self._histograms)
+
+    def to_prometheus(self) -> str:
+        """Render all histograms in the Prometheus text exposition format."""
+        lines = [f"# HELP {METRIC_NAME} Time spent per processing stage of a page.",
+                 f"# TYPE {METRIC_NAME} histogram"]
+        with self._lock:
+            for stage in sorted(self._histograms):
+                histogram = self._histograms[stage]
+                cumulative = 0
+                for bound, bucket_count in zip(self._buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict:
+        """Summary per stage: count, total, mean, max and p50/p95/p99."""
+        report = {"started": self.started, "finished": time.time(), "stages": {}}
+        with self._lock:
+            for stage in sorted(self._histograms):
+                histogram = self._histograms[stage]
+                report["stages"][stage] = {
+                    "count": histogram.count,
+                    "total_seconds": round(histogram.sum, 6),
+                    "mean_seconds": round(histogram.sum / histogram.count, 6),
+                    "max_seconds": round(histogram.max, 6),
+                    "p50_seconds": round(histogram.quantile(0.50), 6),
+                    "p95_seconds": round(histogram.quantile(0.95), 6),
+                    "p99_seconds": round(histogram.quantile(0.99), 6)
+                }
+        return report
+
+    def write_prometheus(self, path: Path):
+        """
+        Write the Prometheus text file atomically.
+
+        The node_exporter textfile collector may read the file at any time,
+        so it is written to a temporary name and renamed into place.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(self.to_prometheus(), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def write_json(self, path: Path):
+        """Write the per-run JSON report."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+
+    def log_summary(self):
+        """Write the mean and p95 of every stage to the log."""
+        for stage, summary in self.to_dict()["stages"].items():
+            logger.info(f"  {stage:<16} n={summary['count']:<5} "
+                        f"mean {summary['mean_seconds'] * 1000:8.1f} ms  "
+                        f"p95 {summary['p95_seconds'] * 1000:8.1f} ms")
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+        """
+        Serve the metrics at http://host:port/metrics on a daemon thread.
+
+        Calling it again returns the server already running. If the port is
+        taken, e.g. by another worker process on the same host, a warning is
+        logged and nothing is served; the textfile export still works.
+
+        Returns:
+            The server (call shutdown() to stop it), or None if the port
+            is in use
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                payload = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        with self._lock:
+            if self._server is not None:
+                return self._server
+            try:
+                server = ThreadingHTTPServer((host, port), Handler)
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    raise
+                logger.warning(f"Not serving metrics over HTTP: port {port} is already in use")
+                return None
+            self._server = server
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+        return server
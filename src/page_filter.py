@@ -0,0 +1,94 @@
+"""
+Pre-filter for pages without text worth extracting.
+Scanned books contain blank versos, coloured separator sheets and full-page
+photographs. Each is recognised from a few statistics of a small grayscale
+thumbnail, so it can be skipped before any request is sent:
+
+- ink coverage: fraction of pixels clearly darker than the paper
+- standard deviation of the brightness
+- edge density: mean brightness change between neighbouring pixels; lines
+  of text are full of sharp edges, photographs are mostly smooth
+
+The classifier only needs the decoded page and costs a few milliseconds.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Long side of the thumbnail the statistics are computed on
+THUMBNAIL_SIZE = 512
+# A pixel counts as ink when it is this many levels darker than the paper
+INK_CONTRAST = 60
+
+SKIP_BLANK = "blank"
+SKIP_IMAGE = "image"
+
+SKIP_DESCRIPTIONS = {
+    SKIP_BLANK: "blank page or separator sheet",
+    SKIP_IMAGE: "full-page image"
+}
+
+
+@dataclass(frozen=True)
+class FilterThresholds:
+    """Limits below/above which a page is skipped (see config/settings.py)."""
+    # Pages with less ink coverage than this are blank...
+    blank_max_ink: float = 0.002
+    # ...as are pages of almost uniform brightness (e.g. coloured sheets)
+    uniform_max_std: float = 3.0
+    # Pages with at least this much ink coverage...
+    image_min_ink: float = 0.3
+    # ...and fewer edges than this (gray levels per pixel) are images
+    image_max_edges: float = 6.0
+
+
+def page_statistics(img: Image.Image) -> Dict[str, float]:
+    """
+    Content statistics of a page.
+
+    Args:
+        img: Decoded page image (any size and mode)
+
+    Returns:
+        Dict with ink_coverage, std and edge_density
+    """
+    thumbnail = img.convert('L')
+    thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BOX)
+    gray = np.asarray(thumbnail, dtype=np.float32)
+
+    # The paper is the bright end of the page, whatever its colour
+    paper = np.percentile(gray, 95)
+    return {
+        "ink_coverage": float(np.mean(gray < paper - INK_CONTRAST)),
+        "std": float(gray.std()),
+        "edge_density": float(np.abs(np.diff(gray, axis=1)).mean())
+    }
+
+
+def classify_page(img: Image.Image,
+                  thresholds: FilterThresholds) -> Tuple[Optional[str], Dict[str, float]]:
+    """
+    Decide whether a page can be skipped.
+
+    Args:
+        img: Decoded page image
+        thresholds: Classification limits
+
+    Returns:
+        Tuple of (skip reason or None to extract the page, page statistics)
+    """
+    stats = page_statistics(img)
+    reason = None
+    if (stats["ink_coverage"] < thresholds.blank_max_ink
+            or stats["std"] < thresholds.uniform_max_std):
+        reason = SKIP_BLANK
+    elif (stats["ink_coverage"] >= thresholds.image_min_ink
+          and stats["edge_density"] < thresholds.image_max_edges):
+        reason = SKIP_IMAGE
+    return reason, stats
@@ -0,0 +1,66 @@
+"""
+Pipelined image preparation.
+A process pool prepares upcoming pages while earlier pages are waiting on
+the network, so CPU-heavy decoding and encoding overlaps with API calls.
+"""
+
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from src.documents import PageRef
+from src.image_prep import prepare_page
+
+logger = logging.getLogger(__name__)
+
+
+class PreparePipeline:
+    """
+    Submits page preparation to a pool of worker processes.
+
+    The pipeline itself does not limit how far ahead it runs; callers bound
+    the number of outstanding pages (see LocalLlama4Extractor.process_folder)
+    so that only a fixed number of prepared payloads are held in memory.
+    """
+
+    def __init__(self, workers: int, **prepare_options):
+        """
+        Start the worker processes.
+
+        Args:
+            workers: Number of preparation processes
+            **prepare_options: Keyword arguments for prepare_page
+                               (max_size, quality, ...)
+        """
+        self.prepare_options = prepare_options
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        logger.info(f"Preparing images on {workers} worker processes")
+
+    def submit(self, page: PageRef) -> Future:
+        """
+        Start preparing a page.
+
+        Args:
+            page: Page to prepare
+
+        Returns:
+            Future resolving to a PreparedImage
+        """
+        return self._executor.submit(prepare_page, page.path,
+                                     page_index=page.page_index,
+                                     **self.prepare_options)
+
+    def close(self, cancel_pending: bool = False):
+        """
+        Shut down the worker processes.
+
+        Args:
+            cancel_pending: Cancel preparations that have not started yet
+                            instead of waiting for them
+        """
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel_pending=exc_type is not None)
+
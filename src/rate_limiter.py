@@ -0,0 +1,210 @@
+"""
+Adaptive rate limiting for Llama 4 API calls.
+This module schedules requests against a requests-per-minute and a
+tokens-per-minute quota and backs off when the API answers with HTTP 429.
+"""
+
+import random
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    A classic token bucket that refills continuously at a per-minute rate.
+
+    The level may go negative when a caller consumes more than was reserved
+    (for example when a page used more tokens than estimated). That debt is
+    simply paid back by the refill before the next request is allowed.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Create a bucket that starts full.
+
+        Args:
+            rate_per_minute: Refill rate in units per minute
+            capacity: Maximum burst size (defaults to one minute of refill)
+        """
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self._last_refill = time.monotonic()
+
+    def refill(self, rate_scale: float = 1.0):
+        """Add the units accumulated since the last refill."""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self.level = min(self.capacity,
+                         self.level + elapsed * self.rate_per_minute * rate_scale / 60)
+
+    def wait_time(self, amount: float, rate_scale: float = 1.0) -> float:
+        """
+        Seconds until `amount` units are available (0 if available now).
+
+        Requests larger than the capacity only wait for a full bucket, so a
+        single oversized page can never block forever.
+        """
+        needed = min(amount, self.capacity) - self.level
+        if needed <= 0:
+            return 0.0
+        return needed * 60 / (self.rate_per_minute * rate_scale)
+
+    def consume(self, amount: float):
+        """Remove units from the bucket (may drive the level negative)."""
+        self.level -= amount
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe scheduler enforcing both request and token quotas.
+
+    Call acquire() before each API request and record_usage() with the
+    usageMetadata counts after it. On HTTP 429, record_throttled() halves the
+    effective rate and pauses all callers for a jittered exponential backoff;
+    every later success ramps the rate back up towards the configured quota.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float = 0,
+                 initial_token_estimate: int = 2000,
+                 backoff_base: float = 2.0, backoff_max: float = 60.0,
+                 min_rate_scale: float = 0.05, ramp_up_step: float = 0.05):
+        """
+        Configure the limiter.
+
+        Args:
+            requests_per_minute: Request quota (0 disables the request limit)
+            tokens_per_minute: Token quota (0 disables the token limit)
+            initial_token_estimate: Tokens assumed per request until real
+                                    usage has been observed
+            backoff_base: First backoff delay in seconds after a 429
+            backoff_max: Upper bound for a single backoff delay in seconds
+            min_rate_scale: Lowest fraction of the quota the limiter drops to
+            ramp_up_step: Fraction of the quota regained per successful request
+        """
+        self._lock = threading.Lock()
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+        self.initial_token_estimate = initial_token_estimate
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_rate_scale = min_rate_scale
+        self.ramp_up_step = ramp_up_step
+
+        # Adaptive state
+        self.rate_scale = 1.0
+        self._consecutive_throttles = 0
+        self._blocked_until = 0.0
+
+        # Running average of observed tokens per request, used to reserve
+        # tokens before the real count is known
+        self._token_estimate = float(initial_token_estimate)
+        self._observed_requests = 0
+
+        # Statistics
+        self.total_wait_seconds = 0.0
+        self.throttled_responses = 0
+
+    def spawn(self) -> "AdaptiveRateLimiter":
+        """
+        Create a fresh limiter with the same quotas and tuning.
+
+        Quotas are granted per region, so the extractor gives every extra
+        region its own copy of the configured limiter.
+        """
+        return AdaptiveRateLimiter(
+            requests_per_minute=self._request_bucket.rate_per_minute if self._request_bucket else 0,
+            tokens_per_minute=self._token_bucket.rate_per_minute if self._token_bucket else 0,
+            initial_token_estimate=self.initial_token_estimate,
+            backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max,
+            min_rate_scale=self.min_rate_scale,
+            ramp_up_step=self.ramp_up_step
+        )
+
+    @property
+    def token_estimate(self) -> int:
+        """Tokens currently reserved for each request."""
+        return int(self._token_estimate)
+
+    def acquire(self) -> int:
+        """
+        Block until a request may be sent, then reserve quota for it.
+
+        Returns:
+            The number of tokens reserved, to be passed back to record_usage()
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(0.0, self._blocked_until - now)
+                reserved = self.token_estimate
+
+                for bucket, amount in ((self._request_bucket, 1),
+                                       (self._token_bucket, reserved)):
+                    if bucket is not None:
+                        bucket.refill(self.rate_scale)
+                        wait = max(wait, bucket.wait_time(amount, self.rate_scale))
+
+                if wait <= 0:
+                    if self._request_bucket is not None:
+                        self._request_bucket.consume(1)
+                    if self._token_bucket is not None:
+                        self._token_bucket.consume(reserved)
+                    return reserved
+                self.total_wait_seconds += wait
+
+            # Sleep outside the lock so other threads can record results
+            logger.debug(f"Rate limiter waiting {wait:.2f}s")
+            time.sleep(wait)
+
+    def record_usage(self, reserved: int, token_usage: Dict[str, int]):
+        """
+        Reconcile a reservation with the real usage and ramp the rate up.
+
+        Args:
+            reserved: Value returned by the matching acquire() call
+            token_usage: Token usage dict returned by the extractor
+        """
+        actual = token_usage.get("total_tokens", 0)
+        with self._lock:
+            if self._token_bucket is not None and actual:
+                self._token_bucket.consume(actual - reserved)
+
+            if actual:
+                self._observed_requests += 1
+                self._token_estimate += (actual - self._token_estimate) / self._observed_requests
+
+            self._consecutive_throttles = 0
+            if self.rate_scale < 1.0:
+                self.rate_scale = min(1.0, self.rate_scale + self.ramp_up_step)
+
+    def record_throttled(self) -> float:
+        """
+        React to an HTTP 429 response.
+
+        Halves the effective rate and blocks every caller for an exponential
+        backoff with random jitter, so concurrent workers do not retry in lockstep.
+
+        Returns:
+            The backoff delay in seconds
+        """
+        with self._lock:
+            self.throttled_responses += 1
+            self._consecutive_throttles += 1
+            self.rate_scale = max(self.min_rate_scale, self.rate_scale / 2)
+
+            ceiling = min(self.backoff_max,
+                          self.backoff_base * 2 ** (self._consecutive_throttles - 1))
+            delay = random.uniform(ceiling / 2, ceiling)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+
+        logger.warning(f"Rate limited by API; backing off {delay:.1f}s "
+                       f"(rate now {self.rate_scale:.0%} of quota)")
+        return delay
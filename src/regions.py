@@ -0,0 +1,252 @@
+"""
+Routing of Llama 4 requests across Vertex AI regions.
+Quota is granted per region, so spreading pages over several regions raises
+the aggregate throughput, and a region that slows down or runs out of quota
+no longer stalls the whole batch.
+
+Every region keeps moving averages of its latency and error rate. Each
+request goes to a randomly chosen available region, weighted by how fast
+and reliable it has been. A region that keeps failing is ejected for a
+cooldown that doubles with every ejection; when the cooldown is over it is
+health-checked (see src/diagnostics.py) before it receives traffic again.
+"""
+
+import random
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.rate_limiter import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class Region:
+    """One regional endpoint and what has been observed about it."""
+
+    def __init__(self, name: str, endpoint: str,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None):
+        """
+        Args:
+            name: Region name, e.g. us-east5
+            endpoint: generateContent URL in this region
+            rate_limiter: Limiter for this region's quota (None = unlimited)
+        """
+        self.name = name
+        self.endpoint = endpoint
+        # Same model, answering as a stream of server-sent events
+        self.stream_endpoint = endpoint.replace(":generateContent",
+                                                ":streamGenerateContent?alt=sse")
+        self.rate_limiter = rate_limiter
+
+        # Moving averages (latency in seconds; None until the first success)
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+
+        # Ejection state
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.needs_check = False
+        self.checking = False
+
+        # Statistics
+        self.requests = 0
+        self.failures = 0
+
+    def __repr__(self) -> str:
+        return f"Region({self.name!r})"
+
+
+class RegionRouter:
+    """
+    Thread-safe, latency- and error-weighted choice between regions.
+
+    Call choose() before a request and record_success() or record_failure()
+    with its outcome. Only region-level failures should be recorded: HTTP
+    429, 5xx, timeouts and connection errors. A rejected request (HTTP 400)
+    says nothing about the region.
+    """
+
+    def __init__(self, regions: List[Region],
+                 health_check: Optional[Callable[[Region], bool]] = None,
+                 eject_after: int = 3, max_error_rate: float = 0.5,
+                 eject_seconds: float = 30.0, max_eject_seconds: float = 300.0,
+                 smoothing: float = 0.2, rng: Optional[random.Random] = None):
+        """
+        Configure the router.
+
+        Args:
+            regions: Regions to route between; the first is the primary
+            health_check: Called in a background thread with a region whose
+                          cooldown is over; returns True to readmit it.
+                          Without one, the region is readmitted on probation
+                          and ejected again by its next failure.
+            eject_after: Consecutive failures that eject a region
+            max_error_rate: Error rate (moving average) that ejects a region
+            eject_seconds: Cooldown of the first ejection
+            max_eject_seconds: Upper bound for the doubling cooldown
+            smoothing: Weight of the newest observation in the moving averages
+            rng: Random generator (for reproducible tests)
+        """
+        if not regions:
+            raise ValueError("At least one region is required")
+        self.regions = list(regions)
+        self.health_check = health_check
+        self.eject_after = eject_after
+        self.max_error_rate = max_error_rate
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.smoothing = smoothing
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def _available(self, region: Region, now: float) -> bool:
+        return region.ejected_until <= now and not region.needs_check
+
+    def _weight(self, region: Region, default_latency: float) -> float:
+        """Share of the traffic a region gets: fast, reliable and unthrottled wins."""
+        latency = region.latency if region.latency is not None else default_latency
+        weight = (1.0 - region.error_rate) ** 2 / max(latency, 0.001)
+        if region.rate_limiter is not None:
+            # A region backing off from HTTP 429 runs at a fraction of its quota
+            weight *= region.rate_limiter.rate_scale
+        return max(weight, 1e-9)
+
+    def choose(self, exclude: Iterable[Region] = ()) -> Optional[Region]:
+        """
+        Pick the region for the next request.
+
+        Args:
+            exclude: Regions that already failed this request
+
+        Returns:
+            An available region. If every region is ejected, the one whose
+            cooldown ends first (a request is better than a stalled batch),
+            unless regions are excluded, in which case None is returned.
+        """
+        exclude = list(exclude)
+        with self._lock:
+            now = time.monotonic()
+            self._start_health_checks(now)
+
+            candidates = [region for region in self.regions
+                          if region not in exclude and self._available(region, now)]
+            if not candidates:
+                if exclude:
+                    return None
+                return min(self.regions, key=lambda region: region.ejected_until)
+            if len(candidates) == 1:
+                return candidates[0]
+
+            # Regions without measurements are assumed as fast as the fastest
+            # one, so they get tried
+            known = [region.latency for region in candidates if region.latency is not None]
+            default_latency = min(known) if known else 1.0
+            weights = [self._weight(region, default_latency) for region in candidates]
+            return self._rng.choices(candidates, weights=weights)[0]
+
+    def record_success(self, region: Region, latency: float):
+        """
+        Count a successful request.
+
+        Args:
+            region: Region that answered
+            latency: Seconds the request took
+        """
+        with self._lock:
+            region.requests += 1
+            region.consecutive_failures = 0
+            if region.latency is None:
+                region.latency = latency
+            else:
+                region.latency += self.smoothing * (latency - region.latency)
+            region.error_rate -= self.smoothing * region.error_rate
+            # A region that has recovered starts over with the shortest cooldown
+            if region.ejections and region.error_rate < self.max_error_rate / 4:
+                region.ejections = 0
+
+    def record_failure(self, region: Region, reason: str):
+        """
+        Count a region-level failure and eject the region if it keeps failing.
+
+        Args:
+            region: Region the request was sent to
+            reason: Short description for the log, e.g. "HTTP 429"
+        """
+        with self._lock:
+            now = time.monotonic()
+            region.requests += 1
+            region.failures += 1
+            region.consecutive_failures += 1
+            region.error_rate += self.smoothing * (1.0 - region.error_rate)
+
+            # Requests still in flight when the region was ejected
+            if not self._available(region, now):
+                return
+            if (region.consecutive_failures >= self.eject_after
+                    or region.error_rate > self.max_error_rate):
+                self._eject(region, now, reason)
+
+    def _eject(self, region: Region, now: float, reason: str):
+        """Take a region out of rotation (called with the lock held)."""
+        cooldown = min(self.max_eject_seconds, self.eject_seconds * 2 ** region.ejections)
+        region.ejections += 1
+        region.ejected_until = now + cooldown
+        region.needs_check = self.health_check is not None
+        # On probation: one more failure after readmission ejects it again
+        region.consecutive_failures = self.eject_after - 1
+        logger.warning(f"Ejecting region {region.name} for {cooldown:.0f}s after {reason} "
+                       f"(error rate {region.error_rate:.0%})")
+
+    def _start_health_checks(self, now: float):
+        """Health-check regions whose cooldown is over (called with the lock held)."""
+        for region in self.regions:
+            if region.needs_check and not region.checking and region.ejected_until <= now:
+                region.checking = True
+                threading.Thread(target=self._run_health_check, args=(region,),
+                                 name=f"health-check-{region.name}", daemon=True).start()
+
+    def _run_health_check(self, region: Region):
+        """Readmit a region if its health check passes, otherwise eject it again."""
+        try:
+            healthy = bool(self.health_check(region))
+        except Exception as e:
+            logger.warning(f"Health check of region {region.name} failed: {e}")
+            healthy = False
+
+        with self._lock:
+            region.checking = False
+            if healthy:
+                region.needs_check = False
+                region.error_rate = min(region.error_rate, self.max_error_rate / 2)
+                logger.info(f"Region {region.name} passed its health check; readmitting it")
+            else:
+                self._eject(region, time.monotonic(), "a failed health check")
+
+    def stats(self) -> List[Dict]:
+        """Per-region counters and moving averages, primary region first."""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "region": region.name,
+                "requests": region.requests,
+                "failures": region.failures,
+                "latency": region.latency,
+                "error_rate": region.error_rate,
+                "ejections": region.ejections,
+                "available": self._available(region, now)
+            } for region in self.regions]
+
+    def log_stats(self):
+        """Log one line per region."""
+        for entry in self.stats():
+            latency = f"{entry['latency']:.2f}s" if entry["latency"] is not None else "n/a"
+            logger.info(f"Region {entry['region']}: {entry['requests']} requests, "
+                        f"{entry['failures']} failures, latency {latency}, "
+                        f"error rate {entry['error_rate']:.0%}"
+                        f"{'' if entry['available'] else ' (ejected)'}")
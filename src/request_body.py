@@ -0,0 +1,133 @@
+"""
+Low-copy encoding of generateContent request bodies.
+A page's JPEG is kept as raw bytes from preparation until it is sent. The
+JSON around the image is serialized once, and the image is base64-encoded
+chunk by chunk while the HTTP body is written. So a request in flight holds
+the JPEG plus one chunk, not the base64 text, the request dict and its
+serialized JSON all at once.
+"""
+
+import json
+import base64
+from typing import Dict, Iterator, Union
+
+# Stands in for the image data when the JSON around it is serialized
+IMAGE_PLACEHOLDER = "@@IMAGE_DATA@@"
+
+# Raw bytes per base64 chunk; a multiple of 3 so chunks encode without padding
+CHUNK_SIZE = 48 * 1024
+
+
+def base64_length(size: int) -> int:
+    """Length of the base64 encoding of `size` bytes."""
+    return 4 * ((size + 2) // 3)
+
+
+def iter_base64(data: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Base64-encode data in chunks.
+
+    Joined, the chunks equal base64.b64encode(data).
+
+    Args:
+        data: Raw bytes
+        chunk_size: Raw bytes per chunk (rounded down to a multiple of 3)
+    """
+    chunk_size = max(3, chunk_size - chunk_size % 3)
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield base64.b64encode(view[start:start + chunk_size])
+
+
+class ImageRequestBody:
+    """
+    A JSON request body with one base64 image, encoded while it is sent.
+
+    The body is built from a request dict whose image data is
+    IMAGE_PLACEHOLDER. It can be sent any number of times (retries, hedged
+    copies); every reader() streams it from the start.
+    """
+
+    def __init__(self, template: Dict, image: Union[bytes, str]):
+        """
+        Serialize the JSON around the image.
+
+        Args:
+            template: Request body with IMAGE_PLACEHOLDER as the image data
+            image: Raw JPEG bytes, or an already base64-encoded str
+        """
+        self.template = template
+        self.image = image
+        prefix, suffix = json.dumps(template).split(IMAGE_PLACEHOLDER)
+        self._prefix = prefix.encode('utf-8')
+        self._suffix = suffix.encode('utf-8')
+        self._image_length = (base64_length(len(image)) if isinstance(image, bytes)
+                              else len(image))
+
+    def __len__(self) -> int:
+        return len(self._prefix) + self._image_length + len(self._suffix)
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """The body as a sequence of byte strings, about chunk_size each."""
+        yield self._prefix
+        if isinstance(self.image, bytes):
+            yield from iter_base64(self.image, chunk_size)
+        else:
+            for start in range(0, len(self.image), chunk_size):
+                yield self.image[start:start + chunk_size].encode('ascii')
+        yield self._suffix
+
+    def reader(self) -> "BodyReader":
+        """A fresh file-like object streaming the body (for requests)."""
+        return BodyReader(self)
+
+    def to_dict(self) -> Dict:
+        """The complete request dict (builds the full base64 string)."""
+        data = (base64.b64encode(self.image).decode('ascii')
+                if isinstance(self.image, bytes) else self.image)
+        return json.loads(json.dumps(self.template).replace(IMAGE_PLACEHOLDER, data))
+
+
+class BodyReader:
+    """
+    Read-only stream over an ImageRequestBody.
+
+    requests sends an object with read() and __len__ with a Content-Length
+    header, reading it block by block instead of materialising it. (It is
+    deliberately not an io.IOBase: requests would call its tell() and fall
+    back to chunked encoding.)
+    """
+
+    def __init__(self, body: ImageRequestBody):
+        self._length = len(body)
+        self._chunks = body.chunks()
+        self._current = b""
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            data = self.read(CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+    def read(self, size: int = -1) -> bytes:
+        """Up to size bytes of the body (all remaining bytes if size < 0)."""
+        if size is None or size < 0:
+            size = self._length
+        parts = []
+        while size > 0:
+            if self._offset >= len(self._current):
+                self._current = next(self._chunks, None)
+                self._offset = 0
+                if self._current is None:
+                    self._current = b""
+                    break
+            part = self._current[self._offset:self._offset + size]
+            self._offset += len(part)
+            size -= len(part)
+            parts.append(part)
+        return b"".join(parts)
@@ -0,0 +1,54 @@
+"""
+Parsing of generateContent responses.
+Shared by the synchronous extractor and the offline batch-job ingest, so a
+page gives the same text and token counts whichever way it was sent.
+"""
+
+from typing import Dict, Optional, Tuple
+
+# finishReason values meaning the output hit maxOutputTokens
+TRUNCATION_FINISH_REASONS = {"MAX_TOKENS", "length"}
+
+
+def usage_from_metadata(usage_metadata: Optional[Dict]) -> Dict[str, int]:
+    """
+    Token usage dict from a response's usageMetadata.
+
+    Args:
+        usage_metadata: The usageMetadata of a response (None if missing)
+
+    Returns:
+        Dict with input_tokens, output_tokens and total_tokens
+    """
+    usage_metadata = usage_metadata or {}
+    return {
+        "input_tokens": usage_metadata.get("promptTokenCount", 0),
+        "output_tokens": usage_metadata.get("candidatesTokenCount", 0),
+        "total_tokens": usage_metadata.get("totalTokenCount", 0)
+    }
+
+
+def parse_response(response_data: Dict) -> Tuple[str, Optional[Dict], bool]:
+    """
+    Extract the text of a generateContent response.
+
+    Args:
+        response_data: Parsed JSON body of the response
+
+    Returns:
+        Tuple of (stripped text, usageMetadata or None, truncated), where
+        truncated is True if the output stopped at maxOutputTokens
+    """
+    candidates = response_data.get("candidates", [])
+
+    # Collect the parts and join once instead of growing a string
+    parts = []
+    for candidate in candidates:
+        for part in candidate.get("content", {}).get("parts", []):
+            if "text" in part:
+                parts.append(part["text"])
+
+    truncated = any(candidate.get("finishReason") in TRUNCATION_FINISH_REASONS
+                    for candidate in candidates)
+
+    return "".join(parts).strip(), response_data.get("usageMetadata"), truncated
@@ -0,0 +1,187 @@
+"""
+Content-addressed cache for extraction results.
+Results are stored on disk under a hash of everything that determines the
+model's answer, so re-running unchanged pages costs no API calls.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from src.request_body import base64_length, iter_base64
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    On-disk cache mapping request hashes to extracted text and token usage.
+
+    Each entry is a small JSON file in a two-level directory layout
+    (cache_dir/ab/abcdef....json). Writes go through a temporary file and an
+    atomic rename, so concurrent workers never see half-written entries.
+    Entries older than max_age_seconds are ignored and removed; when the
+    cache grows beyond max_size_bytes the least recently used entries are
+    evicted first.
+    """
+
+    # Run a full eviction pass after this many writes
+    EVICTION_INTERVAL = 100
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int = 500 * 1024 * 1024,
+                 max_age_seconds: float = 30 * 24 * 3600):
+        """
+        Open (and create if needed) a cache directory.
+
+        Args:
+            cache_dir: Directory holding the cache entries
+            max_size_bytes: Total size the cache is trimmed down to
+            max_age_seconds: Entries older than this are treated as misses
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+        self.evict()
+
+    @staticmethod
+    def make_key(encoded_image: Union[bytes, str], prompt: str, model_id: str,
+                 generation_config: Dict) -> str:
+        """
+        Hash everything that influences the model output.
+
+        Args:
+            encoded_image: Image as sent to the API: base64 string, or raw
+                           JPEG bytes (hashed as their base64 encoding, so
+                           both forms of an image share a key)
+            prompt: Extraction prompt text
+            model_id: Model identifier
+            generation_config: generationConfig values of the request
+
+        Returns:
+            Hex digest identifying the request
+        """
+        hasher = hashlib.sha256()
+        for part in (model_id, prompt,
+                     json.dumps(generation_config, sort_keys=True)):
+            data = part.encode('utf-8')
+            # Length-prefix each part so boundaries cannot be confused
+            hasher.update(len(data).to_bytes(8, 'big'))
+            hasher.update(data)
+
+        if isinstance(encoded_image, bytes):
+            # Encoded chunk by chunk instead of building the base64 string
+            hasher.update(base64_length(len(encoded_image)).to_bytes(8, 'big'))
+            for chunk in iter_base64(encoded_image):
+                hasher.update(chunk)
+        else:
+            data = encoded_image.encode('utf-8')
+            hasher.update(len(data).to_bytes(8, 'big'))
+            hasher.update(data)
+        return hasher.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, int]]]:
+        """
+        Look up a cached result.
+
+        Args:
+            key: Value returned by make_key()
+
+        Returns:
+            Tuple of (extracted text, token usage dict), or None on a miss
+        """
+        path = self._entry_path(key)
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path.name}: {e}")
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.max_age_seconds:
+            path.unlink(missing_ok=True)
+            return None
+
+        # Record the access so size-based eviction removes cold entries first
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return entry["text"], entry["token_usage"]
+
+    def put(self, key: str, text: str, token_usage: Dict[str, int]):
+        """
+        Store a result.
+
+        Args:
+            key: Value returned by make_key()
+            text: Extracted text
+            token_usage: Token usage dict of the original API call
+        """
+        path = self._entry_path(key)
+        path.parent.mkdir(exist_ok=True)
+
+        entry = {
+            "text": text,
+            "token_usage": token_usage,
+            "created_at": time.time()
+        }
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entry), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes_since_eviction += 1
+            run_eviction = self._writes_since_eviction >= self.EVICTION_INTERVAL
+            if run_eviction:
+                self._writes_since_eviction = 0
+        if run_eviction:
+            self.evict()
+
+    def evict(self):
+        """Remove expired entries, then trim the cache to max_size_bytes."""
+        now = time.time()
+        entries = []
+        total_size = 0
+        removed = 0
+
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            # The file mtime is refreshed on every hit; age is checked against
+            # the creation time stored in the entry on lookup as well
+            if now - stat.st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        if total_size > self.max_size_bytes:
+            # Least recently used first
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= self.max_size_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total_size -= size
+                removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} cache entries")
@@ -0,0 +1,244 @@
+"""
+Structured, append-only store of per-page results.
+Every finished (or failed) page is appended as one row to a SQLite database
+holding where its text was written, its token usage, stage timings and
+status. Rows are never updated; the newest row of a page within a job is
+its current state. Summaries are computed with SQL on demand, so nothing
+has to be kept in memory during a run and reports over very large archives
+only touch the indexes they need.
+
+Like the work queue, the database uses SQLite's rollback journal rather than
+WAL, so workers on other hosts can share it over a network filesystem.
+Appends take the write lock up front (BEGIN IMMEDIATE) and wait for other
+writers up to a timeout.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from src.documents import PageRef
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    book TEXT NOT NULL,
+    page_key TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    page_index INTEGER,
+    status TEXT NOT NULL,
+    output_path TEXT,
+    error TEXT,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    total_tokens INTEGER NOT NULL DEFAULT 0,
+    characters INTEGER,
+    timings TEXT,
+    image TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_page_results_job_page ON page_results (job, page_key, id);
+CREATE INDEX IF NOT EXISTS idx_page_results_book ON page_results (book, page_key, id);
+CREATE INDEX IF NOT EXISTS idx_page_results_source ON page_results (source_path, id);
+"""
+
+# Newest row of every page of a job
+LATEST_FOR_JOB = """
+SELECT * FROM page_results
+WHERE id IN (SELECT MAX(id) FROM page_results WHERE job = ? GROUP BY page_key)
+"""
+
+# Newest row of every page of a book, across all jobs
+LATEST_FOR_BOOK = """
+SELECT * FROM page_results
+WHERE id IN (SELECT MAX(id) FROM page_results WHERE book = ? GROUP BY page_key)
+"""
+
+# Newest rows of the next pages of a job or book after a page key
+LATEST_BATCH = """
+SELECT * FROM page_results
+WHERE id IN (SELECT MAX(id) FROM page_results WHERE {column} = ? AND page_key > ?
+             GROUP BY page_key ORDER BY page_key LIMIT ?)
+ORDER BY page_key
+"""
+
+
+def book_name(page: PageRef) -> str:
+    """
+    Book a page belongs to.
+
+    Pages of a multi-page document belong to that document; single images
+    belong to the folder they were scanned into.
+    """
+    if page.page_index is not None:
+        return page.path.stem
+    return page.path.parent.name
+
+
+class ResultsStore:
+    """
+    Thread-safe append-only SQLite store of page results.
+
+    One connection is shared by all worker threads; every append is its own
+    transaction, so a crash loses at most the page being written. A store
+    can be shared by several processes.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30):
+        """
+        Open the store, creating the database if needed.
+
+        Args:
+            path: Location of the SQLite database file
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Autocommit mode; appends open their transaction explicitly
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # Stores created in WAL mode by earlier versions are switched back
+        if self._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(SCHEMA)
+
+    def append(self, job: str, page: PageRef, status: str,
+               output_path: Optional[Path] = None,
+               token_usage: Optional[Dict[str, int]] = None,
+               characters: Optional[int] = None,
+               timings: Optional[Dict[str, float]] = None,
+               image: Optional[Dict] = None,
+               error: Optional[str] = None):
+        """
+        Append the outcome of one page.
+
+        Args:
+            job: Job the page was processed in
+            page: The page
+            status: "done", "failed" or "skipped" (see src/journal.py)
+            output_path: Where the extracted text was written
+            token_usage: Token usage dict for the page
+            characters: Length of the extracted text
+            timings: Seconds spent per stage on this page
+            image: Settings the page image was sent with
+            error: Error message for failed pages, or why a page was skipped
+        """
+        token_usage = token_usage or {}
+        row = (job, book_name(page), page.key, str(page.path), page.page_index,
+               status, str(output_path) if output_path else None, error,
+               token_usage.get("input_tokens", 0), token_usage.get("output_tokens", 0),
+               token_usage.get("total_tokens", 0), characters,
+               json.dumps(timings) if timings else None,
+               json.dumps(image) if image else None, time.time())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO page_results (job, book, page_key, source_path, page_index,"
+                    " status, output_path, error, input_tokens, output_tokens, total_tokens,"
+                    " characters, timings, image, recorded_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def latest(self, job: str, page_key: str) -> Optional[Dict]:
+        """Newest record of a page within a job (None if never recorded)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM page_results WHERE job = ? AND page_key = ?"
+                " ORDER BY id DESC LIMIT 1", (job, page_key)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def history(self, source_path: Path) -> Iterator[Dict]:
+        """All records of an input file, oldest first, across jobs."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM page_results WHERE source_path = ? ORDER BY id",
+                (str(source_path),)).fetchall()
+        for row in rows:
+            yield self._to_dict(row)
+
+    def iter_pages(self, job: Optional[str] = None, book: Optional[str] = None,
+                   batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        Current record of every page of a job or a book, ordered by page key.
+
+        Rows are fetched in batches, so the whole result set is never held
+        in memory. Every batch is its own query: no read lock is held while
+        the caller works through the rows, so appends are not blocked.
+
+        Args:
+            job: Job to list (exactly one of job and book)
+            book: Book to list, across all jobs
+            batch_size: Rows fetched per round trip
+        """
+        _, value = self._latest_query(job, book)
+        query = LATEST_BATCH.format(column="job" if job is not None else "book")
+        after = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, (value, after, batch_size)).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                yield self._to_dict(row)
+            after = rows[-1]["page_key"]
+
+    def summary(self, job: Optional[str] = None, book: Optional[str] = None) -> Dict:
+        """
+        Aggregate the current records of a job or a book.
+
+        Returns:
+            Dict with page counts (pages, done, failed, skipped), token totals and
+            total characters extracted
+        """
+        query, value = self._latest_query(job, book)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS pages,"
+                " COALESCE(SUM(status = 'done'), 0) AS done,"
+                " COALESCE(SUM(status = 'failed'), 0) AS failed,"
+                " COALESCE(SUM(status = 'skipped'), 0) AS skipped,"
+                " COALESCE(SUM(input_tokens), 0) AS input_tokens,"
+                " COALESCE(SUM(output_tokens), 0) AS output_tokens,"
+                " COALESCE(SUM(total_tokens), 0) AS total_tokens,"
+                " COALESCE(SUM(characters), 0) AS characters"
+                f" FROM ({query})", (value,)).fetchone()
+        return dict(row)
+
+    @staticmethod
+    def _latest_query(job: Optional[str], book: Optional[str]):
+        if (job is None) == (book is None):
+            raise ValueError("Pass exactly one of job and book")
+        return (LATEST_FOR_JOB, job) if job is not None else (LATEST_FOR_BOOK, book)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        for field in ("timings", "image"):
+            if record[field]:
+                record[field] = json.loads(record[field])
+        return record
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,90 @@
+"""
+Server-sent event parsing for streamGenerateContent.
+With ?alt=sse the endpoint answers with a stream of "data: {...}" events,
+each holding a partial GenerateContentResponse. The text parts arrive in
+order; usageMetadata is complete only on the last event.
+"""
+
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Union
+
+logger = logging.getLogger(__name__)
+
+
+def iter_sse_events(lines: Iterable[Union[bytes, str]]) -> Iterator[Dict]:
+    """
+    Decode the JSON payloads of a server-sent event stream.
+
+    Args:
+        lines: Lines of the response body without their line endings, e.g.
+               response.iter_lines()
+
+    Yields:
+        The parsed JSON of each event's data field
+    """
+    data_lines: List[str] = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+
+        if not line:
+            # A blank line ends the event
+            if data_lines:
+                yield json.loads("\n".join(data_lines))
+                data_lines = []
+            continue
+
+        if line.startswith(":"):
+            # Comment / keep-alive
+            continue
+
+        field, _, value = line.partition(":")
+        if field == "data":
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+        else:
+            logger.debug(f"Ignoring SSE field: {field}")
+
+    # The stream may end without a final blank line
+    if data_lines:
+        yield json.loads("\n".join(data_lines))
+
+
+def event_text(event: Dict) -> str:
+    """Concatenated text parts of one streamed response chunk."""
+    return "".join(part.get("text", "")
+                   for candidate in event.get("candidates", [])
+                   for part in candidate.get("content", {}).get("parts", []))
+
+
+class StrippedWriter:
+    """
+    Write streamed chunks to a file as if the whole text had been strip()ped.
+
+    Leading whitespace is dropped and whitespace at the end of a chunk is held
+    back until more text follows, so the file ends up identical to what the
+    non-streaming path writes.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.started = False
+        self.pending = ""
+        self.characters = 0
+
+    def write(self, chunk: str):
+        if not self.started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return
+            self.started = True
+
+        stripped = chunk.rstrip()
+        if stripped:
+            self.file.write(self.pending + stripped)
+            self.characters += len(self.pending) + len(stripped)
+            # Flush so readers of the output file see the text as it arrives
+            self.file.flush()
+            self.pending = chunk[len(stripped):]
+        else:
+            self.pending += chunk
@@ -0,0 +1,128 @@
+"""
+Page tiling and seam-aware stitching.
+Tall or dense pages are split into overlapping tiles that are extracted
+separately; the tile texts are joined again with the lines duplicated in
+the overlaps removed.
+"""
+
+import re
+import difflib
+from typing import Dict, List, Tuple
+
+# Longest run of duplicated lines searched for at a seam
+MAX_SEAM_LINES = 8
+
+# Two lines are considered the same if they are at least this similar
+LINE_SIMILARITY = 0.85
+
+# Shorter seam fragments are too ambiguous to be treated as duplicates
+MIN_FRAGMENT_CHARS = 10
+
+
+def plan_tiles(size: Tuple[int, int], rows: int, columns: int,
+               overlap: float) -> List[Tuple[int, int, int, int]]:
+    """
+    Compute overlapping tile boxes in reading order.
+
+    Tiles are ordered column by column, top to bottom within a column, so
+    that the text of a multi-column page comes out in reading order.
+    Vertical neighbours overlap by `overlap` of the tile height; columns do
+    not overlap, since the gutter between columns holds no text.
+
+    Args:
+        size: (width, height) of the page
+        rows: Number of tiles stacked vertically
+        columns: Number of tiles side by side
+        overlap: Vertical overlap as a fraction of the tile height
+
+    Returns:
+        List of (left, top, right, bottom) crop boxes
+    """
+    width, height = size
+    tile_height = height / (rows - (rows - 1) * overlap) if rows > 1 else height
+    step = tile_height * (1 - overlap)
+    tile_width = width / columns
+
+    boxes = []
+    for column in range(columns):
+        left = round(column * tile_width)
+        right = round((column + 1) * tile_width)
+        for row in range(rows):
+            top = round(row * step)
+            bottom = min(height, round(row * step + tile_height))
+            boxes.append((left, top, right, bottom))
+    return boxes
+
+
+def _normalize(line: str) -> str:
+    """Lower-case a line and drop whitespace and punctuation for comparison."""
+    return re.sub(r'[\W_]+', '', line.lower())
+
+
+def _lines_match(a: str, b: str) -> bool:
+    a, b = _normalize(a), _normalize(b)
+    if not a or not b:
+        return a == b
+    return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= LINE_SIMILARITY
+
+
+def stitch_pair(upper: str, lower: str) -> str:
+    """
+    Join the texts of two vertically overlapping tiles.
+
+    Finds the longest run of lines (up to MAX_SEAM_LINES) at the end of the
+    upper text that reappears at the start of the lower text and drops it
+    from the lower text. A line cut in half by the seam usually shows up as
+    a fragment in one tile and in full in the other; the longer version is
+    kept.
+    """
+    upper_lines = upper.rstrip().split("\n")
+    lower_lines = lower.lstrip().split("\n")
+
+    max_k = min(MAX_SEAM_LINES, len(upper_lines), len(lower_lines))
+    for k in range(max_k, 0, -1):
+        tail = upper_lines[-k:]
+        head = lower_lines[:k]
+        if any(_normalize(line) for line in tail) and \
+                all(_lines_match(a, b) for a, b in zip(tail, head)):
+            return "\n".join(upper_lines + lower_lines[k:])
+
+    # No full-line duplicate: check for a fragment of a cut line at the seam
+    last, first = _normalize(upper_lines[-1]), _normalize(lower_lines[0])
+    if min(len(last), len(first)) >= MIN_FRAGMENT_CHARS:
+        if len(first) > len(last) and last in first:
+            return "\n".join(upper_lines[:-1] + lower_lines)
+        if first in last:
+            return "\n".join(upper_lines + lower_lines[1:])
+
+    return "\n".join(upper_lines + lower_lines)
+
+
+def stitch_tiles(texts: List[str], rows: int, columns: int) -> str:
+    """
+    Reassemble a page from tile texts ordered as returned by plan_tiles().
+
+    Args:
+        texts: Extracted text of each tile
+        rows: Number of tile rows
+        columns: Number of tile columns
+
+    Returns:
+        The stitched page text
+    """
+    column_texts = []
+    for column in range(columns):
+        column_tiles = [t for t in texts[column * rows:(column + 1) * rows] if t.strip()]
+        if not column_tiles:
+            continue
+        stitched = column_tiles[0]
+        for text in column_tiles[1:]:
+            stitched = stitch_pair(stitched, text)
+        column_texts.append(stitched.strip())
+    return "\n\n".join(column_texts)
+
+
+def add_token_usage(total: Dict[str, int], usage: Dict[str, int]) -> Dict[str, int]:
+    """Sum two token usage dicts."""
+    return {key: total.get(key, 0) + usage.get(key, 0)
+            for key in ("input_tokens", "output_tokens", "total_tokens")}
@@ -0,0 +1,171 @@
+"""
+Pooled HTTP transport for Llama 4 API calls.
+All requests share one keep-alive connection pool, so the TCP and TLS
+handshakes to the Vertex AI endpoint are paid once per connection instead
+of once per page.
+"""
+
+import gzip
+import json
+import zlib
+import logging
+import threading
+from typing import Dict, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.request_body import ImageRequestBody
+
+logger = logging.getLogger(__name__)
+
+
+class PooledTransport:
+    """
+    Thread-safe wrapper around a requests.Session with a sized pool.
+
+    Every request gets a (connect, read) timeout so a hung connection fails
+    that page instead of stalling the whole batch. Request bodies can
+    optionally be gzip-compressed. stats() reports how many connections were
+    opened versus how many requests they served.
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10.0,
+                 read_timeout: float = 120.0, compress: bool = False,
+                 compress_level: int = 6):
+        """
+        Create the session and mount the pooled adapter.
+
+        Args:
+            pool_size: Maximum number of kept-alive connections per host
+            connect_timeout: Seconds to wait for a connection to open
+            read_timeout: Seconds to wait between bytes of the response
+            compress: Send request bodies with Content-Encoding: gzip
+            compress_level: gzip level (1 = fastest, 9 = smallest)
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.compress = compress
+        self.compress_level = compress_level
+
+        self.session = requests.Session()
+        # pool_block makes extra threads wait for a free connection instead
+        # of opening throwaway connections beyond the pool size
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                                    pool_block=True)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+        self._bytes_sent = 0
+        self._uncompressed_bytes = 0
+
+    def post_json(self, url: str, body: Union[Dict, ImageRequestBody],
+                  headers: Dict[str, str],
+                  timeout: Optional[tuple] = None,
+                  stream: bool = False) -> requests.Response:
+        """
+        POST a JSON body over a pooled connection.
+
+        Args:
+            url: Endpoint URL
+            body: Request body: a dict serialized to JSON, or an
+                  ImageRequestBody that is encoded while it is sent
+            headers: Request headers (Authorization etc.)
+            timeout: Optional (connect, read) override for this request
+            stream: Return as soon as the headers arrive and read the body
+                    incrementally (the caller must close the response)
+
+        Returns:
+            The requests.Response
+        """
+        headers = dict(headers)
+        headers["Content-Type"] = "application/json"
+
+        if isinstance(body, ImageRequestBody):
+            raw_size = len(body)
+            if self.compress:
+                # One compressed copy, built from the streamed chunks
+                compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 31)
+                data = b"".join([compressor.compress(chunk) for chunk in body.chunks()]
+                                + [compressor.flush()])
+                size = len(data)
+            else:
+                data = body.reader()
+                size = raw_size
+        else:
+            data = json.dumps(body).encode('utf-8')
+            raw_size = size = len(data)
+            if self.compress:
+                data = gzip.compress(data, compresslevel=self.compress_level)
+                size = len(data)
+        if self.compress:
+            headers["Content-Encoding"] = "gzip"
+
+        with self._lock:
+            self._requests_sent += 1
+            self._bytes_sent += size
+            self._uncompressed_bytes += raw_size
+
+        return self.session.post(url, data=data, headers=headers,
+                                 timeout=timeout or self.timeout, stream=stream)
+
+    def get(self, url: str, headers: Dict[str, str],
+            timeout: Optional[tuple] = None) -> requests.Response:
+        """
+        GET a URL over a pooled connection (used for polling job status).
+
+        Args:
+            url: URL to fetch
+            headers: Request headers (Authorization etc.)
+            timeout: Optional (connect, read) override for this request
+
+        Returns:
+            The requests.Response
+        """
+        with self._lock:
+            self._requests_sent += 1
+        return self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Connection-reuse statistics for the lifetime of the transport.
+
+        Returns:
+            Dict with requests sent, connections opened, reuse ratio and
+            bytes sent (before and after compression)
+        """
+        connections_opened = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections_opened += pool.num_connections
+
+        with self._lock:
+            requests_sent = self._requests_sent
+            bytes_sent = self._bytes_sent
+            uncompressed_bytes = self._uncompressed_bytes
+
+        reused = max(0, requests_sent - connections_opened)
+        return {
+            "requests_sent": requests_sent,
+            "connections_opened": connections_opened,
+            "connection_reuse_ratio": reused / requests_sent if requests_sent else 0.0,
+            "bytes_sent": bytes_sent,
+            "uncompressed_bytes": uncompressed_bytes
+        }
+
+    def log_stats(self):
+        """Write the connection statistics to the log."""
+        stats = self.stats()
+        logger.info(f"HTTP requests sent: {stats['requests_sent']}")
+        logger.info(f"HTTP connections opened: {stats['connections_opened']}")
+        logger.info(f"Connection reuse: {stats['connection_reuse_ratio']:.0%}")
+        if self.compress and stats['uncompressed_bytes']:
+            logger.info(f"Request bytes sent: {stats['bytes_sent']:,} "
+                        f"({stats['bytes_sent'] / stats['uncompressed_bytes']:.0%} of uncompressed)")
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
@@ -0,0 +1,293 @@
+"""
+Hot-folder watching for continuous ingestion.
+Scanners drop pages into the input folder all day. A watcher reports each
+supported file once it is fully written, so it can be extracted seconds
+after it lands instead of at the next full run.
+
+On Linux the folder is watched with inotify (through ctypes, no extra
+dependency): a file is complete when the writer closes it (IN_CLOSE_WRITE)
+or when it is renamed into the folder (IN_MOVED_TO). Elsewhere, or if
+inotify is unavailable, the folder is polled and a file is reported once
+its size and modification time have stopped changing.
+"""
+
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.documents import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# inotify constants (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+# wd, mask, cookie and name length, followed by the name
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# (size, modification time) of a file
+Signature = Tuple[int, float]
+
+
+def is_candidate(path: Path) -> bool:
+    """True for supported files that are not hidden or temporary copies."""
+    return (path.suffix.lower() in SUPPORTED_EXTENSIONS
+            and not path.name.startswith(('.', '~')))
+
+
+def _signature(path: Path) -> Optional[Signature]:
+    """Size and mtime of a regular file, or None if it is gone."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class FolderWatcher(ABC):
+    """
+    Reports the files of a folder that are ready to be extracted.
+
+    existing_files() lists what is already there; poll() then returns new
+    or rewritten files as they complete. A file that is still being written
+    (modified within the last settle_seconds) is held back and reported by
+    a later poll() once it has settled.
+    """
+
+    kind = "none"
+
+    def __init__(self, folder: Path, settle_seconds: float = 2.0):
+        """
+        Set up the watcher.
+
+        Args:
+            folder: Folder to watch
+            settle_seconds: How long a file must be unmodified to count as
+                            fully written when there is no close event
+        """
+        self.folder = Path(folder)
+        self.settle_seconds = settle_seconds
+        self._unsettled: Dict[str, Signature] = {}
+
+    def _is_settled(self, signature: Signature) -> bool:
+        return time.time() - signature[1] >= self.settle_seconds
+
+    def existing_files(self) -> List[Path]:
+        """Files already in the folder that are fully written, in name order."""
+        ready = []
+        for path in sorted(self.folder.iterdir()):
+            if not is_candidate(path):
+                continue
+            signature = _signature(path)
+            if signature is None:
+                continue
+            if self._is_settled(signature):
+                self._mark_reported(path, signature)
+                ready.append(path)
+            else:
+                self._unsettled[path.name] = signature
+        return ready
+
+    def _mark_reported(self, path: Path, signature: Signature):
+        """Hook for watchers that track what they have reported."""
+
+    def _check_unsettled(self) -> List[Path]:
+        """Held-back files that have stopped changing."""
+        ready = []
+        for name, previous in list(self._unsettled.items()):
+            path = self.folder / name
+            signature = _signature(path)
+            if signature is None:
+                del self._unsettled[name]
+            elif signature == previous and self._is_settled(signature):
+                del self._unsettled[name]
+                self._mark_reported(path, signature)
+                ready.append(path)
+            else:
+                self._unsettled[name] = signature
+        return ready
+
+    @abstractmethod
+    def poll(self, timeout: float) -> List[Path]:
+        """
+        Wait up to timeout seconds for files to complete.
+
+        Returns:
+            The files that completed since the last call (possibly none)
+        """
+
+    def close(self):
+        """Release the watch."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PollingWatcher(FolderWatcher):
+    """Rescans the folder every interval seconds (works on any platform)."""
+
+    kind = "polling"
+
+    def __init__(self, folder: Path, interval: float = 2.0, settle_seconds: float = 2.0):
+        """
+        Take the first scan on the next poll().
+
+        Args:
+            folder: Folder to watch
+            interval: Seconds between scans
+            settle_seconds: How long a file must be unmodified to count as
+                            fully written
+        """
+        super().__init__(folder, settle_seconds)
+        self.interval = interval
+        self._reported: Dict[str, Signature] = {}
+        self._next_scan = time.monotonic()
+
+    def _mark_reported(self, path: Path, signature: Signature):
+        self._reported[path.name] = signature
+
+    def poll(self, timeout: float) -> List[Path]:
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(0.0, timeout))
+            return []
+        time.sleep(max(0.0, wait))
+        self._next_scan = time.monotonic() + self.interval
+
+        present = set()
+        for path in self.folder.iterdir():
+            if not is_candidate(path):
+                continue
+            present.add(path.name)
+            signature = _signature(path)
+            if signature is None or self._reported.get(path.name) == signature:
+                continue
+            # New or rewritten; report it once it has stopped changing
+            self._unsettled.setdefault(path.name, signature)
+
+        # Forget deleted files, so a file copied in again is picked up
+        for name in set(self._reported) - present:
+            del self._reported[name]
+
+        return sorted(self._check_unsettled())
+
+
+class InotifyWatcher(FolderWatcher):
+    """Linux inotify watch for files closed after writing or moved in."""
+
+    kind = "inotify"
+
+    def __init__(self, folder: Path, settle_seconds: float = 2.0):
+        """
+        Start watching the folder.
+
+        Args:
+            folder: Folder to watch
+            settle_seconds: How long files found at startup must be
+                            unmodified to count as fully written
+
+        Raises:
+            OSError: If inotify is not available
+        """
+        super().__init__(folder, settle_seconds)
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        try:
+            init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, "libc has no inotify support")
+
+        self._fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, f"inotify_init1 failed: {os.strerror(code)}")
+        if add_watch(self._fd, os.fsencode(str(self.folder)), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            code = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(code, f"inotify_add_watch failed on {self.folder}: {os.strerror(code)}")
+
+    def _read_events(self) -> Tuple[List[str], bool]:
+        """Names from all queued events, and whether the queue overflowed."""
+        names, overflowed = [], False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return names, overflowed
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                if mask & IN_Q_OVERFLOW:
+                    overflowed = True
+                elif length:
+                    names.append(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+                offset += length
+
+    def poll(self, timeout: float) -> List[Path]:
+        # Wake up regularly while files found at startup are settling
+        if self._unsettled:
+            timeout = min(timeout, 0.5)
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+
+        ready = []
+        if readable:
+            names, overflowed = self._read_events()
+            if overflowed:
+                # Events were lost; fall back to listing the whole folder
+                logger.warning(f"inotify queue overflowed; rescanning {self.folder}")
+                names += [path.name for path in sorted(self.folder.iterdir())]
+            for name in names:
+                path = self.folder / name
+                if is_candidate(path) and path.is_file():
+                    self._unsettled.pop(name, None)
+                    ready.append(path)
+        ready += self._check_unsettled()
+
+        # One entry per file, in the order the files completed
+        return list(dict.fromkeys(ready))
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def open_watcher(folder: Path, use_inotify: bool = True, interval: float = 2.0,
+                 settle_seconds: float = 2.0) -> FolderWatcher:
+    """
+    Watch a folder with inotify where possible, otherwise by polling.
+
+    Args:
+        folder: Folder to watch
+        use_inotify: Try inotify first (False always polls, e.g. for
+                     network shares, where inotify sees no remote writes)
+        interval: Seconds between scans when polling
+        settle_seconds: How long a file must be unmodified to count as
+                        fully written when there is no close event
+
+    Returns:
+        An InotifyWatcher or a PollingWatcher
+    """
+    if use_inotify:
+        try:
+            return InotifyWatcher(folder, settle_seconds)
+        except OSError as e:
+            logger.info(f"inotify unavailable ({e}); polling {folder} every {interval}s instead")
+    return PollingWatcher(folder, interval, settle_seconds)
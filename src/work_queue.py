@@ -0,0 +1,266 @@
+"""
+Shared work queue for running several extraction workers on one job.
+The pages of a job are enqueued once into a SQLite database. Each worker
+process (on this machine, or on other hosts that mount the same folder)
+claims pages under a time-limited lease, keeps the lease alive while the
+page is being extracted and marks the page done or failed when it finishes.
+A worker that crashes stops renewing its leases, so its pages become
+claimable again once the lease expires, and no page is handed to two live
+workers at the same time.
+
+The database uses SQLite's rollback journal rather than WAL, because WAL
+needs shared memory and does not work on network filesystems. Claims take
+a write lock (BEGIN IMMEDIATE), so concurrent claims are serialized by the
+filesystem's file locking.
+"""
+
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple
+
+from src.documents import PageRef
+
+logger = logging.getLogger(__name__)
+
+STATE_PENDING = "pending"
+STATE_LEASED = "leased"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    page_key TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    page_index INTEGER,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (job, page_key)
+);
+CREATE INDEX IF NOT EXISTS idx_queue_items_claim ON queue_items (job, state, id);
+"""
+
+
+class Lease(NamedTuple):
+    """A page claimed by one worker until `expires` (time.time())."""
+    job: str
+    page: PageRef
+    lease_id: str
+    attempt: int
+    expires: float
+
+
+class WorkQueue:
+    """
+    Thread-safe SQLite queue of pages with leases.
+
+    A queue can be shared by any number of processes; every method is its
+    own transaction. A lease is only honoured while it is held: once it has
+    expired and the page was claimed again, renew(), complete() and fail()
+    with the old lease do nothing.
+    """
+
+    def __init__(self, path: Path, lease_seconds: float = 120,
+                 max_attempts: int = 3, timeout: float = 30):
+        """
+        Open the queue, creating the database if needed.
+
+        Args:
+            path: Location of the SQLite database file
+            lease_seconds: How long a claim lasts without being renewed
+            max_attempts: Claims of a page (including ones whose worker
+                          crashed) before it is marked failed
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        # Autocommit mode; claims open their transaction explicitly
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+
+    def enqueue(self, job: str, pages: Iterable[PageRef]) -> int:
+        """
+        Add pages to a job; pages already in the queue are left as they are.
+
+        Args:
+            job: Job name
+            pages: Pages to add (their paths must be valid for every worker)
+
+        Returns:
+            Number of pages added
+        """
+        now = time.time()
+        rows = [(job, page.key, str(page.path.resolve()), page.page_index, STATE_PENDING, now)
+                for page in pages]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO queue_items"
+                    " (job, page_key, source_path, page_index, state, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)", rows)
+                added = self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def claim(self, job: str, worker: str, limit: int = 1) -> List[Lease]:
+        """
+        Lease up to `limit` pending pages, or pages whose lease has expired.
+
+        Pages whose lease expired on their last allowed attempt are marked
+        failed instead of being handed out again.
+
+        Args:
+            job: Job name
+            worker: Name of the claiming worker (for status reports)
+            limit: Largest number of pages to claim
+
+        Returns:
+            The new leases, oldest pages first (empty if there is no work)
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        expires = now + self.lease_seconds
+        leases = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                abandoned = self._conn.execute(
+                    "UPDATE queue_items SET state = ?, error = ?, lease_id = NULL, updated_at = ?"
+                    " WHERE job = ? AND state = ? AND lease_expires < ? AND attempts >= ?",
+                    (STATE_FAILED, f"Lease expired on all {self.max_attempts} attempts",
+                     now, job, STATE_LEASED, now, self.max_attempts)).rowcount
+                if abandoned:
+                    logger.warning(f"Gave up on {abandoned} pages whose workers kept disappearing")
+
+                rows = self._conn.execute(
+                    "SELECT id, page_key, source_path, page_index, state, worker, attempts"
+                    " FROM queue_items WHERE job = ?"
+                    " AND (state = ? OR (state = ? AND lease_expires < ?))"
+                    " ORDER BY id LIMIT ?",
+                    (job, STATE_PENDING, STATE_LEASED, now, limit)).fetchall()
+                for row in rows:
+                    if row["state"] == STATE_LEASED:
+                        logger.info(f"Reclaiming {row['page_key']}: lease of {row['worker']} expired")
+                    lease_id = uuid.uuid4().hex
+                    self._conn.execute(
+                        "UPDATE queue_items SET state = ?, worker = ?, lease_id = ?,"
+                        " lease_expires = ?, attempts = attempts + 1, updated_at = ?"
+                        " WHERE id = ?",
+                        (STATE_LEASED, worker, lease_id, expires, now, row["id"]))
+                    page = PageRef(Path(row["source_path"]), row["page_index"])
+                    leases.append(Lease(job, page, lease_id, row["attempts"] + 1, expires))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return leases
+
+    def _update_leased(self, lease: Lease, assignments: str, values: tuple) -> bool:
+        """Apply an update to a page if the lease is still held."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE queue_items SET {assignments}, updated_at = ?"
+                f" WHERE job = ? AND page_key = ? AND lease_id = ? AND state = ?",
+                values + (time.time(), lease.job, lease.page.key, lease.lease_id, STATE_LEASED))
+            return cursor.rowcount == 1
+
+    def renew(self, lease: Lease) -> bool:
+        """
+        Extend a lease by lease_seconds from now.
+
+        Returns:
+            False if the lease was lost (expired and claimed again)
+        """
+        return self._update_leased(lease, "lease_expires = ?",
+                                   (time.time() + self.lease_seconds,))
+
+    def complete(self, lease: Lease) -> bool:
+        """
+        Mark a leased page done.
+
+        Returns:
+            False if the lease was lost in the meantime
+        """
+        return self._update_leased(lease, "state = ?, lease_id = NULL, error = NULL",
+                                   (STATE_DONE,))
+
+    def fail(self, lease: Lease, error: str) -> bool:
+        """
+        Record a failed attempt; the page is retried until max_attempts.
+
+        Returns:
+            False if the lease was lost in the meantime
+        """
+        state = STATE_PENDING if lease.attempt < self.max_attempts else STATE_FAILED
+        return self._update_leased(lease, "state = ?, lease_id = NULL, error = ?",
+                                   (state, error))
+
+    def release(self, lease: Lease) -> bool:
+        """Hand a page back unprocessed, without counting the attempt."""
+        return self._update_leased(lease, "state = ?, lease_id = NULL, attempts = attempts - 1",
+                                   (STATE_PENDING,))
+
+    def counts(self, job: str) -> Dict[str, int]:
+        """Number of pages of a job in every state."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM queue_items WHERE job = ? GROUP BY state",
+                (job,)).fetchall()
+        counts = {state: 0 for state in (STATE_PENDING, STATE_LEASED, STATE_DONE, STATE_FAILED)}
+        counts.update({state: count for state, count in rows})
+        return counts
+
+    def workers(self, job: str) -> Dict[str, int]:
+        """Pages currently leased by each worker."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT worker, COUNT(*) FROM queue_items"
+                " WHERE job = ? AND state = ? AND lease_expires >= ? GROUP BY worker",
+                (job, STATE_LEASED, time.time())).fetchall()
+        return {worker: count for worker, count in rows}
+
+    def is_drained(self, job: str) -> bool:
+        """True when no page of the job is pending or leased."""
+        counts = self.counts(job)
+        return counts[STATE_PENDING] == 0 and counts[STATE_LEASED] == 0
+
+    def retry_failed(self, job: str) -> int:
+        """Make the failed pages of a job pending again, with fresh attempts."""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE queue_items SET state = ?, attempts = 0, error = NULL, updated_at = ?"
+                " WHERE job = ? AND state = ?",
+                (STATE_PENDING, time.time(), job, STATE_FAILED)).rowcount
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
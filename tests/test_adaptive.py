@@ -0,0 +1,46 @@
+"""
+Tests for the adaptive resolution heuristics.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+from PIL import Image
+
+from src.adaptive import choose_settings, estimate_stroke_width
+
+
+def striped_page(stroke: int, size=(2000, 1000)) -> np.ndarray:
+    """White page with short dark vertical bars `stroke` pixels wide."""
+    gray = np.full((size[1], size[0]), 240, dtype=np.uint8)
+    for x in range(50, size[0] - 50, stroke * 4):
+        gray[100:900, x:x + stroke] = 20
+    return gray
+
+
+def test_stroke_width_estimate():
+    """The median ink run matches the bar width."""
+    assert estimate_stroke_width(striped_page(3)) == 3
+    assert estimate_stroke_width(striped_page(8)) == 8
+
+
+def test_blank_page_has_no_stroke_width():
+    assert estimate_stroke_width(np.full((500, 500), 250, dtype=np.uint8)) is None
+
+
+def test_thick_strokes_get_smaller_image():
+    """Pages with thick text are sent smaller than pages with thin text."""
+    thin = Image.fromarray(striped_page(2))
+    thick = Image.fromarray(striped_page(12))
+    
+    thin_box, thin_quality, _ = choose_settings(thin, (1024, 1024), 85, 60, 1.5)
+    thick_box, thick_quality, _ = choose_settings(thick, (1024, 1024), 85, 60, 1.5)
+    
+    assert thin_box == (1024, 1024)
+    assert thick_box[0] < thin_box[0]
+    assert thick_quality <= thin_quality
@@ -0,0 +1,78 @@
+"""
+Tests for the shared access-token cache.
+"""
+
+import sys
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.auth import AccessTokenProvider
+
+
+class FakeCredentials:
+    """Credentials whose refresh is slow and counted."""
+
+    def __init__(self, token=None, lifetime=timedelta(hours=1)):
+        self.token = token
+        self.expiry = self._now() + lifetime if token else None
+        self.lifetime = lifetime
+        self.refreshes = 0
+
+    @staticmethod
+    def _now():
+        # Naive UTC, like google-auth
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def refresh(self, request):
+        time.sleep(0.05)
+        self.refreshes += 1
+        self.token = f"token-{self.refreshes}"
+        self.expiry = self._now() + self.lifetime
+
+
+def test_expired_token_is_refreshed_once_for_all_threads():
+    """Threads that find the token expired at once share one refresh."""
+    credentials = FakeCredentials(token="old", lifetime=timedelta(hours=1))
+    credentials.expiry = FakeCredentials._now() - timedelta(seconds=1)
+    provider = AccessTokenProvider(credentials, refresh_margin_seconds=300)
+
+    start = threading.Barrier(16)
+    tokens = []
+
+    def get():
+        start.wait()
+        tokens.append(provider.get_token())
+
+    threads = [threading.Thread(target=get) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert credentials.refreshes == 1
+    assert provider.refresh_count == 1
+    assert tokens == ["token-1"] * 16
+
+
+def test_token_is_reused_until_margin_then_invalidated():
+    """A fresh token is cached; the refresh margin and invalidate() renew it."""
+    credentials = FakeCredentials(token="fresh", lifetime=timedelta(hours=1))
+    provider = AccessTokenProvider(credentials, refresh_margin_seconds=300)
+    for _ in range(5):
+        assert provider.auth_headers()["Authorization"] == "Bearer fresh"
+    assert credentials.refreshes == 0
+
+    # Expiring within the margin counts as expired
+    credentials.expiry = FakeCredentials._now() + timedelta(seconds=60)
+    assert provider.get_token() == "token-1"
+
+    # After a 401 the cached token is dropped
+    provider.invalidate()
+    assert provider.get_token() == "token-2"
+    assert provider.refresh_count == 2
@@ -0,0 +1,194 @@
+"""
+Tests for the offline batch-job mode with the local directory backend.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from PIL import Image
+
+import offline_batch
+from src import llama4_extractor
+from src.batch_jobs import (BatchBackend, LocalDirectoryBackend, LocalTokenProvider,
+                            STATE_SUCCEEDED, ingest_results, write_request_shards)
+from src.budget import BudgetGovernor, Pricing
+from src.results_store import ResultsStore
+from src.image_prep import prepare_page
+from src.journal import ProgressJournal
+
+
+class FakeExtractor:
+    """Prepares pages and builds bodies like LocalLlama4Extractor."""
+    
+    def prepare(self, image_path, page_index=None):
+        return prepare_page(image_path, (256, 256), 85, page_index=page_index)
+    
+    def build_request_body(self, encoded_image):
+        return {"contents": [{"role": "user", "parts": [
+            {"text": "Extract"},
+            {"inlineData": {"mimeType": "image/jpeg", "data": encoded_image}}
+        ]}]}
+
+
+def answer(request):
+    """Stand-in model: reports the size of the image it was sent."""
+    size = len(request["contents"][0]["parts"][1]["inlineData"]["data"])
+    return {"candidates": [{"content": {"parts": [{"text": f"page of {size} bytes\n"}]},
+                            "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 5,
+                              "totalTokenCount": 105}}
+
+
+def test_round_trip_through_local_backend(tmp_path):
+    """Requests are sharded, answered and ingested into per-page outputs."""
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    for i in range(5):
+        Image.new('RGB', (400, 300), (i * 40, 0, 0)).save(input_folder / f"page{i}.png")
+    
+    job_dir = tmp_path / "job"
+    manifest = write_request_shards(FakeExtractor(), input_folder, job_dir, "job",
+                                    shard_size=2, skip_keys={"page4.png"})
+    assert len(manifest["shards"]) == 2
+    assert len(manifest["pages"]) == 4
+    
+    backend = LocalDirectoryBackend(tmp_path / "backend", responder=answer)
+    job_id = backend.submit("job", sorted(job_dir.glob("requests-*.jsonl")))
+    assert backend.state(job_id) == STATE_SUCCEEDED
+    result_files = backend.download_results(job_id, job_dir / "results")
+    
+    output_folder = tmp_path / "output"
+    with ProgressJournal(tmp_path / "journal.jsonl") as journal:
+        summary = ingest_results(job_dir, result_files, output_folder, journal)
+        assert journal.get("page0.png")["status"] == "done"
+    
+    assert [page["status"] for page in summary["pages"]] == ["done"] * 4
+    assert summary["total_tokens"] == 4 * 105
+    assert (output_folder / "page0_extracted.txt").read_text().startswith("page of ")
+    assert not (output_folder / "page4_extracted.txt").exists()
+
+
+def test_missing_results_are_recorded_as_failed(tmp_path):
+    """Pages without a result line fail instead of being silently dropped."""
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    Image.new('RGB', (400, 300)).save(input_folder / "page.png")
+    
+    job_dir = tmp_path / "job"
+    write_request_shards(FakeExtractor(), input_folder, job_dir, "job")
+    
+    with ProgressJournal(tmp_path / "journal.jsonl") as journal:
+        summary = ingest_results(job_dir, [], tmp_path / "output", journal)
+        assert journal.get("page.png")["status"] == "failed"
+    assert summary["pages"][0]["status"] == "failed"
+
+
+def test_incomplete_backend_cannot_be_created():
+    """A backend missing part of the interface fails when it is created."""
+    class SubmitOnly(BatchBackend):
+        def submit(self, job_name, shard_paths):
+            return "job"
+    
+    with pytest.raises(TypeError):
+        SubmitOnly()
+
+
+def test_local_jobs_need_no_credentials(tmp_path, monkeypatch):
+    """Requests for a local job are written without Google Cloud settings."""
+    monkeypatch.setattr(llama4_extractor, "PROJECT_ID", None)
+    monkeypatch.setattr(llama4_extractor, "CREDENTIALS_PATH", None)
+    monkeypatch.setattr(llama4_extractor, "BATCH_DIR", tmp_path / "batches")
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    Image.new('RGB', (400, 300)).save(input_folder / "page.png")
+    
+    extractor = llama4_extractor.LocalLlama4Extractor(
+        token_provider=LocalTokenProvider(), use_cache=False, use_dedup=False,
+        budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+        results_store=ResultsStore(tmp_path / "results.sqlite"))
+    job_dir = extractor.write_batch_requests(input_folder, "local")
+    assert len(list(job_dir.glob("requests-*.jsonl"))) == 1
+
+
+def test_ingested_batch_spend_is_recorded_once(tmp_path, monkeypatch):
+    """Batch results count towards the budgets, also when collected twice."""
+    monkeypatch.setattr(llama4_extractor, "BATCH_DIR", tmp_path / "batches")
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    for i in range(3):
+        Image.new('RGB', (400, 300), (i * 40, 0, 0)).save(input_folder / f"page{i}.png")
+    
+    pricing = Pricing(input_per_million=1000.0, output_per_million=2000.0)
+    extractor = llama4_extractor.LocalLlama4Extractor(
+        token_provider=LocalTokenProvider(), use_cache=False, use_dedup=False,
+        budget=BudgetGovernor(tmp_path / "budget.sqlite", pricing),
+        results_store=ResultsStore(tmp_path / "results.sqlite"))
+    job_dir = extractor.write_batch_requests(input_folder, "batch")
+    backend = LocalDirectoryBackend(tmp_path / "backend", responder=answer)
+    job_id = backend.submit("batch", sorted(job_dir.glob("requests-*.jsonl")))
+    result_files = backend.download_results(job_id, job_dir / "results")
+    
+    for _ in range(2):
+        extractor.ingest_batch_results(job_dir, result_files, tmp_path / "output")
+    
+    expected = pricing.cost(3 * 100, 3 * 5)
+    assert extractor.budget.spent_today() == pytest.approx(expected)
+    extractor.budget.start_job("batch")
+    assert extractor.budget.job_spent() == pytest.approx(expected)
+
+
+def test_resubmitted_job_is_charged_again(tmp_path, monkeypatch):
+    """A second submission under the same job name records its own spend."""
+    monkeypatch.setattr(llama4_extractor, "BATCH_DIR", tmp_path / "batches")
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    
+    pricing = Pricing(input_per_million=1000.0, output_per_million=2000.0)
+    extractor = llama4_extractor.LocalLlama4Extractor(
+        token_provider=LocalTokenProvider(), use_cache=False, use_dedup=False,
+        budget=BudgetGovernor(tmp_path / "budget.sqlite", pricing),
+        results_store=ResultsStore(tmp_path / "results.sqlite"))
+    backend = LocalDirectoryBackend(tmp_path / "backend", responder=answer)
+    
+    # The second submission only carries the pages added since the first
+    for pages in (range(0, 2), range(2, 5)):
+        for i in pages:
+            Image.new('RGB', (400, 300), (i * 40, 0, 0)).save(input_folder / f"page{i}.png")
+        job_dir = extractor.write_batch_requests(input_folder, "batch")
+        job_id = backend.submit("batch", sorted(job_dir.glob("requests-*.jsonl")))
+        result_files = backend.download_results(job_id, tmp_path / job_id)
+        extractor.ingest_batch_results(job_dir, result_files, tmp_path / "output")
+    
+    assert extractor.budget.spent_today() == pytest.approx(pricing.cost(5 * 100, 5 * 5))
+
+
+def test_local_directory_jobs_stay_out_of_the_ledger(tmp_path, monkeypatch):
+    """offline_batch --local-dir records its usage in memory, not in BUDGET_DB."""
+    monkeypatch.setattr(llama4_extractor, "BUDGET_DB", tmp_path / "budget.sqlite")
+    monkeypatch.setattr(llama4_extractor, "RESULTS_DB", tmp_path / "results.sqlite")
+    monkeypatch.setattr(llama4_extractor, "DEDUP_DB", tmp_path / "duplicates.sqlite")
+    monkeypatch.setattr(llama4_extractor, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(llama4_extractor, "BATCH_DIR", tmp_path / "batches")
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    Image.new('RGB', (400, 300)).save(input_folder / "page.png")
+    
+    extractor = offline_batch.make_extractor(tmp_path / "backend")
+    backend = offline_batch.make_backend(extractor, tmp_path / "backend")
+    backend.responder = answer
+    job_dir = extractor.write_batch_requests(input_folder, "local")
+    job_id = backend.submit("local", sorted(job_dir.glob("requests-*.jsonl")))
+    result_files = backend.download_results(job_id, job_dir / "results")
+    extractor.ingest_batch_results(job_dir, result_files, tmp_path / "output")
+    
+    assert extractor.budget.spent_today() > 0
+    assert not (tmp_path / "budget.sqlite").exists()
@@ -0,0 +1,159 @@
+"""
+Tests for the token and cost budget governor.
+"""
+
+import sys
+import time
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+import requests
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetExceeded, BudgetGovernor, Pricing
+from src.results_store import ResultsStore
+
+
+def usage(input_tokens: int, output_tokens: int):
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens}
+
+
+def test_spend_is_priced_per_direction_and_shared(tmp_path):
+    """Input and output are priced apart; every governor sees the ledger."""
+    pricing = Pricing(input_per_million=0.5, output_per_million=2.0)
+    assert pricing.cost(1_000_000, 500_000) == pytest.approx(1.5)
+
+    governor = BudgetGovernor(tmp_path / "budget.sqlite", pricing, job_budget=3.0,
+                              initial_input_tokens=1_000_000, initial_output_tokens=0)
+    governor.start_job("book")
+    assert governor.admit()
+    governor.settle(usage(1_000_000, 500_000))
+    assert governor.run_cost == pytest.approx(1.5)
+    assert governor.projection(pages_done=1, pages_remaining=2)["projected_total"] == pytest.approx(4.5)
+
+    # The next request (1.5 on average) would go past the job budget
+    assert governor.admit()
+    with pytest.raises(BudgetExceeded):
+        governor.admit()
+    assert governor.stopped
+    governor.release()
+
+    # A later run of the same job starts from what was spent before
+    later = BudgetGovernor(tmp_path / "budget.sqlite", pricing, daily_budget=10.0)
+    later.start_job("book")
+    assert later.job_spent() == pytest.approx(1.5)
+    assert later.spent_today() == pytest.approx(1.5)
+
+
+def test_tokens_per_minute_limit_pauses(tmp_path):
+    """A request that would exceed the per-minute tokens waits instead."""
+    governor = BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.0, 0.0),
+                              tokens_per_minute=1000, initial_input_tokens=600,
+                              initial_output_tokens=0, check_seconds=0.05)
+    assert governor.admit()
+    governor.settle(usage(600, 0))
+
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    start = time.monotonic()
+    assert governor.admit(cancel) is False
+    assert time.monotonic() - start >= 0.25
+    assert governor.paused_seconds > 0
+
+
+def test_job_stops_at_budget(tmp_path, monkeypatch):
+    """process_folder stops sending pages once the job budget would be exceeded."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    for i in range(5):
+        Image.new('RGB', (600, 800), (200 + i, 200 + i, 200 + i)).save(input_folder / f"page{i}.png")
+
+    def make_budget():
+        # 50 output tokens at $1000/1M: $0.05 per request
+        return BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.0, 1000.0), job_budget=0.12,
+                              initial_input_tokens=0, initial_output_tokens=50)
+
+    config = MockConfig(latency_ms=1, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        def run():
+            extractor = llama4_extractor.LocalLlama4Extractor(
+                use_cache=False, use_dedup=False, endpoint=server.url,
+                token_provider=StaticTokenProvider(), budget=make_budget(),
+                results_store=ResultsStore(tmp_path / "results.sqlite"))
+            extractor.process_folder(input_folder, tmp_path / "output", max_workers=1,
+                                     job_name="budget")
+            return extractor
+
+        extractor = run()
+        assert server.stats["200"] == 2
+        assert extractor.budget.job_spent() == pytest.approx(0.10)
+        assert "Job budget" in extractor.budget.stop_reason
+        report = (tmp_path / "output" / "extraction_summary.txt").read_text(encoding='utf-8')
+        assert "Stopped early: Job budget" in report
+
+        # Resuming with the same budget sends nothing more
+        run()
+        assert server.stats["200"] == 2
+
+
+class ScriptedTransport:
+    """Transport stand-in answering every request with a prepared response."""
+
+    def __init__(self, make_response):
+        self.make_response = make_response
+
+    def post_json(self, url, body, headers, timeout=None, stream=False):
+        return self.make_response()
+
+
+class BrokenStream(requests.Response):
+    """A streamed answer whose connection drops after the first event."""
+
+    def iter_lines(self, *args, **kwargs):
+        yield b'data: {"candidates": [{"content": {"parts": [{"text": "Chapter 1"}]}}]}'
+        yield b''
+        raise requests.exceptions.ChunkedEncodingError("connection reset")
+
+
+def scripted_response(content: bytes, cls=requests.Response) -> requests.Response:
+    response = cls()
+    response.status_code = 200
+    response._content = content
+    response._content_consumed = True
+    response.elapsed = timedelta(0)
+    return response
+
+
+def test_unreadable_answers_release_their_reservation(tmp_path):
+    """A malformed 200 or a broken stream does not stay in flight."""
+    governor = BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15))
+
+    def make_extractor(make_response):
+        return llama4_extractor.LocalLlama4Extractor(
+            use_cache=False, use_dedup=False, endpoint="http://127.0.0.1:9/generateContent",
+            token_provider=StaticTokenProvider(), budget=governor,
+            transport=ScriptedTransport(make_response),
+            results_store=ResultsStore(tmp_path / "results.sqlite"))
+
+    malformed = make_extractor(lambda: scripted_response(b"<html>Service Unavailable"))
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            malformed.extract_text_from_prepared(b"jpeg", "page.png")
+    assert governor._outstanding == 0
+
+    broken = make_extractor(lambda: scripted_response(None, BrokenStream))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        broken.extract_text_streaming(b"jpeg", "page.png", tmp_path / "page.txt")
+    assert governor._outstanding == 0
+    assert governor.run_cost == 0
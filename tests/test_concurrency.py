@@ -0,0 +1,90 @@
+"""
+Tests for running process_folder pages on a thread pool.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.results_store import ResultsStore
+
+
+def make_extractor(tmp_path, server):
+    return llama4_extractor.LocalLlama4Extractor(
+        use_cache=False, use_dedup=False, endpoint=server.url,
+        token_provider=StaticTokenProvider(),
+        budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+        results_store=ResultsStore(tmp_path / "results.sqlite"))
+
+
+def test_concurrent_pages_are_all_counted(tmp_path, monkeypatch):
+    """Pages overlap up to max_workers and every token is counted."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    input_folder, output_folder = tmp_path / "input", tmp_path / "output"
+    input_folder.mkdir()
+    output_folder.mkdir()
+    for i in range(12):
+        Image.new('RGB', (600, 800), (180 + i, 180 + i, 180 + i)).save(input_folder / f"page{i:02d}.png")
+
+    config = MockConfig(latency_ms=30, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = make_extractor(tmp_path, server)
+
+        # Requests on the wire at once
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+        post_json = extractor.transport.post_json
+
+        def counting_post_json(*args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                return post_json(*args, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        monkeypatch.setattr(extractor.transport, "post_json", counting_post_json)
+        results = extractor.process_folder(input_folder, output_folder, max_workers=6,
+                                           job_name="threads")
+
+    assert server.stats["200"] == 12
+    assert 1 < peak[0] <= 6
+    assert sorted(results) == [f"page{i:02d}.png" for i in range(12)]
+    assert not any(text.startswith("ERROR") for text in results.values())
+    assert extractor.total_api_calls == 12
+    assert extractor.total_output_tokens == 12 * 50
+    summary = extractor.results_store.summary(job="threads")
+    assert summary["input_tokens"] == extractor.total_input_tokens
+
+
+def test_usage_counters_do_not_lose_updates(tmp_path):
+    """Usage recorded from many threads at once is never lost."""
+    with MockVertexServer(MockConfig(latency_ms=1, latency_sigma=0)) as server:
+        extractor = make_extractor(tmp_path, server)
+    metadata = {"promptTokenCount": 3, "candidatesTokenCount": 2, "totalTokenCount": 5}
+
+    def record():
+        for _ in range(100):
+            extractor._record_usage(metadata, "page", reserved_tokens=0)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert extractor.total_api_calls == 800
+    assert extractor.total_input_tokens == 800 * 3
+    assert extractor.total_output_tokens == 800 * 2
@@ -0,0 +1,104 @@
+"""
+Tests for perceptual-hash near-duplicate detection.
+"""
+
+import io
+import sys
+import random
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image, ImageDraw, ImageEnhance
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.dedup import DuplicateIndex, hamming, page_hashes
+from src.results_store import ResultsStore
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod".split()
+
+
+def make_page(seed):
+    """A text page; every seed has the same layout but different words."""
+    rng = random.Random(seed)
+    img = Image.new('RGB', (1200, 1600), (245, 242, 235))
+    draw = ImageDraw.Draw(img)
+    for y in range(150, 1450, 40):
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(9, 14)))
+        draw.text((100, y), line, fill=(20, 20, 20), font_size=28)
+    return img
+
+
+def rescan(img):
+    """The same page scanned again: slightly rotated, darker, smaller, JPEG."""
+    img = img.rotate(0.7, fillcolor=(245, 242, 235), resample=Image.BILINEAR)
+    img = ImageEnhance.Brightness(img).enhance(0.92)
+    img = img.resize((img.width * 3 // 4, img.height * 3 // 4))
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=70)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def test_rescan_matches_but_other_page_does_not(tmp_path):
+    """A rescan is found in the index; a different page of the same layout is not."""
+    original = make_page(1)
+    phash, detail = page_hashes(original)
+    rescan_hashes = page_hashes(rescan(original))
+    other_hashes = page_hashes(make_page(2))
+
+    assert hamming(phash, rescan_hashes[0]) < hamming(phash, other_hashes[0])
+
+    with DuplicateIndex(tmp_path / "duplicates.sqlite") as index:
+        index.add(phash, detail, "page_1.jpg", tmp_path / "page_1.jpg", "first page text")
+
+        match = index.find(*rescan_hashes)
+        assert match["page_key"] == "page_1.jpg"
+        assert match["text"] == "first page text"
+        assert index.find(*other_hashes) is None
+
+
+def test_index_persists_and_sees_other_writers(tmp_path):
+    """Pages are kept across reopening and added by another connection."""
+    path = tmp_path / "duplicates.sqlite"
+    with DuplicateIndex(path) as writer:
+        writer.add(0x0123456789ABCDEF, bytes(32), "a.jpg", tmp_path / "a.jpg", "A")
+
+    with DuplicateIndex(path, max_distance=6) as reader, DuplicateIndex(path) as writer:
+        assert len(reader) == 1
+        # Rollback journal, so the index can live on a network share
+        assert reader._conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        # Within 6 bits: one flipped bit in each of two chunks
+        assert reader.find(0x0123456789ABCDEF ^ (1 << 63) ^ 1, bytes(32))["text"] == "A"
+
+        # Highest bit set: stored as a negative SQLite integer
+        writer.add(0xF000000000000001, bytes(32), "b.jpg", tmp_path / "b.jpg", "B")
+        assert reader.find(0xF000000000000003, bytes(32))["page_key"] == "b.jpg"
+        assert reader.find(0x0FFFFFFFFFFFFFFE, bytes(32)) is None
+
+
+def test_duplicate_page_costs_no_request(tmp_path, monkeypatch):
+    """A rescanned page reuses the text extracted for the original."""
+    monkeypatch.setattr(llama4_extractor, "DEDUP_DB", tmp_path / "duplicates.sqlite")
+    original = tmp_path / "original.png"
+    make_page(3).save(original)
+    copy = tmp_path / "copy.jpg"
+    rescan(make_page(3)).save(copy)
+
+    config = MockConfig(latency_ms=1, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = llama4_extractor.LocalLlama4Extractor(
+            use_cache=False, endpoint=server.url,
+            token_provider=StaticTokenProvider(), use_dedup=True,
+            budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+            results_store=ResultsStore(tmp_path / "results.sqlite"))
+        text, _ = extractor.extract_text_from_image(original)
+        copy_text, usage = extractor.extract_text_from_image(copy)
+
+    assert server.stats["200"] == 1
+    assert copy_text == text
+    assert usage["total_tokens"] == 0
+    assert extractor.duplicate_hits == 1
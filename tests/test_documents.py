@@ -0,0 +1,54 @@
+"""
+Tests for expanding multi-page documents into pages.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image
+
+from src.documents import PageRef, iter_folder_pages, open_page
+
+
+def test_multipage_tiff_is_expanded(tmp_path):
+    """Every TIFF frame becomes a page; single images keep their old names."""
+    frames = [Image.new('L', (64, 64), color) for color in (0, 100, 200)]
+    frames[0].save(tmp_path / "book.tif", save_all=True, append_images=frames[1:])
+    Image.new('RGB', (64, 64)).save(tmp_path / "cover.jpg")
+    (tmp_path / "notes.txt").write_text("not an image")
+    
+    pages = list(iter_folder_pages(tmp_path))
+    
+    assert [page.key for page in pages] == [
+        "book.tif#p0001", "book.tif#p0002", "book.tif#p0003", "cover.jpg"
+    ]
+    assert pages[1].output_stem == "book_p0002"
+    assert pages[3].output_stem == "cover"
+
+
+def test_open_page_decodes_requested_frame(tmp_path):
+    frames = [Image.new('L', (64, 64), color) for color in (0, 100, 200)]
+    frames[0].save(tmp_path / "book.tif", save_all=True, append_images=frames[1:])
+    
+    with open_page(tmp_path / "book.tif", 2) as img:
+        assert img.getpixel((0, 0)) == 200
+    
+    assert PageRef(tmp_path / "book.tif", 2).name == "book.tif (page 3)"
+
+
+def test_pdf_pages_are_counted_and_rendered(tmp_path):
+    """Each PDF page is a page of its own, rendered at the requested size."""
+    pages = [Image.new('RGB', (300, 400), color) for color in ((0, 0, 0), (255, 255, 255))]
+    pages[0].save(tmp_path / "scan.pdf", save_all=True, append_images=pages[1:], resolution=72)
+    
+    assert [page.key for page in iter_folder_pages(tmp_path)] == [
+        "scan.pdf#p0001", "scan.pdf#p0002"
+    ]
+    with open_page(tmp_path / "scan.pdf", 1, target_size=(150, 200)) as img:
+        # Rendered at no more than twice the target size
+        assert img.size == (300, 400)
+        assert img.getpixel((150, 200))[:3] == (255, 255, 255)
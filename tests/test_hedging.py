@@ -0,0 +1,120 @@
+"""
+Tests for hedged requests.
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src.budget import BudgetGovernor, Pricing
+from src.hedging import HedgePolicy, run_hedged
+from src.llama4_extractor import LocalLlama4Extractor
+from src.results_store import ResultsStore
+
+
+def test_policy_waits_for_samples_and_caps_hedges():
+    """No hedge without enough latencies, and never beyond the budget."""
+    policy = HedgePolicy(percentile=50, max_fraction=0.1, min_samples=5)
+    for _ in range(10):
+        policy.record_request()
+    assert policy.hedge_delay() is None
+
+    for seconds in (0.1, 0.2, 0.3, 0.4, 0.5):
+        policy.record_latency(seconds)
+    assert abs(policy.hedge_delay() - 0.3) < 1e-9
+
+    # 10% of 10 requests: one hedge
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+    assert policy.hedge_delay() is None
+
+
+def test_slow_request_loses_to_hedge():
+    """The hedge answers first; the slow copy is discarded once it finishes."""
+    policy = HedgePolicy(max_fraction=1.0, min_samples=1)
+    policy.record_latency(0.02)
+    calls = []
+    discarded = []
+    lock = threading.Lock()
+
+    def attempt(sent, cancel):
+        with lock:
+            calls.append(None)
+            first = len(calls) == 1
+        sent.set()
+        time.sleep(0.5 if first else 0.01)
+        return "slow" if first else "fast"
+
+    start = time.perf_counter()
+    assert run_hedged(attempt, policy, discarded.append) == "fast"
+    assert time.perf_counter() - start < 0.3
+    assert policy.stats()["hedge_wins"] == 1
+
+    time.sleep(0.6)
+    assert discarded == ["slow"]
+
+    # A request faster than the delay is never duplicated
+    calls.clear()
+    policy.record_latency(10.0)
+    assert run_hedged(lambda sent, cancel: (sent.set(), "quick")[1], policy,
+                      discarded.append) == "quick"
+    assert len(calls) == 0 and policy.hedged == 1
+
+
+def test_hedge_needs_a_free_request_slot():
+    """With every slot taken the slow request is not duplicated."""
+    policy = HedgePolicy(max_fraction=1.0, min_samples=1)
+    policy.record_latency(0.01)
+    slots = threading.BoundedSemaphore(1)
+
+    def attempt(sent, cancel):
+        sent.set()
+        time.sleep(0.1)
+        return "answer"
+
+    assert run_hedged(attempt, policy, lambda result: None, slots) == "answer"
+    assert policy.hedged == 0 and policy.stats()["no_slot"] == 1
+    # The request's own slot was given back
+    assert slots.acquire(blocking=False)
+    slots.release()
+
+    # A free slot is taken by the hedge and returned once it ends
+    slots = threading.BoundedSemaphore(2)
+    assert run_hedged(attempt, policy, lambda result: None, slots) == "answer"
+    assert policy.hedged == 1
+    time.sleep(0.2)
+    assert slots.acquire(blocking=False) and slots.acquire(blocking=False)
+
+
+def test_wasted_tokens_are_counted(tmp_path):
+    """Tokens of the unused copy are reported apart from the page usage."""
+    image = tmp_path / "page.png"
+    Image.new('RGB', (600, 800), (250, 250, 250)).save(image)
+
+    config = MockConfig(latency_ms=50, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = LocalLlama4Extractor(
+            use_cache=False, use_dedup=False, endpoint=server.url,
+            token_provider=StaticTokenProvider(), use_hedging=True,
+            budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+            results_store=ResultsStore(tmp_path / "results.sqlite"))
+        # Every request is slower than the seeded latency
+        extractor.hedging = HedgePolicy(max_fraction=1.0, min_samples=1)
+        extractor.hedging.record_latency(0.001)
+
+        text, usage = extractor.extract_text_from_image(image)
+        time.sleep(0.3)
+
+    assert text and usage["output_tokens"] == 50
+    assert extractor.hedging.hedged == 1
+    assert server.stats["200"] == 2
+    assert extractor.total_output_tokens == 50
+    assert extractor.wasted_output_tokens == 50
@@ -0,0 +1,68 @@
+"""
+Tests for the crash-safe progress journal.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.journal import (ProgressJournal, STATUS_DONE, STATUS_FAILED,
+                         source_fingerprint, text_hash)
+
+USAGE = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+
+
+def test_completed_pages_survive_reopen(tmp_path):
+    """A reopened journal remembers finished pages; failed ones are redone."""
+    source = tmp_path / "page1.jpg"
+    source.write_bytes(b"scan")
+    output = tmp_path / "page1_extracted.txt"
+    output.write_text("page text", encoding='utf-8')
+    fingerprint = source_fingerprint(source)
+    
+    with ProgressJournal(tmp_path / "job.jsonl") as journal:
+        journal.record("page1.jpg", STATUS_DONE, output_path=output,
+                       token_usage=USAGE, content_hash=text_hash("page text"),
+                       **fingerprint)
+        journal.record("page2.jpg", STATUS_FAILED, error="API request failed: 500")
+    
+    with ProgressJournal(tmp_path / "job.jsonl") as journal:
+        assert journal.is_complete("page1.jpg", fingerprint)
+        assert journal.get("page1.jpg")["token_usage"] == USAGE
+        assert not journal.is_complete("page2.jpg")
+        assert not journal.is_complete("page3.jpg")
+
+
+def test_changed_output_or_source_is_redone(tmp_path):
+    """Pages whose output was altered or whose scan changed are not skipped."""
+    output = tmp_path / "page1_extracted.txt"
+    output.write_text("page text", encoding='utf-8')
+    
+    with ProgressJournal(tmp_path / "job.jsonl") as journal:
+        journal.record("page1.jpg", STATUS_DONE, output_path=output,
+                       content_hash=text_hash("page text"), source_size=4)
+        assert not journal.is_complete("page1.jpg", {"source_size": 5})
+        
+        output.write_text("page te", encoding='utf-8')
+        assert not journal.is_complete("page1.jpg")
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    """A partial record left by a crash does not break the replay."""
+    path = tmp_path / "job.jsonl"
+    with ProgressJournal(path) as journal:
+        journal.record("page1.jpg", STATUS_FAILED, error="boom")
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "page2.jpg", "sta')
+    
+    with ProgressJournal(path) as journal:
+        assert journal.get("page1.jpg")["status"] == STATUS_FAILED
+        assert journal.get("page2.jpg") is None
+        journal.record("page3.jpg", STATUS_FAILED, error="boom")
+    
+    # Records appended after the torn line are still readable
+    with ProgressJournal(path) as journal:
+        assert journal.get("page3.jpg") is not None
@@ -0,0 +1,65 @@
+"""
+Tests for the stage timing histograms and their exports.
+"""
+
+import sys
+import json
+import urllib.request
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.metrics import Histogram, StageMetrics
+
+
+def test_histogram_quantiles():
+    """Quantiles are interpolated within the bucket that holds them."""
+    histogram = Histogram(buckets=(0.1, 0.2, 0.4))
+    for value in [0.05] * 50 + [0.15] * 45 + [0.3] * 5:
+        histogram.observe(value)
+    
+    assert histogram.count == 100
+    assert 0 < histogram.quantile(0.5) <= 0.1
+    assert 0.1 < histogram.quantile(0.95) <= 0.2
+    assert 0.2 < histogram.quantile(0.99) <= 0.4
+
+
+def test_prometheus_export_is_cumulative(tmp_path):
+    """Bucket counts are cumulative and end with +Inf, sum and count."""
+    metrics = StageMetrics(buckets=(0.01, 0.1))
+    metrics.merge({"decode": 0.005, "network": 0.05})
+    metrics.observe("network", 5.0)
+    with metrics.timer("file_write"):
+        pass
+    
+    text = metrics.to_prometheus()
+    assert 'llama4_stage_duration_seconds_bucket{stage="network",le="0.01"} 0' in text
+    assert 'llama4_stage_duration_seconds_bucket{stage="network",le="0.1"} 1' in text
+    assert 'llama4_stage_duration_seconds_bucket{stage="network",le="+Inf"} 2' in text
+    assert 'llama4_stage_duration_seconds_count{stage="network"} 2' in text
+    
+    metrics.write_prometheus(tmp_path / "run.prom")
+    metrics.write_json(tmp_path / "run.json")
+    report = json.loads((tmp_path / "run.json").read_text())
+    assert set(report["stages"]) == {"decode", "network", "file_write"}
+    assert report["stages"]["network"]["max_seconds"] == 5.0
+
+
+def test_serving_twice_or_on_a_taken_port_is_harmless():
+    """serve() reuses its server and skips a port another process holds."""
+    metrics = StageMetrics()
+    metrics.observe("network", 0.2)
+    server = metrics.serve(0, host="127.0.0.1")
+    try:
+        assert metrics.serve(0, host="127.0.0.1") is server
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert b'stage="network"' in response.read()
+        
+        # Like a second worker process on the same host
+        assert StageMetrics().serve(port, host="127.0.0.1") is None
+    finally:
+        server.shutdown()
+        server.server_close()
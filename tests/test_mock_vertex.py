@@ -0,0 +1,82 @@
+"""
+Tests for the local mock Vertex endpoint used by the benchmarks.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.llama4_extractor import APIRequestError, LocalLlama4Extractor
+from src.results_store import ResultsStore
+
+
+def make_extractor(server, tmp_path):
+    return LocalLlama4Extractor(use_cache=False, endpoint=server.url,
+                                token_provider=StaticTokenProvider(), use_dedup=False,
+                                budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+                                results_store=ResultsStore(tmp_path / "results.sqlite"))
+
+
+def test_extractor_round_trip(tmp_path):
+    """The extractor parses the mock's text and usageMetadata."""
+    image = tmp_path / "page.png"
+    Image.new('RGB', (800, 600), (250, 250, 250)).save(image)
+    
+    config = MockConfig(latency_ms=1, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = make_extractor(server, tmp_path)
+        text, usage = extractor.extract_text_from_image(image)
+        
+        # Streaming returns the same text through the SSE endpoint
+        output_file = tmp_path / "streamed.txt"
+        stream_usage, _ = extractor.extract_text_streaming(
+            extractor.prepare_image(image), "page.png", output_file)
+    
+    assert text.startswith("the quick brown fox")
+    assert usage["output_tokens"] == 50
+    assert usage["total_tokens"] == usage["input_tokens"] + 50
+    assert output_file.read_text() == text
+    assert stream_usage == usage
+    assert server.stats["200"] == 2
+
+
+def test_configured_errors(tmp_path, monkeypatch):
+    """A 429 rate of 1 answers every request, and every retry, with HTTP 429."""
+    monkeypatch.setattr(llama4_extractor, "BACKOFF_BASE_SECONDS", 0.01)
+    image = tmp_path / "page.png"
+    Image.new('RGB', (200, 200)).save(image)
+    
+    config = MockConfig(latency_ms=1, latency_sigma=0, error_429_rate=1.0)
+    with MockVertexServer(config) as server:
+        with pytest.raises(APIRequestError) as error:
+            make_extractor(server, tmp_path).extract_text_from_image(image)
+    
+    assert error.value.status_code == 429
+    assert server.stats["429"] == llama4_extractor.MAX_RETRIES + 1
+
+
+def test_transient_errors_are_retried_in_a_single_region(tmp_path, monkeypatch):
+    """With one region, 429s and 5xx are retried after a backoff."""
+    monkeypatch.setattr(llama4_extractor, "BACKOFF_BASE_SECONDS", 0.01)
+    image = tmp_path / "page.png"
+    Image.new('RGB', (200, 200)).save(image)
+    
+    config = MockConfig(latency_ms=1, latency_sigma=0, error_429_rate=0.3,
+                        error_500_rate=0.3, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = make_extractor(server, tmp_path)
+        for _ in range(6):
+            _, usage = extractor.extract_text_from_image(image)
+            assert usage["output_tokens"] == 50
+    
+    assert server.stats["200"] == 6
+    assert server.stats["429"] + server.stats["500"] > 0
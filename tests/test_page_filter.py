@@ -0,0 +1,141 @@
+"""
+Tests for the blank/low-content page pre-filter.
+"""
+
+import sys
+import json
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import batch_process
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.page_filter import SKIP_BLANK, SKIP_IMAGE, FilterThresholds, classify_page
+from src.results_store import ResultsStore
+
+PAPER = (245, 242, 235)
+
+
+def text_page():
+    img = Image.new('RGB', (1200, 1600), PAPER)
+    draw = ImageDraw.Draw(img)
+    for y in range(150, 1450, 40):
+        draw.text((100, y), "The quick brown fox jumps over the lazy dog " * 2,
+                  fill=(20, 20, 20), font_size=28)
+    return img
+
+
+def blank_page():
+    """Paper with scanner noise and a page number."""
+    noise = np.random.default_rng(0).normal(0, 3, (1600, 1200))
+    img = Image.fromarray((240 + noise).clip(0, 255).astype(np.uint8)).convert('RGB')
+    ImageDraw.Draw(img).text((580, 1520), "12", fill=(20, 20, 20), font_size=28)
+    return img
+
+
+def photo_page():
+    """A smooth full-page picture."""
+    field = np.random.default_rng(1).normal(0, 1, (20, 15))
+    field = ((field - field.min()) / np.ptp(field) * 255).astype(np.uint8)
+    return Image.fromarray(field).resize((1200, 1600), Image.BICUBIC).convert('RGB')
+
+
+def title_page():
+    """Little text, but text: must be extracted."""
+    img = Image.new('RGB', (1200, 1600), PAPER)
+    draw = ImageDraw.Draw(img)
+    draw.text((300, 700), "Chapter 4", fill=(20, 20, 20), font_size=60)
+    draw.text((300, 800), "Rivers and Deltas", fill=(20, 20, 20), font_size=40)
+    return img
+
+
+def test_classification():
+    """Blank, separator and photo pages are flagged; text pages are kept."""
+    thresholds = FilterThresholds()
+    assert classify_page(blank_page(), thresholds)[0] == SKIP_BLANK
+    assert classify_page(Image.new('RGB', (1200, 1600), (200, 60, 60)), thresholds)[0] == SKIP_BLANK
+    assert classify_page(photo_page(), thresholds)[0] == SKIP_IMAGE
+    assert classify_page(text_page(), thresholds)[0] is None
+    assert classify_page(title_page(), thresholds)[0] is None
+
+    # Thresholds are tunable: stricter blank limits keep the blank page
+    reason, stats = classify_page(blank_page(),
+                                  FilterThresholds(blank_max_ink=0.0, uniform_max_std=1.0))
+    assert reason is None
+    assert stats["ink_coverage"] < 0.002
+
+
+def test_skipped_pages_cost_no_request(tmp_path, monkeypatch):
+    """process_folder journals filtered pages as skipped without calling the API."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    text_page().save(input_folder / "page_1.png")
+    blank_page().save(input_folder / "page_2.png")
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+
+    store = ResultsStore(tmp_path / "results.sqlite")
+    config = MockConfig(latency_ms=1, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = llama4_extractor.LocalLlama4Extractor(
+            use_cache=False, endpoint=server.url, token_provider=StaticTokenProvider(),
+            results_store=store, use_dedup=False, use_page_filter=True,
+            budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)))
+        results = extractor.process_folder(input_folder, output_folder, job_name="filter")
+
+    assert server.stats["200"] == 1
+    assert results["page_2.png"] == ""
+    assert not (output_folder / "page_2_extracted.txt").exists()
+
+    entries = [json.loads(line) for line in
+               (tmp_path / "journal" / "filter.jsonl").read_text().splitlines()]
+    skipped = [entry for entry in entries if entry["key"] == "page_2.png"]
+    assert skipped[-1]["status"] == "skipped"
+    assert skipped[-1]["reason"] == SKIP_BLANK
+
+    summary = store.summary(job="filter")
+    assert (summary["done"], summary["skipped"]) == (1, 1)
+    report = (output_folder / "extraction_summary.txt").read_text(encoding='utf-8')
+    assert "page_2.png: Skipped (blank page or separator sheet)" in report
+
+
+def test_batch_process_journals_skipped_pages(tmp_path, monkeypatch):
+    """batch_process records filtered pages as skipped, not as empty done pages."""
+    monkeypatch.setattr(batch_process, "METRICS_DIR", tmp_path / "metrics")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    text_page().save(input_folder / "page_1.png")
+    blank_page().save(input_folder / "page_2.png")
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+
+    store = ResultsStore(tmp_path / "results.sqlite")
+    config = MockConfig(latency_ms=1, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = llama4_extractor.LocalLlama4Extractor(
+            use_cache=False, endpoint=server.url, token_provider=StaticTokenProvider(),
+            results_store=store, use_dedup=False, use_page_filter=True,
+            budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)))
+        summary = batch_process.batch_process_with_delay(
+            input_folder, output_folder, extractor=extractor,
+            journal_path=tmp_path / "journal" / "batch.jsonl")
+
+    assert server.stats["200"] == 1
+    assert (summary["done"], summary["skipped"]) == (1, 1)
+    assert not (output_folder / "page_2_extracted.txt").exists()
+
+    entries = [json.loads(line) for line in
+               (tmp_path / "journal" / "batch.jsonl").read_text().splitlines()]
+    skipped = [entry for entry in entries if entry["key"] == "page_2.png"]
+    assert skipped[-1]["status"] == "skipped"
+    assert skipped[-1]["reason"] == SKIP_BLANK
+    assert store.latest("batch", "page_2.png")["error"] == "blank page or separator sheet"
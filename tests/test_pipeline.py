@@ -0,0 +1,66 @@
+"""
+Tests for preparing images in worker processes ahead of the requests.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.documents import PageRef
+from src.image_prep import prepare_page
+from src.pipeline import PreparePipeline
+from src.results_store import ResultsStore
+
+
+def test_worker_processes_prepare_like_the_main_process(tmp_path):
+    """A page prepared by the pool is identical to one prepared in-process."""
+    pages = []
+    for i in range(3):
+        path = tmp_path / f"page{i}.png"
+        Image.new('RGB', (1200, 1600), (240 - i * 20, 240, 240)).save(path)
+        pages.append(PageRef(path))
+
+    options = {"max_size": (800, 800), "quality": 85}
+    with PreparePipeline(2, **options) as pipeline:
+        futures = [pipeline.submit(page) for page in pages]
+        prepared = [future.result(timeout=30) for future in futures]
+
+    for page, image in zip(pages, prepared):
+        expected = prepare_page(page.path, **options)
+        assert image.jpeg == expected.jpeg
+        assert (image.width, image.height) == (expected.width, expected.height)
+
+
+def test_process_folder_uses_prepared_pages(tmp_path, monkeypatch):
+    """With PREPROCESS_WORKERS set, every page comes from the pipeline."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    monkeypatch.setattr(llama4_extractor, "PREPROCESS_WORKERS", 2)
+    input_folder, output_folder = tmp_path / "input", tmp_path / "output"
+    input_folder.mkdir()
+    output_folder.mkdir()
+    for i in range(4):
+        Image.new('RGB', (600, 800), (200 + i, 200 + i, 200 + i)).save(input_folder / f"page{i}.png")
+
+    with MockVertexServer(MockConfig(latency_ms=5, latency_sigma=0)) as server:
+        extractor = llama4_extractor.LocalLlama4Extractor(
+            use_cache=False, use_dedup=False, endpoint=server.url,
+            token_provider=StaticTokenProvider(),
+            budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+            results_store=ResultsStore(tmp_path / "results.sqlite"))
+        results = extractor.process_folder(input_folder, output_folder, max_workers=2,
+                                           job_name="pipeline")
+
+    assert server.stats["200"] == 4
+    assert len(results) == 4
+    assert not any(text.startswith("ERROR") for text in results.values())
+    # Pages prepared ahead of time are waited for, not prepared on the thread
+    assert extractor.metrics.to_dict()["stages"]["prepare_wait"]["count"] == 4
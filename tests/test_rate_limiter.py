@@ -0,0 +1,52 @@
+"""
+Tests for the adaptive rate limiter used by batch_process.py.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.rate_limiter import AdaptiveRateLimiter, TokenBucket
+
+
+def test_token_bucket_wait_time():
+    """An empty bucket reports how long the refill takes."""
+    bucket = TokenBucket(rate_per_minute=60)
+    bucket.consume(60)
+    
+    # 60 per minute refills one unit per second
+    assert 0.9 < bucket.wait_time(1) <= 1.0
+    # Oversized requests only wait for a full bucket
+    assert bucket.wait_time(1000) <= 60.0
+
+
+def test_usage_reconciles_token_estimate():
+    """Observed usage replaces the initial per-request estimate."""
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, tokens_per_minute=10_000,
+                                  initial_token_estimate=2000)
+    
+    reserved = limiter.acquire()
+    assert reserved == 2000
+    limiter.record_usage(reserved, {"total_tokens": 3000})
+    
+    assert limiter.token_estimate == 3000
+    # 2000 reserved + 1000 debt reconciled
+    assert limiter._token_bucket.level <= 7000
+
+
+def test_throttling_backs_off_and_ramps_up():
+    """A 429 halves the rate; later successes restore it."""
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, backoff_base=0.01,
+                                  backoff_max=0.02, ramp_up_step=0.25)
+    
+    delay = limiter.record_throttled()
+    assert 0.005 <= delay <= 0.01
+    assert limiter.rate_scale == 0.5
+    
+    limiter.acquire()
+    limiter.record_usage(0, {"total_tokens": 100})
+    limiter.record_usage(0, {"total_tokens": 100})
+    assert limiter.rate_scale == 1.0
@@ -0,0 +1,105 @@
+"""
+Tests for multi-region routing with health-based failover.
+"""
+
+import sys
+import time
+import random
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src.budget import BudgetGovernor, Pricing
+from src.llama4_extractor import LocalLlama4Extractor
+from src.rate_limiter import AdaptiveRateLimiter
+from src.regions import Region, RegionRouter
+from src.results_store import ResultsStore
+
+
+def test_traffic_follows_latency_and_failures_eject():
+    """The faster region gets most requests; a failing one is taken out."""
+    fast, slow = Region("fast", "http://fast"), Region("slow", "http://slow")
+    router = RegionRouter([fast, slow], eject_after=3, eject_seconds=0.2,
+                          rng=random.Random(0))
+    router.record_success(fast, 0.2)
+    router.record_success(slow, 1.0)
+
+    picks = [router.choose() for _ in range(1000)]
+    assert picks.count(fast) > 3 * picks.count(slow)
+
+    for _ in range(3):
+        router.record_failure(fast, "HTTP 429")
+    assert {router.choose() for _ in range(50)} == {slow}
+    # Nowhere else to go for a request the slow region already failed
+    assert router.choose(exclude=[slow]) is None
+
+    # Without a health check the region returns on probation after its
+    # cooldown, and a single failure ejects it again for twice as long
+    time.sleep(0.25)
+    assert router.choose(exclude=[slow]) is fast
+    router.record_failure(fast, "HTTP 500")
+    assert fast.ejected_until - time.monotonic() > 0.3
+
+
+def test_health_check_gates_readmission():
+    """An ejected region only gets traffic again once its health check passes."""
+    primary, backup = Region("primary", "http://a"), Region("backup", "http://b")
+    healthy = {"primary": False}
+    router = RegionRouter([primary, backup], eject_after=1, eject_seconds=0.05,
+                          health_check=lambda region: healthy[region.name])
+    router.record_failure(primary, "ConnectionError")
+
+    time.sleep(0.1)
+    router.choose()  # starts the failing health check
+    time.sleep(0.05)
+    assert primary.needs_check and primary.ejections == 2
+
+    healthy["primary"] = True
+    time.sleep(0.15)
+    router.choose()
+    time.sleep(0.05)
+    assert not primary.needs_check
+    assert router.choose(exclude=[backup]) is primary
+
+    # With every region ejected, the one that comes back first is used
+    router.record_failure(primary, "HTTP 503")
+    router.record_failure(backup, "HTTP 503")
+    assert router.choose() is backup
+
+
+def test_extractor_fails_over_to_healthy_region(tmp_path):
+    """Pages succeed while one region answers HTTP 500, which gets ejected."""
+    image = tmp_path / "page.png"
+    Image.new('RGB', (600, 800), (250, 250, 250)).save(image)
+
+    broken = MockConfig(latency_ms=1, latency_sigma=0, error_500_rate=1.0, output_tokens=50)
+    working = MockConfig(latency_ms=1, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(broken) as down, MockVertexServer(working) as up:
+        rate_limiter = AdaptiveRateLimiter(requests_per_minute=0)
+        extractor = LocalLlama4Extractor(
+            rate_limiter=rate_limiter, use_cache=False, use_dedup=False,
+            endpoint={"down": down.url, "up": up.url},
+            token_provider=StaticTokenProvider(),
+            budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+            results_store=ResultsStore(tmp_path / "results.sqlite"))
+        extractor.router.eject_after = 1
+        for _ in range(20):
+            text, usage = extractor.extract_text_from_image(image)
+            assert text and usage["output_tokens"] == 50
+
+        regions = {region.name: region for region in extractor.router.regions}
+        assert up.stats["200"] == 20
+        # Ejected by its first failure and never tried again
+        assert down.stats["500"] == 1
+        assert regions["down"].ejections == 1
+        # Every region paces its own quota
+        assert regions["down"].rate_limiter is rate_limiter
+        assert regions["up"].rate_limiter is not rate_limiter
+
+        # The health check probes the endpoint like diagnose_api.py does
+        assert extractor._check_region(regions["up"])
@@ -0,0 +1,57 @@
+"""
+Tests for the low-copy request body encoder.
+"""
+
+import os
+import sys
+import json
+import base64
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.request_body import IMAGE_PLACEHOLDER, ImageRequestBody
+from src.result_cache import ExtractionCache
+
+TEMPLATE = {
+    "contents": [{"role": "user", "parts": [
+        {"text": "Extract \"ALL\" text\n"},
+        {"inlineData": {"mimeType": "image/jpeg", "data": IMAGE_PLACEHOLDER}}
+    ]}],
+    "generationConfig": {"maxOutputTokens": 4096, "temperature": 0.1}
+}
+
+
+def test_streamed_body_matches_json():
+    """Read in blocks, the body is the JSON of the complete request."""
+    jpeg = os.urandom(100_001)
+    body = ImageRequestBody(TEMPLATE, jpeg)
+
+    reader = body.reader()
+    blocks = []
+    while True:
+        block = reader.read(8192)
+        if not block:
+            break
+        blocks.append(block)
+    data = b"".join(blocks)
+
+    assert len(data) == len(body)
+    request = json.loads(data)
+    assert request == body.to_dict()
+    assert base64.b64decode(request["contents"][0]["parts"][1]["inlineData"]["data"]) == jpeg
+
+    # Every reader starts from the beginning (retries, hedged copies)
+    assert b"".join(body.reader()) == data
+    # An already base64-encoded image gives the same body
+    assert b"".join(ImageRequestBody(TEMPLATE, base64.b64encode(jpeg).decode()).chunks()) == data
+
+
+def test_cache_key_same_for_bytes_and_base64():
+    """Raw JPEG bytes hash to the key of their base64 string."""
+    jpeg = os.urandom(50_000)
+    config = TEMPLATE["generationConfig"]
+    assert (ExtractionCache.make_key(jpeg, "prompt", "model", config)
+            == ExtractionCache.make_key(base64.b64encode(jpeg).decode(), "prompt", "model", config))
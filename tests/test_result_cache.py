@@ -0,0 +1,59 @@
+"""
+Tests for the on-disk extraction result cache.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.result_cache import ExtractionCache
+
+GENERATION_CONFIG = {"maxOutputTokens": 4096, "temperature": 0.1}
+USAGE = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+
+
+def test_hit_and_miss(tmp_path):
+    """Stored results come back; any change to the request is a miss."""
+    cache = ExtractionCache(tmp_path)
+    key = cache.make_key("aGVsbG8=", "prompt", "model", GENERATION_CONFIG)
+    
+    assert cache.get(key) is None
+    cache.put(key, "page text", USAGE)
+    assert cache.get(key) == ("page text", USAGE)
+    
+    other_config = dict(GENERATION_CONFIG, temperature=0.2)
+    assert cache.make_key("aGVsbG8=", "prompt", "model", other_config) != key
+    assert cache.make_key("aGVsbG8=", "prompt 2", "model", GENERATION_CONFIG) != key
+
+
+def test_expired_entries_are_misses(tmp_path):
+    """Entries older than the age limit are ignored."""
+    cache = ExtractionCache(tmp_path, max_age_seconds=0)
+    key = cache.make_key("data", "prompt", "model", GENERATION_CONFIG)
+    cache.put(key, "page text", USAGE)
+    time.sleep(0.01)
+    
+    assert cache.get(key) is None
+
+
+def test_size_eviction_removes_least_recently_used(tmp_path):
+    """Trimming to the size limit drops the coldest entries."""
+    cache = ExtractionCache(tmp_path)
+    keys = [cache.make_key(str(i), "prompt", "model", GENERATION_CONFIG) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, "x" * 100, USAGE)
+        path = cache._entry_path(key)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+    
+    # Entry sizes vary by a few bytes with the stored timestamp
+    cache.max_size_bytes = max(cache._entry_path(key).stat().st_size for key in keys) * 2
+    cache.evict()
+    
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None
+    assert cache.get(keys[2]) is not None
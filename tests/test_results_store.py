@@ -0,0 +1,130 @@
+"""
+Tests for the append-only results store and the summaries built from it.
+"""
+
+import sys
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.documents import PageRef
+from src.results_store import ResultsStore, book_name
+
+
+def usage(total):
+    return {"input_tokens": total - 10, "output_tokens": 10, "total_tokens": total}
+
+
+def test_latest_record_wins(tmp_path):
+    """A retried page is summarized by its newest record only."""
+    page = PageRef(tmp_path / "ch1" / "page_001.jpg")
+    with ResultsStore(tmp_path / "results.sqlite") as store:
+        store.append("job", page, "failed", error="HTTP 500")
+        store.append("job", page, "done", output_path=tmp_path / "out.txt",
+                     token_usage=usage(100), characters=42,
+                     timings={"network": 1.5}, image={"width": 800})
+        store.append("job", PageRef(tmp_path / "ch1" / "page_002.jpg"), "failed",
+                     error="HTTP 400")
+
+        latest = store.latest("job", "page_001.jpg")
+        assert latest["status"] == "done"
+        assert latest["timings"] == {"network": 1.5}
+        assert latest["image"] == {"width": 800}
+        assert len(list(store.history(page.path))) == 2
+
+        summary = store.summary(job="job")
+        assert (summary["pages"], summary["done"], summary["failed"]) == (2, 1, 1)
+        assert summary["total_tokens"] == 100
+        assert summary["characters"] == 42
+
+        keys = [record["page_key"] for record in store.iter_pages(job="job", batch_size=1)]
+        assert keys == ["page_001.jpg", "page_002.jpg"]
+
+
+def test_summary_by_book_spans_jobs(tmp_path):
+    """Pages of a document are grouped by book across jobs."""
+    document = tmp_path / "chapter.pdf"
+    with ResultsStore(tmp_path / "results.sqlite") as store:
+        store.append("monday", PageRef(document, 0), "done", token_usage=usage(50))
+        store.append("tuesday", PageRef(document, 1), "done", token_usage=usage(70))
+
+        assert book_name(PageRef(document, 0)) == "chapter"
+        assert store.summary(book="chapter")["total_tokens"] == 120
+        assert store.summary(job="monday")["pages"] == 1
+
+        with pytest.raises(ValueError):
+            store.summary()
+
+
+def test_writers_in_other_processes_wait_for_the_lock(tmp_path):
+    """The store uses a rollback journal, and a held write lock is waited for."""
+    path = tmp_path / "results.sqlite"
+    # A store left in WAL mode by an earlier version is switched back
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+    with ResultsStore(path, timeout=5) as store:
+        assert store._conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+        # Another process holds the write lock for a moment
+        other = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+        start = time.monotonic()
+        store.append("job", PageRef(tmp_path / "page_001.jpg"), "done")
+        assert time.monotonic() - start >= 0.25
+        other.close()
+
+        # Appends between batches of a listing are not blocked either
+        store.append("job", PageRef(tmp_path / "page_002.jpg"), "done")
+        listed = []
+        for record in store.iter_pages(job="job", batch_size=1):
+            listed.append(record["page_key"])
+            store.append("job", PageRef(tmp_path / "page_003.jpg"), "done")
+        assert listed == ["page_001.jpg", "page_002.jpg", "page_003.jpg"]
+
+
+def test_process_folder_summary_from_store(tmp_path, monkeypatch):
+    """process_folder records every page and writes its summary from the store."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    for i in range(3):
+        Image.new('RGB', (600, 800), (250, 250, 250)).save(input_folder / f"page_{i}.png")
+    output_folder = tmp_path / "output"
+    output_folder.mkdir()
+
+    store = ResultsStore(tmp_path / "results.sqlite")
+    config = MockConfig(latency_ms=1, latency_sigma=0, output_tokens=50)
+    with MockVertexServer(config) as server:
+        extractor = llama4_extractor.LocalLlama4Extractor(
+            use_cache=False, endpoint=server.url,
+            token_provider=StaticTokenProvider(), results_store=store,
+            use_dedup=False, budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)))
+        results = extractor.process_folder(input_folder, output_folder, max_workers=2,
+                                           job_name="books", keep_results=False)
+
+    assert results == {}
+    summary = store.summary(job="books")
+    assert (summary["pages"], summary["done"]) == (3, 3)
+    assert summary["output_tokens"] == 150
+    record = store.latest("books", "page_0.png")
+    assert record["timings"]["page_total"] > 0
+    assert record["characters"] > 0
+
+    report = (output_folder / "extraction_summary.txt").read_text(encoding='utf-8')
+    assert "page_2.png: Extracted" in report
+    assert "Pages done: 3 of 3" in report
@@ -48,8 +48,8 @@ def test_single_image():
         print(f"Output tokens: {token_usage['output_tokens']}")
         print(f"Total tokens: {token_usage['total_tokens']}")
         
-        # Estimate cost (approximate)
-        estimated_cost = token_usage['total_tokens'] / 1_000_000 * 0.075
+        # Estimate cost with the configured input and output prices
+        estimated_cost = extractor.budget.pricing.usage_cost(token_usage)
         print(f"Estimated cost for this image: ${estimated_cost:.6f}")
         
         # Display results
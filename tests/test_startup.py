@@ -0,0 +1,46 @@
+"""
+Tests for the side-effect-free import of the extraction client.
+"""
+
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+# Records directory creation and output while importing, in a new interpreter
+IMPORT_SCRIPT = """
+import io, os, sys, json, pathlib, contextlib
+sys.path.insert(0, {root!r})
+created = []
+mkdir = pathlib.Path.mkdir
+pathlib.Path.mkdir = lambda self, *args, **kwargs: created.append(str(self))
+os.makedirs = lambda name, *args, **kwargs: created.append(str(name))
+output = io.StringIO()
+with contextlib.redirect_stdout(output):
+    import src.llama4_extractor
+pathlib.Path.mkdir = mkdir
+import logging
+print(json.dumps({{
+    "created": created,
+    "output": output.getvalue(),
+    "root_handlers": len(logging.getLogger().handlers),
+    "modules": [name for name in ("google.cloud.aiplatform", "google.auth")
+                if name in sys.modules]
+}}))
+"""
+
+
+def test_import_has_no_side_effects():
+    """Importing the extractor loads no Google SDKs, prints nothing and creates nothing."""
+    result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(root=str(project_root))],
+                            capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert report["modules"] == []
+    assert report["output"] == ""
+    assert report["created"] == []
+    assert report["root_handlers"] == 0
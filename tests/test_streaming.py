@@ -0,0 +1,41 @@
+"""
+Tests for streamed response parsing.
+"""
+
+import io
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.streaming import StrippedWriter, event_text, iter_sse_events
+
+
+def test_sse_events_are_decoded():
+    """Each data event is parsed; comments and blank lines are skipped."""
+    lines = [
+        b': keep-alive',
+        b'data: {"candidates": [{"content": {"parts": [{"text": "Hello "}]}}]}',
+        b'',
+        b'data: {"candidates": [{"content": {"parts": [{"text": "world"}]},',
+        b'data:  "finishReason": "STOP"}], "usageMetadata": {"totalTokenCount": 7}}',
+    ]
+    events = list(iter_sse_events(lines))
+    
+    assert len(events) == 2
+    assert "".join(event_text(event) for event in events) == "Hello world"
+    assert events[-1]["usageMetadata"]["totalTokenCount"] == 7
+
+
+def test_stripped_writer_matches_strip():
+    """Streamed chunks end up exactly like the stripped full text."""
+    chunks = ["\n  ", "First line\n", "\n", "Second line", "  \n", "\n"]
+    out = io.StringIO()
+    writer = StrippedWriter(out)
+    for chunk in chunks:
+        writer.write(chunk)
+    
+    assert out.getvalue() == "".join(chunks).strip()
+    assert writer.characters == len(out.getvalue())
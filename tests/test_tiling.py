@@ -0,0 +1,102 @@
+"""
+Tests for page tiling and seam stitching.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.results_store import ResultsStore
+from src.tiling import plan_tiles, stitch_pair, stitch_tiles
+
+
+def test_plan_tiles_covers_page_with_overlap():
+    """Row tiles span the full height and overlap their neighbours."""
+    boxes = plan_tiles((1000, 3000), rows=3, columns=1, overlap=0.1)
+    assert len(boxes) == 3
+    assert boxes[0][1] == 0 and boxes[-1][3] == 3000
+    for upper, lower in zip(boxes, boxes[1:]):
+        assert lower[1] < upper[3]
+
+
+def test_plan_tiles_column_major_order():
+    """Two-column pages are tiled down the left column first."""
+    boxes = plan_tiles((1000, 2000), rows=2, columns=2, overlap=0.1)
+    assert [box[0] for box in boxes] == [0, 0, 500, 500]
+
+
+def test_stitch_removes_duplicated_seam_lines():
+    """Lines repeated in the overlap appear once in the stitched text."""
+    upper = "Chapter 1\nThe first line.\nThe second line of text."
+    lower = "The second line of text.\nThe third line.\nThe end."
+    assert stitch_pair(upper, lower) == (
+        "Chapter 1\nThe first line.\nThe second line of text.\nThe third line.\nThe end."
+    )
+
+
+def test_stitch_keeps_full_version_of_cut_line():
+    """A line cut by the seam keeps its complete version."""
+    upper = "Some opening text.\nThe quick brown fox jumps"
+    lower = "The quick brown fox jumps over the lazy dog.\nClosing text."
+    assert stitch_pair(upper, lower) == (
+        "Some opening text.\nThe quick brown fox jumps over the lazy dog.\nClosing text."
+    )
+
+
+def test_stitch_without_overlap_concatenates():
+    """Unrelated tiles are simply joined."""
+    assert stitch_pair("Alpha line here", "Beta line there") == "Alpha line here\nBeta line there"
+    assert stitch_tiles(["Left column", "", "Right column", ""], rows=2, columns=2) == (
+        "Left column\n\nRight column"
+    )
+
+
+def test_tiles_stay_within_the_request_limit(tmp_path, monkeypatch):
+    """Tile requests share the run's request slots with the page workers."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    monkeypatch.setattr(llama4_extractor, "PREPROCESS_WORKERS", 0)
+    monkeypatch.setattr(llama4_extractor, "TILING_MODE", "always")
+    input_folder = tmp_path / "input"
+    input_folder.mkdir()
+    for i in range(3):
+        Image.new('RGB', (600, 800), (200 + i, 200 + i, 200 + i)).save(input_folder / f"page{i}.png")
+
+    with MockVertexServer(MockConfig(latency_ms=30, latency_sigma=0)) as server:
+        extractor = llama4_extractor.LocalLlama4Extractor(
+            use_cache=False, use_dedup=False, endpoint=server.url,
+            token_provider=StaticTokenProvider(),
+            budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+            results_store=ResultsStore(tmp_path / "results.sqlite"))
+
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+        post_json = extractor.transport.post_json
+
+        def counting_post_json(*args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                return post_json(*args, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        monkeypatch.setattr(extractor.transport, "post_json", counting_post_json)
+        results = extractor.process_folder(input_folder, tmp_path / "output", max_workers=2,
+                                           job_name="tiles")
+
+    assert not any(text.startswith("ERROR") for text in results.values())
+    # Two tiles per page, but never more than two requests at once
+    assert server.stats["200"] == 6
+    assert peak[0] == 2
@@ -0,0 +1,68 @@
+"""
+Tests for the pooled keep-alive HTTP transport.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+import requests
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer
+from src.transport import PooledTransport
+
+
+def request_body():
+    return {"contents": [{"role": "user",
+                          "parts": [{"text": "Extract"},
+                                    {"inlineData": {"mimeType": "image/jpeg",
+                                                    "data": "QUJD" * 500}}]}]}
+
+
+def test_requests_reuse_one_connection():
+    """Sequential requests share a kept-alive connection and are counted."""
+    with MockVertexServer(MockConfig(latency_ms=1, latency_sigma=0)) as server:
+        transport = PooledTransport(pool_size=2)
+        for _ in range(5):
+            response = transport.post_json(server.url, request_body(), {})
+            assert response.status_code == 200
+            response.close()
+        stats = transport.stats()
+        transport.close()
+
+    assert stats["requests_sent"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["connection_reuse_ratio"] == pytest.approx(0.8)
+    assert stats["bytes_sent"] == stats["uncompressed_bytes"] > 2000
+
+
+def test_compressed_bodies_are_counted_smaller():
+    """With compression on, stats() reports the bytes actually sent."""
+    with MockVertexServer(MockConfig(latency_ms=1, latency_sigma=0)) as server:
+        transport = PooledTransport(compress=True)
+        # The mock does not decode gzip bodies, so only the stats matter here
+        transport.post_json(server.url, request_body(), {}).close()
+        stats = transport.stats()
+        transport.close()
+
+    assert stats["bytes_sent"] < stats["uncompressed_bytes"] / 10
+
+
+def test_read_timeout_fails_the_request():
+    """A response slower than the read timeout raises instead of hanging."""
+    with MockVertexServer(MockConfig(latency_ms=400, latency_sigma=0)) as server:
+        transport = PooledTransport(connect_timeout=1.0, read_timeout=0.1)
+        start = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            transport.post_json(server.url, request_body(), {})
+        assert time.monotonic() - start < 0.35
+
+        # A per-request override takes precedence over the default
+        response = transport.post_json(server.url, request_body(), {}, timeout=(1.0, 5.0))
+        assert response.status_code == 200
+        transport.close()
@@ -0,0 +1,149 @@
+"""
+Tests for the hot-folder watch mode.
+"""
+
+import os
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.llama4_extractor import LocalLlama4Extractor
+from src.results_store import ResultsStore
+from src.watcher import FolderWatcher, InotifyWatcher, PollingWatcher
+
+
+def make_page(path: Path, shade: int = 250):
+    Image.new('RGB', (600, 800), (shade, shade, shade)).save(path, format="PNG")
+
+
+def test_polling_reports_files_once_settled(tmp_path):
+    """A file still being written is held back until it stops changing."""
+    old = tmp_path / "old.png"
+    make_page(old)
+    os.utime(old, (time.time() - 60, time.time() - 60))
+    (tmp_path / "notes.txt").write_text("not a page")
+
+    watcher = PollingWatcher(tmp_path, interval=0, settle_seconds=0.3)
+    assert watcher.existing_files() == [old]
+
+    new = tmp_path / "new.png"
+    make_page(new)
+    assert watcher.poll(timeout=0) == []
+    time.sleep(0.35)
+    assert watcher.poll(timeout=0) == [new]
+    # Unchanged files are not reported again
+    assert watcher.poll(timeout=0) == []
+
+
+def test_watcher_without_poll_cannot_be_created(tmp_path):
+    """A watcher must implement poll() to be created at all."""
+    class NoPoll(FolderWatcher):
+        pass
+
+    with pytest.raises(TypeError):
+        NoPoll(tmp_path)
+
+
+def test_inotify_reports_closed_and_renamed_files(tmp_path):
+    """Closing a written file or renaming one into the folder completes it."""
+    try:
+        watcher = InotifyWatcher(tmp_path)
+    except OSError as e:
+        pytest.skip(f"inotify unavailable: {e}")
+
+    with watcher:
+        assert watcher.existing_files() == []
+        make_page(tmp_path / "scan1.png")
+        make_page(tmp_path / "scan2.png.part")
+        os.rename(tmp_path / "scan2.png.part", tmp_path / "scan2.png")
+        assert watcher.poll(timeout=1.0) == [tmp_path / "scan1.png", tmp_path / "scan2.png"]
+        assert watcher.poll(timeout=0) == []
+
+
+def test_watch_extracts_new_pages_without_rebilling(tmp_path, monkeypatch):
+    """New pages are extracted while watching; completed ones are not sent again."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    monkeypatch.setattr(llama4_extractor, "WATCH_POLL_INTERVAL_SECONDS", 0.1)
+    monkeypatch.setattr(llama4_extractor, "WATCH_SETTLE_SECONDS", 0.1)
+    input_folder, output_folder = tmp_path / "input", tmp_path / "output"
+    input_folder.mkdir()
+    make_page(input_folder / "page1.png", 240)
+
+    def watch(extractor, stop):
+        thread = threading.Thread(target=extractor.watch_folder,
+                                  args=(input_folder, output_folder),
+                                  kwargs={"stop": stop, "job_name": "watch", "use_inotify": False})
+        thread.start()
+        return thread
+
+    def wait_for(path: Path):
+        deadline = time.monotonic() + 10
+        while not path.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert path.exists()
+
+    with MockVertexServer(MockConfig(latency_ms=10, latency_sigma=0)) as server:
+        def make_extractor():
+            return LocalLlama4Extractor(use_cache=False, use_dedup=False, endpoint=server.url,
+                                        token_provider=StaticTokenProvider(),
+                                        budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+                                        results_store=ResultsStore(tmp_path / "results.sqlite"))
+
+        stop = threading.Event()
+        thread = watch(make_extractor(), stop)
+        wait_for(output_folder / "page1_extracted.txt")
+        make_page(input_folder / "page2.png", 230)
+        wait_for(output_folder / "page2_extracted.txt")
+        stop.set()
+        thread.join(timeout=10)
+        assert server.stats["200"] == 2
+
+        # A restarted watcher leaves both completed pages alone
+        stop = threading.Event()
+        thread = watch(make_extractor(), stop)
+        time.sleep(0.5)
+        stop.set()
+        thread.join(timeout=10)
+        assert server.stats["200"] == 2
+
+
+def test_watch_counts_only_extracted_pages(tmp_path, monkeypatch):
+    """Pages that fail are queued but not reported as extracted."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    monkeypatch.setattr(llama4_extractor, "PREPROCESS_WORKERS", 0)
+    monkeypatch.setattr(llama4_extractor, "WATCH_POLL_INTERVAL_SECONDS", 0.1)
+    monkeypatch.setattr(llama4_extractor, "WATCH_SETTLE_SECONDS", 0.1)
+    input_folder, output_folder = tmp_path / "input", tmp_path / "output"
+    input_folder.mkdir()
+    make_page(input_folder / "page1.png", 240)
+    make_page(input_folder / "page2.png", 230)
+    # Named like an image but not one: preparing it fails
+    (input_folder / "page3.png").write_bytes(b"not an image")
+
+    with MockVertexServer(MockConfig(latency_ms=10, latency_sigma=0)) as server:
+        extractor = LocalLlama4Extractor(use_cache=False, use_dedup=False, endpoint=server.url,
+                                         token_provider=StaticTokenProvider(),
+                                         budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+                                         results_store=ResultsStore(tmp_path / "results.sqlite"))
+        stop = threading.Event()
+        # Everything already in the folder is queued before the first poll
+        threading.Timer(1.0, stop.set).start()
+        extracted = extractor.watch_folder(input_folder, output_folder, job_name="watch",
+                                           stop=stop, use_inotify=False)
+
+    assert server.stats["200"] == 2
+    assert extracted == 2
+    assert extractor.results_store.summary(job="watch")["failed"] == 1
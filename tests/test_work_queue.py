@@ -0,0 +1,100 @@
+"""
+Tests for the shared work queue with leases.
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from PIL import Image
+
+from benchmarks.mock_vertex import MockConfig, MockVertexServer, StaticTokenProvider
+from src import llama4_extractor
+from src.budget import BudgetGovernor, Pricing
+from src.documents import PageRef
+from src.llama4_extractor import LocalLlama4Extractor
+from src.results_store import ResultsStore
+from src.work_queue import WorkQueue
+
+
+def test_leases_are_exclusive_and_expired_ones_reclaimed(tmp_path):
+    """Workers never share a live lease; a crashed worker's pages move on."""
+    path = tmp_path / "queue.sqlite"
+    pages = [PageRef(tmp_path / f"page{i}.png") for i in range(3)]
+    first = WorkQueue(path, lease_seconds=0.2, max_attempts=2)
+    second = WorkQueue(path, lease_seconds=0.2, max_attempts=2)
+    assert first.enqueue("job", pages) == 3
+    assert second.enqueue("job", pages) == 0
+
+    crashed = first.claim("job", "a", limit=2)
+    assert [lease.page for lease in crashed] == pages[:2]
+    survivor = second.claim("job", "b", limit=5)
+    assert [lease.page for lease in survivor] == pages[2:]
+    assert second.complete(survivor[0])
+
+    # Worker "a" stops renewing; its pages are handed out again
+    time.sleep(0.25)
+    reclaimed = second.claim("job", "b", limit=5)
+    assert [lease.page for lease in reclaimed] == pages[:2]
+    assert all(lease.attempt == 2 for lease in reclaimed)
+    # The old lease is worthless now
+    assert not first.complete(crashed[0])
+    assert second.complete(reclaimed[0])
+
+    # Expired on its last attempt: the page is given up on
+    time.sleep(0.25)
+    assert second.claim("job", "b") == []
+    assert second.counts("job") == {"pending": 0, "leased": 0, "done": 2, "failed": 1}
+    assert second.is_drained("job")
+
+
+def test_workers_split_a_job_without_duplicates(tmp_path, monkeypatch):
+    """Two workers on one queue extract every page exactly once."""
+    monkeypatch.setattr(llama4_extractor, "JOURNAL_DIR", tmp_path / "journal")
+    monkeypatch.setattr(llama4_extractor, "METRICS_DIR", tmp_path / "metrics")
+    monkeypatch.setattr(llama4_extractor, "QUEUE_POLL_SECONDS", 0.1)
+    input_folder, output_folder = tmp_path / "input", tmp_path / "output"
+    input_folder.mkdir()
+    for i in range(8):
+        Image.new('RGB', (600, 800), (200 + i, 200 + i, 200 + i)).save(input_folder / f"page{i}.png")
+
+    with MockVertexServer(MockConfig(latency_ms=20, latency_sigma=0)) as server:
+        def make_extractor():
+            return LocalLlama4Extractor(use_cache=False, use_dedup=False, endpoint=server.url,
+                                        token_provider=StaticTokenProvider(),
+                                        budget=BudgetGovernor(tmp_path / "budget.sqlite", Pricing(0.35, 1.15)),
+                                        results_store=ResultsStore(tmp_path / "results.sqlite"))
+
+        queue_path = tmp_path / "queue.sqlite"
+        with WorkQueue(queue_path) as queue:
+            assert make_extractor().enqueue_folder(queue, input_folder, "job") == 8
+
+        processed = {}
+
+        def work(name):
+            with WorkQueue(queue_path) as queue:
+                processed[name] = make_extractor().process_queue(
+                    queue, "job", output_folder, max_workers=2, worker=name)
+
+        threads = [threading.Thread(target=work, args=(name,)) for name in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+
+        assert server.stats["200"] == 8
+        assert sum(processed.values()) == 8
+        # Every worker journals its own pages
+        journaled = [line for name in ("a", "b")
+                     for line in (tmp_path / "journal" / f"job_{name}.jsonl").read_text().splitlines()]
+        assert len(journaled) == 8
+        assert len(list(output_folder.glob("*_extracted.txt"))) == 8
+        with WorkQueue(queue_path) as queue:
+            assert queue.counts("job")["done"] == 8
+            # Completed pages are not queued again
+            assert make_extractor().enqueue_folder(queue, input_folder, "job") == 0
@@ -0,0 +1,56 @@
+"""
+Hot-folder watch mode for continuous ingestion.
+Extracts every page already in the input folder that is not completed yet,
+then keeps running and extracts each new scan within seconds of it being
+fully written. Pages completed before (by this or any earlier run of the
+same job) are not sent again.
+
+Usage:
+    python watch_folder.py
+    python watch_folder.py --input /mnt/scanner --job scanner --poll
+
+Stop with Ctrl+C; pages already queued are finished first.
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.append(str(project_root))
+
+from src.llama4_extractor import LocalLlama4Extractor
+from config.settings import (INPUT_DIR, OUTPUT_DIR, MAX_CONCURRENT_REQUESTS,
+                             configure_logging, ensure_directories, settings_warnings)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--input", type=Path, default=INPUT_DIR,
+                        help="Folder the scanners drop pages into")
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR,
+                        help="Folder to write the extracted text to")
+    parser.add_argument("--job", help="Job name (defaults to the input folder name)")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help="Maximum number of concurrent API requests")
+    parser.add_argument("--poll", action="store_true",
+                        help="Poll the folder instead of using inotify "
+                             "(needed for network shares)")
+    args = parser.parse_args()
+
+    ensure_directories()
+    configure_logging()
+    for warning in settings_warnings():
+        logger.warning(warning)
+
+    extractor = LocalLlama4Extractor()
+    extractor.serve_metrics()
+    extractor.watch_folder(args.input, args.output, max_workers=args.workers,
+                           job_name=args.job, use_inotify=False if args.poll else None)
+
+
+if __name__ == "__main__":
+    main()